@@ -3,17 +3,27 @@ from tkinter import ttk, filedialog, messagebox, scrolledtext, Menu
 import json
 import os
 import logging
+import multiprocessing
+import queue
+import threading
 
 from tkinterdnd2 import DND_FILES, TkinterDnD
 
-# 从模块导入WordProcessor
-from modules.word_processor import WordProcessor
+# WordProcessor（及 python-docx、lxml）导入较慢，窗口显示后在后台线程预先导入，见 _preload_processing_modules
 from modules.update_manager import UpdateManager
 from modules.config_manager import ConfigManager
+from modules.processing_stats import aggregate_stats, format_summary
+from modules.format_cache import FormatCache
 from gui.settings_window import SettingsWindow
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# 日志队列的刷新间隔（毫秒）和每次最多写入日志窗口的条数
+LOG_FLUSH_INTERVAL_MS = 100
+LOG_FLUSH_MAX_ITEMS = 5000
+# 窗口显示后多久（毫秒）开始在后台导入排版模块
+PRELOAD_DELAY_MS = 300
+
 
 class WordFormatterGUI:
     def __init__(self, master):
@@ -42,9 +52,15 @@ class WordFormatterGUI:
         self.set_outline_var = tk.BooleanVar(value=True)
         
         self.default_config_path = "default_config.json"
+
+        # 日志和进度事件队列：处理线程只向队列写入，由主线程定时批量取出更新界面（Tk不是线程安全的）
+        self.ui_queue = queue.Queue()
+        self.cancel_event = threading.Event()
+        self.worker_thread = None
         
         self.create_menu()
         self.create_widgets()
+        self.master.after(LOG_FLUSH_INTERVAL_MS, self._drain_ui_queue)
 
         # 初始化配置管理器
         self.config_manager = ConfigManager(self.default_config_path)
@@ -69,6 +85,8 @@ class WordFormatterGUI:
         
         # 程序启动时检查更新
         self.master.after(1000, self.check_for_updates_once)
+        # 用户选择文件期间导入排版模块，处理第一个文件时不必再等待
+        self.master.after(PRELOAD_DELAY_MS, lambda: threading.Thread(target=_preload_processing_modules, daemon=True).start())
 
     # set_initial_pane_position方法已移除，因为不再使用分割面板
 
@@ -135,6 +153,16 @@ class WordFormatterGUI:
         style.configure('Success.TButton', font=('Helvetica', 11, 'bold'))
         self.start_button = ttk.Button(control_frame, text="开始排版", style='Success.TButton', command=self.start_processing)
         self.start_button.pack(fill=tk.X, padx=5, ipady=8)  # 使用fill=tk.X使按钮水平填充整个空间，增加内边距使按钮更高
+
+        # 进度条和取消按钮
+        progress_frame = ttk.Frame(control_frame)
+        progress_frame.pack(fill=tk.X, padx=5, pady=(5, 0))
+        self.progress_bar = ttk.Progressbar(progress_frame, orient=tk.HORIZONTAL, mode='determinate')
+        self.progress_bar.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.progress_label = ttk.Label(progress_frame, text="", width=12, anchor='center')
+        self.progress_label.pack(side=tk.LEFT, padx=5)
+        self.cancel_button = ttk.Button(progress_frame, text="取消", command=self.cancel_processing, state='disabled')
+        self.cancel_button.pack(side=tk.LEFT)
         
         # 在主面板下方创建处理日志区域
         log_frame = ttk.LabelFrame(content_frame, text="处理日志", padding=5)
@@ -145,9 +173,42 @@ class WordFormatterGUI:
         self._update_listbox_placeholder()
     
     def log_to_debug_window(self, message):
-        self.master.update_idletasks()
+        """输出日志到日志窗口，可在任意线程调用：日志先放入队列，由主线程批量写入"""
+        self.ui_queue.put(('log', message))
+
+    def _drain_ui_queue(self):
+        """主线程定时取出队列中的日志、进度和更新事件，日志合并为一次写入"""
+        lines = []
+        try:
+            for _ in range(LOG_FLUSH_MAX_ITEMS):
+                kind, payload = self.ui_queue.get_nowait()
+                if kind == 'log':
+                    lines.append(payload)
+                    continue
+                self._flush_log_lines(lines)
+                lines = []
+                if kind == 'progress':
+                    done, total = payload
+                    self.progress_bar.config(maximum=max(total, 1), value=done)
+                    self.progress_label.config(text=f"{done}/{total}")
+                elif kind == 'clear':
+                    self.debug_text.config(state='normal'); self.debug_text.delete('1.0', tk.END); self.debug_text.config(state='disabled')
+                elif kind == 'done':
+                    self._on_processing_finished(*payload)
+                elif kind == 'update_checked':
+                    self._on_update_checked(payload)
+                elif kind == 'update_downloaded':
+                    self.update_manager.install_update(payload)
+        except queue.Empty:
+            pass
+        self._flush_log_lines(lines)
+        self.master.after(LOG_FLUSH_INTERVAL_MS, self._drain_ui_queue)
+
+    def _flush_log_lines(self, lines):
+        if not lines:
+            return
         self.debug_text.config(state='normal')
-        self.debug_text.insert(tk.END, message + '\n')
+        self.debug_text.insert(tk.END, '\n'.join(lines) + '\n')
         self.debug_text.config(state='disabled')
         self.debug_text.see(tk.END)
     
@@ -230,37 +291,57 @@ class WordFormatterGUI:
     def check_for_updates_once(self):
         """
         程序启动时检查更新（仅检查一次）
+        
+        检查在后台线程进行，结果经 ui_queue 交回主线程，更新服务器不可达时界面不会卡住
         """
+        threading.Thread(target=self._check_for_updates_worker, daemon=True).start()
+
+    def _check_for_updates_worker(self):
         try:
             # 调用更新管理器检查更新
             result = self.update_manager.check_for_updates()
-            
-            # 处理返回结果
-            if isinstance(result, tuple) and len(result) == 3:
-                has_update, version, release_info = result
-                if has_update:
-                    # 询问用户是否更新
-                    self.log_to_debug_window(f"发现新版本 v{version}，是否立即更新？")
-                    response = messagebox.askyesno("更新提示", f"发现新版本 v{version}\n\n是否立即更新？")
-                    if response:
-                        self.log_to_debug_window("用户选择更新，开始下载...")
-                        # 下载更新
-                        update_file = self.update_manager.download_update(release_info)
-                        if update_file:
-                            # 安装更新
-                            self.update_manager.install_update(update_file)
-                else:
-                    # 更新管理器已记录日志，此处不再重复输出
-                    pass
-            else:
-                self.log_to_debug_window("未检查到更新")
         except Exception as e:
             self.log_to_debug_window(f"更新检查失败: {e}")
             logging.error(f"更新检查失败: {e}", exc_info=True)
+            return
+        self.ui_queue.put(('update_checked', result))
+
+    def _on_update_checked(self, result):
+        """主线程处理检查更新的结果：询问用户是否更新，同意后在后台线程下载"""
+        if isinstance(result, tuple) and len(result) == 3:
+            has_update, version, release_info = result
+            if has_update:
+                # 询问用户是否更新
+                self.log_to_debug_window(f"发现新版本 v{version}，是否立即更新？")
+                response = messagebox.askyesno("更新提示", f"发现新版本 v{version}\n\n是否立即更新？")
+                if response:
+                    self.log_to_debug_window("用户选择更新，开始下载...")
+                    threading.Thread(target=self._download_update_worker, args=(release_info,), daemon=True).start()
+            else:
+                # 更新管理器已记录日志，此处不再重复输出
+                pass
+        else:
+            self.log_to_debug_window("未检查到更新")
+
+    def _download_update_worker(self, release_info):
+        try:
+            # 下载更新
+            update_file = self.update_manager.download_update(release_info)
+        except Exception as e:
+            self.log_to_debug_window(f"更新包下载失败: {e}")
+            logging.error(f"更新包下载失败: {e}", exc_info=True)
+            return
+        if update_file:
+            # 安装更新需要退出程序，交回主线程进行
+            self.ui_queue.put(('update_downloaded', update_file))
 
 
 
     def start_processing(self):
+        if self.worker_thread is not None and self.worker_thread.is_alive():
+            messagebox.showinfo("提示", "正在处理中，请等待当前任务完成或先取消。")
+            return
+
         warning_title = "处理前重要提示"
         warning_message = (
             "为了防止数据丢失，请在继续前关闭所有已打开的Word和WPS文档（包括wps、表格、PPT等所有文档）。\n\n"
@@ -271,28 +352,68 @@ class WordFormatterGUI:
             self.log_to_debug_window("用户已取消操作。")
             return
             
-        self.debug_text.config(state='normal'); self.debug_text.delete('1.0', tk.END); self.debug_text.config(state='disabled')
+        self.ui_queue.put(('clear', None))
         
         # 确保配置已加载，如果没有则加载默认配置
         if self.config_manager.format_config is None:
             self.config_manager.load_config()
-        
-        processor = WordProcessor(self.config_manager.format_config, self.log_to_debug_window)
 
+        file_list = self.file_listbox.get(0, tk.END)
+        if not file_list:
+            messagebox.showwarning("警告", "文件列表为空，请先添加文件！"); return
+        output_dir = filedialog.askdirectory(title="请选择一个文件夹用于存放处理后的文件")
+        if not output_dir: return
+
+        # 处理期间配置可能在设置窗口中被修改，处理线程使用当前配置的副本
+        format_config = dict(self.config_manager.format_config)
+        self.cancel_event.clear()
+        self.start_button.config(state='disabled')
+        self.cancel_button.config(state='normal')
+        self.ui_queue.put(('progress', (0, len(file_list))))
+        self.worker_thread = threading.Thread(target=self._process_files, args=(format_config, file_list, output_dir),
+                                              daemon=True)
+        self.worker_thread.start()
+
+    def cancel_processing(self):
+        """请求取消：当前文件处理完成后停止，剩余文件不再处理"""
+        self.cancel_event.set()
+        self.cancel_button.config(state='disabled')
+        self.log_to_debug_window("\n⏹ 已请求取消，当前文件处理完成后停止...")
+
+    def _process_files(self, format_config, file_list, output_dir):
+        """处理线程：依次排版文件，日志和进度通过队列交给主线程显示"""
+        processor = None
+        cache = None
+        success_count, fail_count, error = 0, 0, None
+        file_stats = []
         try:
-            file_list = self.file_listbox.get(0, tk.END)
-            if not file_list:
-                messagebox.showwarning("警告", "文件列表为空，请先添加文件！"); return
-            output_dir = filedialog.askdirectory(title="请选择一个文件夹用于存放处理后的文件")
-            if not output_dir: return
+            from modules.word_processor import WordProcessor
+            processor = WordProcessor(format_config, self.log_to_debug_window,
+                                      stats_callback=lambda stats: file_stats.append(stats.to_dict()))
+            if format_config.get('format_cache'):
+                cache = FormatCache(format_config['format_cache_dir'], log_callback=self.log_to_debug_window)
+
+            # .doc/.wps 文件提前交给转换池，转换与前面文件的排版同时进行
+            processor.prefetch_conversions(file_list)
 
-            success_count, fail_count = 0, 0
             for i, input_path in enumerate(file_list):
+                if self.cancel_event.is_set():
+                    self.log_to_debug_window(f"\n⏹ 用户已取消，剩余 {len(file_list) - i} 个文件未处理。")
+                    break
                 try:
                     self.log_to_debug_window(f"\n--- 开始处理文件 {i+1}/{len(file_list)}: {os.path.basename(input_path)} ---")
                     base_name = os.path.splitext(os.path.basename(input_path))[0]
                     output_path = os.path.join(output_dir, f"{base_name}_formatted.docx")
+                    cache_key = None
+                    if cache is not None:
+                        hit, cache_key = cache.restore(input_path, format_config, output_path)
+                        if hit:
+                            self.log_to_debug_window(f"✅ 文件内容和排版参数均未改变，已复用上次的排版结果: {output_path}")
+                            success_count += 1
+                            continue
                     processor.format_document(input_path, output_path)
+                    if cache is not None:
+                        cache.store(cache_key, input_path, format_config, output_path)
                     self.log_to_debug_window(f"✅ 文件处理成功，已保存至: {output_path}")
                     success_count += 1
                 except Exception as e:
@@ -301,23 +422,48 @@ class WordFormatterGUI:
                     fail_count += 1
                 finally:
                     processor._cleanup_temp_files()
-            
-            summary_message = f"批量处理完成！\n\n成功: {success_count}个\n失败: {fail_count}个"
-            if fail_count > 0: summary_message += "\n\n失败详情请查看日志窗口。"
-            messagebox.showinfo("完成", summary_message)
-            self.log_to_debug_window(f"\n🎉 {summary_message}")
-            self.log_to_debug_window("\n💡 提示：处理完成的文件可能正在被系统占用，请稍等几秒后再打开。")
-
-    
+                    self.ui_queue.put(('progress', (i + 1, len(file_list))))
         except Exception as e:
             logging.error(f"处理过程中发生严重错误: {e}", exc_info=True)
             self.log_to_debug_window(f"\n❌ 处理过程中发生严重错误：\n{e}")
-            messagebox.showerror("错误", f"处理过程中发生错误：\n{e}")
+            error = e
         finally:
-            processor.quit_com_app()
+            if processor is not None:
+                processor.quit_com_app()
+            if cache is not None:
+                cache.prune()
+                cache.close()
+            if len(file_stats) > 1:
+                self.log_to_debug_window(f"\n📊 处理统计（{len(file_stats)}个文件合计）：{format_summary(aggregate_stats(file_stats))}")
             self.log_to_debug_window("\n💡 所有任务完成，WPS/Word应用已关闭，现在可以安全地打开处理后的文件了。")
+            self.ui_queue.put(('done', (success_count, fail_count, error)))
+
+    def _on_processing_finished(self, success_count, fail_count, error):
+        """主线程：处理线程结束后恢复按钮并显示汇总"""
+        self.start_button.config(state='normal')
+        self.cancel_button.config(state='disabled')
+        if error is not None:
+            messagebox.showerror("错误", f"处理过程中发生错误：\n{error}")
+            return
+
+        summary_message = f"批量处理完成！\n\n成功: {success_count}个\n失败: {fail_count}个"
+        if self.cancel_event.is_set():
+            summary_message = f"批量处理已取消！\n\n成功: {success_count}个\n失败: {fail_count}个"
+        if fail_count > 0: summary_message += "\n\n失败详情请查看日志窗口。"
+        self._flush_log_lines([f"\n🎉 {summary_message}",
+                               "\n💡 提示：处理完成的文件可能正在被系统占用，请稍等几秒后再打开。"])
+        messagebox.showinfo("完成", summary_message)
+
+def _preload_processing_modules():
+    """后台导入排版模块，导入失败时留到处理文件时再报告"""
+    try:
+        import modules.word_processor  # noqa: F401
+    except Exception as e:
+        logging.debug(f"预先导入排版模块失败: {e}")
 
 if __name__ == "__main__":
+    # 单文档并行排版使用多进程，打包为 .exe 后子进程需经此入口启动
+    multiprocessing.freeze_support()
     root = TkinterDnD.Tk()
     app = WordFormatterGUI(root)
     root.mainloop()
\ No newline at end of file
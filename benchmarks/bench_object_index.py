@@ -0,0 +1,77 @@
+"""
+图片检测基准测试：逐段序列化 XML 字符串匹配 vs 一次后代元素扫描建立索引
+
+用法（在项目根目录执行）:
+    python -m benchmarks.bench_object_index --paragraphs 2000 --pictures 3
+"""
+import argparse
+import io
+
+from docx import Document
+from docx.shared import Inches
+
+from benchmarks.corpus import best_of, png_bytes, time_call
+from modules.block_classifier import BlockClassifier, HAS_PICTURE, HAS_OBJECT
+from modules.document_formatter import DocumentFormatter
+
+
+def build_image_heavy_document(paragraphs, pictures_per_paragraph):
+    """每隔一段插入一个包含多张图片的段落"""
+    doc = Document()
+    png = png_bytes(64, 64)
+    for i in range(paragraphs):
+        if i % 2:
+            run = doc.add_paragraph().add_run()
+            for _ in range(pictures_per_paragraph):
+                run.add_picture(io.BytesIO(png), width=Inches(1))
+        else:
+            doc.add_paragraph(f"图{i} 示意图，正文内容 " * 3)
+    # 重新打开，模拟从磁盘加载的文档
+    stream = io.BytesIO()
+    doc.save(stream)
+    stream.seek(0)
+    return Document(stream)
+
+
+def scan_by_serialization(all_blocks):
+    """原有做法：每个段落序列化为字符串后查找标签"""
+    flags = []
+    for block in all_blocks:
+        p_xml = block._p.xml
+        flag = 0
+        if '<w:drawing>' in p_xml or '<w:pict>' in p_xml:
+            flag |= HAS_PICTURE
+        if '<w:object>' in p_xml:
+            flag |= HAS_OBJECT
+        flags.append(flag)
+    return flags
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='图片检测基准测试')
+    parser.add_argument('--paragraphs', type=int, default=2000, help='段落数')
+    parser.add_argument('--pictures', type=int, default=3, help='每个图片段落中的图片数')
+    parser.add_argument('--repeat', type=int, default=5, help='重复次数，取最短耗时')
+    args = parser.parse_args(argv)
+
+    doc = build_image_heavy_document(args.paragraphs, args.pictures)
+    all_blocks = list(DocumentFormatter({})._iter_block_items(doc))
+    classifier = BlockClassifier({})
+    body = doc.element.body
+
+    # 两种做法的检测结果必须一致（本基准只含图片段落）
+    serialized = [bool(f & HAS_PICTURE) for f in scan_by_serialization(all_blocks)]
+    indexed = [bool(f & HAS_PICTURE) for f in classifier.build_object_index(body, all_blocks)]
+    assert serialized == indexed, "两种检测方式结果不一致"
+
+    serialize_time = best_of(lambda: time_call(scan_by_serialization, all_blocks), args.repeat)
+    index_time = best_of(lambda: time_call(classifier.build_object_index, body, all_blocks), args.repeat)
+
+    print(f"段落数: {len(all_blocks)}，图片段落: {sum(indexed)}，每段图片: {args.pictures}")
+    print(f"逐段序列化匹配: {serialize_time * 1000:.1f} ms")
+    print(f"后代元素索引:   {index_time * 1000:.1f} ms")
+    print(f"加速比: {serialize_time / index_time:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
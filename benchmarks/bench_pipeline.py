@@ -0,0 +1,269 @@
+"""
+排版流程基准测试：按阶段统计 format_document 的耗时、吞吐量和峰值内存，并与基线比较
+
+阶段：load（读入、预处理）、caption_scan（图表标题扫描及格式化）、classify（对象索引、文本提取、分类）、
+apply（逐块格式化）、txt_build（TXT流式生成，含分类和格式化）、page_setup、save，
+未归入以上阶段的时间计入 other。各阶段为独占时间（不含嵌套阶段）。
+
+每个用例在独立子进程中运行，峰值内存互不影响；重复多次时取总耗时最短的一次。
+
+用法（在项目根目录执行）:
+    python -m benchmarks.bench_pipeline --case docx_medium --case txt_medium --repeat 3
+    python -m benchmarks.bench_pipeline --output results.json --save-baseline
+    python -m benchmarks.bench_pipeline --baseline benchmarks/baseline.json --tolerance 0.15
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import time
+import zipfile
+from collections import defaultdict
+
+from benchmarks.corpus import CORPUS_PRESETS, ensure_corpus
+
+STAGES = ('load', 'caption_scan', 'classify', 'apply', 'txt_build', 'page_setup', 'save', 'other')
+DEFAULT_CASES = ('docx_small', 'docx_medium', 'docx_tables', 'txt_medium')
+DEFAULT_BASELINE = os.path.join('benchmarks', 'baseline.json')
+
+
+class StageTimer:
+    """包装对象方法，累计各阶段的独占耗时"""
+
+    def __init__(self):
+        self.timings = defaultdict(float)
+        self._stack = []
+        self._originals = []
+
+    def wrap(self, obj, name, stage):
+        original = getattr(obj, name)
+        self._originals.append((obj, name, obj.__dict__.get(name)))
+
+        def timed(*args, **kwargs):
+            frame = [time.perf_counter(), 0.0]
+            self._stack.append(frame)
+            try:
+                return original(*args, **kwargs)
+            finally:
+                self._stack.pop()
+                elapsed = time.perf_counter() - frame[0]
+                self.timings[stage] += elapsed - frame[1]
+                if self._stack:
+                    self._stack[-1][1] += elapsed
+
+        setattr(obj, name, timed)
+
+    def restore(self):
+        """恢复被包装的方法"""
+        for obj, name, original in reversed(self._originals):
+            if original is None:
+                delattr(obj, name)
+            else:
+                setattr(obj, name, original)
+        self._originals.clear()
+
+
+def _peak_rss_mb():
+    """当前进程的峰值常驻内存（MB），无法获取时返回None"""
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+        except ImportError:
+            return None
+        info = psutil.Process().memory_info()
+        return getattr(info, 'peak_wset', info.rss) / 1024 / 1024
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以KB为单位，macOS 以字节为单位
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def count_paragraphs(path):
+    """输入文档中的段落数：.docx 为 document.xml 中的 <w:p> 数（含表格内），.txt 为行数"""
+    if path.lower().endswith('.txt'):
+        with open(path, 'rb') as f:
+            return sum(1 for _ in f)
+    with zipfile.ZipFile(path) as z:
+        xml = z.read('word/document.xml')
+    return xml.count(b'<w:p>') + xml.count(b'<w:p ')
+
+
+def _instrumented_processor(config):
+    from docx.document import Document as _Document
+    from modules.streaming_engine import StreamingDocument
+    from modules.word_processor import WordProcessor
+
+    timer = StageTimer()
+    processor = WordProcessor(config, lambda message: None)
+    timer.wrap(processor, '_load_stream', 'load')
+    timer.wrap(processor, '_open_document', 'load')
+    # 流式排版：第一遍扫描计入分类，第二遍在保存时逐块格式化（格式化部分计入 apply）
+    timer.wrap(processor.streaming_formatter, '_scan', 'classify')
+    timer.wrap(processor.caption_linker, 'link', 'caption_scan')
+    timer.wrap(processor, '_format_caption', 'caption_scan')
+    timer.wrap(processor.block_classifier, 'build_object_index', 'classify')
+    timer.wrap(processor.block_classifier, 'extract_texts', 'classify')
+    timer.wrap(processor.block_classifier, 'classify', 'classify')
+    timer.wrap(processor, '_apply_block_records', 'apply')
+    timer.wrap(processor, '_build_txt_document', 'txt_build')
+    timer.wrap(processor.page_setup, '_apply_page_setup', 'page_setup')
+    # 保存在 format_document 内部调用，只在基准子进程中包装
+    timer.wrap(_Document, 'save', 'save')
+    timer.wrap(StreamingDocument, 'save', 'save')
+    return processor, timer
+
+
+def run_case(case, path, repeat, config_overrides):
+    """在子进程中运行一个用例，返回结果字典"""
+    from modules.config_manager import ConfigManager
+
+    config = dict(ConfigManager().default_format_params, **config_overrides)
+    best = None
+    for _ in range(repeat):
+        processor, timer = _instrumented_processor(config)
+        start = time.perf_counter()
+        try:
+            processor.format_document(path)
+            total = time.perf_counter() - start
+        finally:
+            timer.restore()
+            processor.quit_com_app()
+        if best is None or total < best[0]:
+            best = (total, dict(timer.timings))
+
+    total, timings = best
+    stages = {stage: round(timings.get(stage, 0.0), 4) for stage in STAGES if stage != 'other'}
+    stages['other'] = round(max(total - sum(timings.values()), 0.0), 4)
+    size = os.path.getsize(path)
+    paragraphs = count_paragraphs(path)
+    peak_rss = _peak_rss_mb()
+    return {
+        'case': case,
+        'file': os.path.basename(path),
+        'size_bytes': size,
+        'paragraphs': paragraphs,
+        'repeat': repeat,
+        'total_s': round(total, 4),
+        'stages_s': stages,
+        'paragraphs_per_s': round(paragraphs / total, 1) if total else None,
+        'mb_per_s': round(size / 1024 / 1024 / total, 3) if total else None,
+        'peak_rss_mb': round(peak_rss, 1) if peak_rss is not None else None,
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(cases, corpus_dir, repeat=1, config_overrides=None, regenerate=False):
+    """
+    生成语料并逐个用例运行基准测试
+
+    Returns:
+        dict: {'meta': 运行环境信息, 'results': 各用例结果}
+    """
+    import docx
+
+    paths = ensure_corpus(corpus_dir, cases, regenerate)
+    results = []
+    # spawn：每个用例一个全新进程，峰值内存只反映该用例
+    context = multiprocessing.get_context('spawn')
+    for case in cases:
+        with context.Pool(1) as pool:
+            result = pool.apply(run_case, (case, paths[case], repeat, config_overrides or {}))
+        results.append(result)
+        print(f"{case:<14} {result['total_s']:8.3f}s  {result['paragraphs_per_s']:>10} 段/s  "
+              f"{result['mb_per_s']:>7} MB/s  峰值 {result['peak_rss_mb']} MB")
+    return {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'git_revision': _git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'python_docx': getattr(docx, '__version__', None),
+            'repeat': repeat,
+            'config_overrides': config_overrides or {},
+        },
+        'results': results,
+    }
+
+
+def compare_with_baseline(report, baseline, tolerance):
+    """
+    与基线比较各用例总耗时和各阶段耗时
+
+    Args:
+        report (dict): 本次结果
+        baseline (dict): 基线结果
+        tolerance (float): 允许的变慢比例，如 0.15 表示慢15%以内不算退化
+
+    Returns:
+        list: 退化的用例名称
+    """
+    baseline_results = {result['case']: result for result in baseline.get('results', [])}
+    regressions = []
+    print(f"\n与基线比较（{baseline.get('meta', {}).get('git_revision')} @ {baseline.get('meta', {}).get('timestamp')}，"
+          f"允许变慢 {tolerance:.0%}）")
+    for result in report['results']:
+        base = baseline_results.get(result['case'])
+        if base is None:
+            print(f"  {result['case']:<14} 基线中没有该用例")
+            continue
+        ratio = result['total_s'] / base['total_s'] if base['total_s'] else float('inf')
+        regressed = ratio > 1 + tolerance
+        if regressed:
+            regressions.append(result['case'])
+        print(f"  {result['case']:<14} {base['total_s']:8.3f}s -> {result['total_s']:8.3f}s  "
+              f"x{ratio:.2f}{'  ⚠ 退化' if regressed else ''}")
+        for stage in STAGES:
+            before, after = base['stages_s'].get(stage, 0.0), result['stages_s'].get(stage, 0.0)
+            if before or after:
+                print(f"      {stage:<13} {before:8.3f}s -> {after:8.3f}s")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='排版流程分阶段基准测试')
+    parser.add_argument('--case', action='append', choices=sorted(CORPUS_PRESETS),
+                        help=f"要运行的用例，可重复指定，默认 {', '.join(DEFAULT_CASES)}")
+    parser.add_argument('--corpus-dir', default=os.path.join('benchmarks', 'corpus'), help='语料目录')
+    parser.add_argument('--regenerate', action='store_true', help='重新生成语料')
+    parser.add_argument('--repeat', type=int, default=1, help='每个用例的重复次数，取最短耗时')
+    parser.add_argument('--config', default='{}', help='覆盖排版配置的JSON，如 \'{"style_mode": true}\'')
+    parser.add_argument('--output', help='结果JSON文件路径')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='基线JSON文件路径')
+    parser.add_argument('--save-baseline', action='store_true', help='将本次结果保存为基线')
+    parser.add_argument('--tolerance', type=float, default=0.15, help='允许的变慢比例，超过时返回非零退出码')
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.case or list(DEFAULT_CASES), args.corpus_dir, args.repeat,
+                            json.loads(args.config), args.regenerate)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存至: {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"基线已保存至: {args.baseline}")
+        return 0
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if compare_with_baseline(report, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,114 @@
+"""
+run字体设置基准测试：逐run经过 python-docx 属性设置器 vs 复制/合并缓存的 <w:rPr> 模板
+
+用法（在项目根目录执行）:
+    python -m benchmarks.bench_run_font --runs 100000
+"""
+import argparse
+import time
+from copy import deepcopy
+
+from docx.oxml import OxmlElement, parse_xml
+from docx.oxml.ns import nsdecls, qn
+from docx.shared import Pt, RGBColor
+from docx.text.paragraph import Paragraph
+
+from modules.run_formatter import RunFormatter
+
+RUNS_PER_PARAGRAPH = 10
+
+# 一半run不带格式，一半带有从Word中常见的已有格式
+_PLAIN_RUN = '<w:r %s><w:t>正文内容 text 123</w:t></w:r>' % nsdecls('w')
+_FORMATTED_RUN = ('<w:r %s><w:rPr><w:rFonts w:hint="eastAsia" w:ascii="Calibri"/><w:i/>'
+                  '<w:sz w:val="21"/></w:rPr><w:t>正文内容 text 123</w:t></w:r>') % nsdecls('w')
+
+
+def build_body(run_count):
+    """构建包含指定数量run的 <w:body>"""
+    body = OxmlElement('w:body')
+    plain, formatted = parse_xml(_PLAIN_RUN), parse_xml(_FORMATTED_RUN)
+    for i in range(0, run_count, RUNS_PER_PARAGRAPH):
+        p = OxmlElement('w:p')
+        for j in range(min(RUNS_PER_PARAGRAPH, run_count - i)):
+            p.append(deepcopy(formatted if j % 2 else plain))
+        body.append(p)
+    return body
+
+
+def legacy_set_run_font(run, font_name, size_pt, set_color=False, is_bold=False, use_times_roman_for_ascii=False):
+    """原有做法：通过 python-docx 属性设置器逐项设置，再设置 rFonts 并探测主题属性"""
+    run.font.name = font_name
+    run.font.size = Pt(size_pt)
+    run.font.bold = is_bold
+    if set_color:
+        run.font.color.rgb = RGBColor(0, 0, 0)
+    rFonts = run._r.get_or_add_rPr().get_or_add_rFonts()
+    ascii_font = "Times New Roman" if use_times_roman_for_ascii else font_name
+    rFonts.set(qn('w:ascii'), ascii_font)
+    rFonts.set(qn('w:hAnsi'), ascii_font)
+    rFonts.set(qn('w:eastAsia'), font_name)
+    rFonts.set(qn('w:cs'), font_name)
+    for name in ('themeFont', 'themeFontAscii', 'themeFontHAnsi', 'themeFontEastAsia', 'themeFontCs'):
+        if hasattr(rFonts, name):
+            setattr(rFonts, name, None)
+
+
+def format_legacy(body):
+    for p in body.iterchildren(qn('w:p')):
+        for run in Paragraph(p, None).runs:
+            legacy_set_run_font(run, '宋体', 12, set_color=True, use_times_roman_for_ascii=True)
+
+
+def format_with_templates(body, run_formatter):
+    for p in body.iterchildren(qn('w:p')):
+        run_formatter.apply_to_runs(p.r_lst, '宋体', 12, is_bold=False, set_color=True,
+                                    use_times_roman_for_ascii=True)
+
+
+def canonical(body):
+    """属性按名称排序后序列化，用于比较两种做法的结果"""
+    body = deepcopy(body)
+    for element in body.iter():
+        items = sorted(element.attrib.items())
+        element.attrib.clear()
+        element.attrib.update(items)
+    return body.xml
+
+
+def time_on_fresh_copy(func, source, repeat):
+    """每次在新的副本上计时（复制不计入耗时），取最短耗时"""
+    timings = []
+    for _ in range(repeat):
+        body = deepcopy(source)
+        start = time.perf_counter()
+        func(body)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='run字体设置基准测试')
+    parser.add_argument('--runs', type=int, default=100000, help='run数量')
+    parser.add_argument('--repeat', type=int, default=1, help='重复次数，取最短耗时')
+    args = parser.parse_args(argv)
+
+    source = build_body(args.runs)
+    run_formatter = RunFormatter()
+
+    # 两种做法的结果必须一致
+    legacy_body, template_body = deepcopy(source), deepcopy(source)
+    format_legacy(legacy_body)
+    format_with_templates(template_body, run_formatter)
+    assert canonical(legacy_body) == canonical(template_body), "两种做法的格式化结果不一致"
+
+    legacy_time = time_on_fresh_copy(format_legacy, source, args.repeat)
+    template_time = time_on_fresh_copy(lambda body: format_with_templates(body, run_formatter), source, args.repeat)
+
+    print(f"run数量: {args.runs}")
+    print(f"属性设置器逐项设置: {legacy_time * 1000:.1f} ms")
+    print(f"缓存rPr模板:       {template_time * 1000:.1f} ms")
+    print(f"加速比: {legacy_time / template_time:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+"""
+启动耗时基准测试：程序入口的导入耗时（-X importtime）、到第一个窗口显示的时间、到第一个文件排版完成的时间
+
+每项在新的解释器子进程中测量，从启动子进程开始计时，分为解释器启动、导入和窗口创建/排版三部分；
+重复多次时取总耗时最短的一次。导入报告列出入口模块直接导入的各模块的累计耗时，
+并检查 python-docx、requests、win32com 是否在启动时被导入（应在首次使用时才导入）。
+
+超过预算或启动时导入了应延迟导入的模块时返回非零退出码。没有图形界面（或未安装 tkinterdnd2）时
+跳过窗口一项，不计为失败。
+
+用法（在项目根目录执行）:
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --repeat 5 --window-budget-ms 1500 --file-budget-ms 3000
+    python -m benchmarks.bench_startup --case docx_medium --output startup.json
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+from benchmarks.corpus import CORPUS_PRESETS, best_of, ensure_corpus
+
+# 程序启动时不应导入的模块（顶层包名）
+DEFERRED_MODULES = ('docx', 'requests', 'win32com', 'pythoncom')
+DEFAULT_ENTRY = 'WordFormatter'
+DEFAULT_WINDOW_BUDGET_MS = 1500
+DEFAULT_FILE_BUDGET_MS = 3000
+
+# import time:  自身(us) | 累计(us) | 缩进 + 模块名
+_IMPORTTIME_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+# 子进程：导入入口模块并创建主窗口，处理完第一批界面事件即为窗口已显示
+_WINDOW_SCRIPT = """
+import time
+_start = time.perf_counter()
+import json, sys
+entry = __import__(sys.argv[1])
+_imported = time.perf_counter()
+root = entry.TkinterDnD.Tk()
+app = entry.WordFormatterGUI(root)
+root.update()
+_done = time.perf_counter()
+print(json.dumps({'imports': _imported - _start, 'work': _done - _imported}), flush=True)
+root.destroy()
+"""
+
+# 子进程：与界面处理文件相同，加载排版配置后排版一个文件
+_FILE_SCRIPT = """
+import time
+_start = time.perf_counter()
+import json, sys
+from modules.config_manager import ConfigManager
+from modules.word_processor import WordProcessor
+_imported = time.perf_counter()
+config = ConfigManager('default_config.json').load_config()
+processor = WordProcessor(config, lambda message: None)
+processor.format_document(sys.argv[1], sys.argv[2])
+_done = time.perf_counter()
+processor.quit_com_app()
+print(json.dumps({'imports': _imported - _start, 'work': _done - _imported}), flush=True)
+"""
+
+
+def parse_importtime(stderr):
+    """
+    解析 -X importtime 的输出
+
+    Returns:
+        list: (模块名, 嵌套层级, 自身耗时ms, 累计耗时ms)，按导入完成的顺序
+    """
+    entries = []
+    for line in stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            entries.append((name, (len(indent) - 1) // 2, int(self_us) / 1000, int(cumulative_us) / 1000))
+    return entries
+
+
+def import_report(entry, top=15):
+    """
+    在子进程中以 -X importtime 导入入口模块
+
+    Returns:
+        dict: total_ms（入口模块的累计导入耗时）、top（入口模块直接导入的模块，按累计耗时降序）、
+              deferred（启动时被导入的应延迟导入的模块）；导入失败时只有 error
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {entry}'],
+                            capture_output=True, text=True, encoding='utf-8', errors='replace')
+    entries = parse_importtime(result.stderr)
+    if result.returncode != 0:
+        return {'error': _last_line(result.stderr)}
+
+    # 入口模块最后导入完成，其直接导入的模块是紧挨在它之前、层级为1的各项
+    total_ms = 0.0
+    children = []
+    for index in range(len(entries) - 1, -1, -1):
+        name, level, _, cumulative_ms = entries[index]
+        if level == 0 and name == entry:
+            total_ms = cumulative_ms
+            for child_name, child_level, _, child_ms in reversed(entries[:index]):
+                if child_level == 0:
+                    break
+                if child_level == 1:
+                    children.append((child_name, round(child_ms, 1)))
+            break
+    deferred = sorted({name.split('.')[0] for name, _, _, _ in entries} & set(DEFERRED_MODULES))
+    children.sort(key=lambda item: item[1], reverse=True)
+    return {'total_ms': round(total_ms, 1), 'top': children[:top], 'deferred': deferred}
+
+
+def _last_line(text):
+    lines = [line for line in text.strip().splitlines() if line.strip()]
+    return lines[-1] if lines else '未知错误'
+
+
+def time_child(script, args, timeout=300):
+    """
+    启动子进程运行脚本，计时到子进程输出结果
+
+    Returns:
+        dict: total_ms、startup_ms（解释器启动）、imports_ms、work_ms；失败时只有 error
+    """
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, '-c', script] + list(args), stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE, text=True, encoding='utf-8', errors='replace')
+    line = process.stdout.readline()
+    total = time.perf_counter() - start
+    try:
+        _, stderr = process.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        _, stderr = process.communicate()
+    try:
+        timings = json.loads(line)
+    except ValueError:
+        return {'error': _last_line(stderr)}
+    return {
+        'total_ms': round(total * 1000, 1),
+        'startup_ms': round((total - timings['imports'] - timings['work']) * 1000, 1),
+        'imports_ms': round(timings['imports'] * 1000, 1),
+        'work_ms': round(timings['work'] * 1000, 1),
+    }
+
+
+def _by_total(result):
+    """best_of 的比较依据：取总耗时最短的一次，任一次失败时取失败结果"""
+    return 'error' not in result, result.get('total_ms', 0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='启动耗时基准测试')
+    parser.add_argument('--entry', default=DEFAULT_ENTRY, help='程序入口模块')
+    parser.add_argument('--case', default='docx_small', choices=sorted(CORPUS_PRESETS), help='首个文件使用的语料')
+    parser.add_argument('--corpus-dir', default=os.path.join('benchmarks', 'corpus'), help='语料目录')
+    parser.add_argument('--repeat', type=int, default=3, help='每项的重复次数，取最短耗时')
+    parser.add_argument('--top', type=int, default=15, help='导入报告列出的模块数')
+    parser.add_argument('--window-budget-ms', type=float, default=DEFAULT_WINDOW_BUDGET_MS, help='到第一个窗口显示的预算（毫秒）')
+    parser.add_argument('--file-budget-ms', type=float, default=DEFAULT_FILE_BUDGET_MS, help='到第一个文件排版完成的预算（毫秒）')
+    parser.add_argument('--output', help='结果JSON文件路径')
+    args = parser.parse_args(argv)
+
+    path = ensure_corpus(args.corpus_dir, [args.case])[args.case]
+    output_path = os.path.join(args.corpus_dir, f'startup_{args.case}_out.{CORPUS_PRESETS[args.case]["kind"]}')
+    try:
+        report = {
+            'imports': import_report(args.entry, args.top),
+            'first_window': best_of(lambda: time_child(_WINDOW_SCRIPT, [args.entry]), args.repeat, _by_total),
+            'first_file': best_of(lambda: time_child(_FILE_SCRIPT, [path, output_path]), args.repeat, _by_total),
+        }
+    finally:
+        if os.path.exists(output_path):
+            os.remove(output_path)
+
+    failed = False
+    imports = report['imports']
+    if 'error' in imports:
+        print(f"导入 {args.entry}: 失败 {imports['error']}")
+    else:
+        print(f"导入 {args.entry}: {imports['total_ms']:.1f}ms（-X importtime 累计，含入口模块直接导入的以下模块）")
+        for name, cumulative_ms in imports['top']:
+            print(f"    {name:<32} {cumulative_ms:>8.1f}ms")
+        if imports['deferred']:
+            failed = True
+            print(f"    启动时导入了应延迟导入的模块: {', '.join(imports['deferred'])}")
+
+    print(f"{'阶段':<14}{'总计':>10}{'解释器启动':>12}{'导入':>10}{'窗口/排版':>10}{'预算':>10}")
+    for stage, budget in (('first_window', args.window_budget_ms), ('first_file', args.file_budget_ms)):
+        result = report[stage]
+        if 'error' in result:
+            # 没有图形界面时无法创建窗口，不计为失败；排版失败则计为失败
+            failed = failed or stage == 'first_file'
+            print(f"{stage:<14}{'跳过' if stage == 'first_window' else '失败'}: {result['error']}")
+            continue
+        over = result['total_ms'] > budget
+        failed = failed or over
+        result['budget_ms'] = budget
+        print(f"{stage:<14}{result['total_ms']:>10.1f}{result['startup_ms']:>12.1f}{result['imports_ms']:>10.1f}"
+              f"{result['work_ms']:>10.1f}{budget:>10.0f}  {'超出预算' if over else '通过'}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,262 @@
+"""
+合成基准语料生成器：生成可控规模的 .docx / .txt 测试文档
+
+文档内容模拟常见报告：一、/（一）/1.1/1.1.1 各级标题（部分使用标题样式，部分为纯文本编号）、
+带已有格式的正文段落、空行、带合并单元格和内部标题的表格、图片及图表标题。
+
+用法（在项目根目录执行）:
+    python -m benchmarks.corpus --output benchmarks/corpus
+    python -m benchmarks.corpus --output benchmarks/corpus --preset docx_large
+
+另提供各基准测试共用的 png_bytes（生成图片）、time_call 和 best_of（重复计时取最短）。
+"""
+import argparse
+import io
+import os
+import random
+import struct
+import time
+import zlib
+
+from docx import Document
+from docx.shared import Inches, Pt, RGBColor
+
+# 预设语料：名称 -> 生成参数
+CORPUS_PRESETS = {
+    'docx_small': dict(kind='docx', paragraphs=200, tables=4, images=2),
+    'docx_medium': dict(kind='docx', paragraphs=2000, tables=20, images=10),
+    'docx_large': dict(kind='docx', paragraphs=20000, tables=100, images=40),
+    'docx_tables': dict(kind='docx', paragraphs=500, tables=60, table_rows=20, table_cols=6, images=0),
+    # 图片较多的报告：40 张约 1MB 的照片类图片（压缩率低），用于测试保存时复制媒体部件的耗时
+    'docx_media': dict(kind='docx', paragraphs=500, tables=5, images=40, image_kb=1024),
+    'txt_medium': dict(kind='txt', paragraphs=20000),
+    'txt_large': dict(kind='txt', paragraphs=200000),
+}
+
+# 各级标题编号样式及其在标题中的占比
+_HEADING_LEVELS = ((1, 0.15), (2, 0.25), (3, 0.35), (4, 0.25))
+_CHINESE_NUMBERS = "一二三四五六七八九十"
+_BODY_SENTENCES = (
+    "本工程位于江西省中部，主要建设内容包括堤防加固、穿堤建筑物改造及配套管理设施。",
+    "根据水文分析成果，设计洪水标准采用 20 年一遇，相应洪峰流量为 1250 m³/s。",
+    "The design follows GB 50201-2014 and SL 252-2017, with a safety factor of 1.25.",
+    "施工期间应做好围堰防护和基坑排水，确保汛期安全度汛。",
+    "经计算，工程静态总投资 3.62 亿元，其中建筑工程 2.15 亿元。",
+)
+
+
+def png_bytes(width=8, height=8, rng=None):
+    """生成一张PNG图片：默认纯色，传入 rng 时为随机噪点（与照片一样几乎不可压缩）"""
+    if rng is None:
+        raw = b''.join(b'\x00' + b'\x3c\x78\xb4' * width for _ in range(height))
+    else:
+        raw = b''.join(b'\x00' + rng.randbytes(width * 3) for _ in range(height))
+
+    def chunk(tag, data):
+        return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff)
+
+    header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) + chunk(b'IDAT', zlib.compress(raw)) + chunk(b'IEND', b'')
+
+
+def time_call(func, *args):
+    """调用 func(*args)，返回耗时（秒）"""
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def best_of(measure, repeat, key=None):
+    """
+    重复测量，返回最小（最快）的一次结果
+
+    Args:
+        measure (callable): 无参数的测量函数，返回耗时或测量结果
+        repeat (int): 重复次数，至少测量一次
+        key (callable): 从测量结果中取出比较值，默认直接比较结果
+
+    Returns:
+        最小的一次测量结果
+    """
+    return min((measure() for _ in range(max(1, repeat))), key=key)
+
+
+class _HeadingNumbers:
+    """按 一、/（一）/1.1/1.1.1 规则生成连续的标题编号"""
+
+    def __init__(self):
+        self.counters = [0, 0, 0, 0]
+
+    def next(self, level):
+        self.counters[level - 1] += 1
+        for deeper in range(level, 4):
+            self.counters[deeper] = 0
+        h1, h2, h3, h4 = (max(count, 1) for count in self.counters)
+        if level == 1:
+            return f"{_CHINESE_NUMBERS[(h1 - 1) % 10]}、"
+        if level == 2:
+            return f"（{_CHINESE_NUMBERS[(h2 - 1) % 10]}）"
+        if level == 3:
+            return f"{h2}.{h3} "
+        return f"{h2}.{h3}.{h4} "
+
+
+def _pick_heading_level(rng):
+    roll, total = rng.random(), 0.0
+    for level, share in _HEADING_LEVELS:
+        total += share
+        if roll < total:
+            return level
+    return _HEADING_LEVELS[-1][0]
+
+
+def _body_text(rng):
+    return "".join(rng.choice(_BODY_SENTENCES) for _ in range(rng.randint(1, 4)))
+
+
+def generate_docx(path, paragraphs=2000, heading_ratio=0.1, empty_ratio=0.05, tables=20, table_rows=8,
+                  table_cols=4, merged_cells=True, images=10, image_kb=0, seed=1):
+    """
+    生成合成 .docx 文档
+
+    Args:
+        path (str): 输出路径
+        paragraphs (int): 正文区段落数（不含表格内段落）
+        heading_ratio (float): 标题段落占比
+        empty_ratio (float): 空行占比
+        tables (int): 表格数量，每个表格前带"表X-Y"标题
+        table_rows (int): 每个表格的行数
+        table_cols (int): 每个表格的列数
+        merged_cells (bool): 是否在表头和首列生成合并单元格
+        images (int): 图片数量，每张图片后带"图X-Y"标题
+        image_kb (int): 为0时所有图片为同一张小图；大于0时每张图片不同，大小约为该值（KB）
+        seed (int): 随机种子，相同参数生成相同内容
+    """
+    rng = random.Random(seed)
+    doc = Document()
+    numbers = _HeadingNumbers()
+    png = png_bytes()
+
+    # 表格和图片均匀插入正文中
+    table_slots = {int((i + 1) * paragraphs / (tables + 1)) for i in range(tables)}
+    image_slots = {int((i + 0.5) * paragraphs / max(images, 1)) for i in range(images)}
+    table_no = image_no = 0
+
+    doc.add_paragraph("某某水利工程初步设计报告")
+    for index in range(paragraphs):
+        roll = rng.random()
+        if roll < heading_ratio:
+            level = _pick_heading_level(rng)
+            text = numbers.next(level) + rng.choice(("工程概况", "水文", "工程地质", "工程布置及建筑物", "施工组织设计"))
+            if level <= 2 and rng.random() < 0.5:
+                # 一部分标题使用标题样式（大纲级别），另一部分只有文本编号
+                doc.add_paragraph(text, style=f'Heading {level}')
+            else:
+                doc.add_paragraph(text)
+        elif roll < heading_ratio + empty_ratio:
+            doc.add_paragraph("")
+        else:
+            para = doc.add_paragraph("    " + _body_text(rng))
+            if rng.random() < 0.3:
+                run = para.add_run("（加粗红色说明）")
+                run.bold = True
+                run.font.color.rgb = RGBColor(0xC0, 0, 0)
+                run.font.size = Pt(14)
+
+        if index in table_slots:
+            table_no += 1
+            doc.add_paragraph(f"表{table_no // 10 + 1}-{table_no} 主要技术指标表")
+            _add_table(doc, rng, table_rows, table_cols, merged_cells)
+        if index in image_slots:
+            image_no += 1
+            if image_kb:
+                side = int((image_kb * 1024 / 3) ** 0.5)
+                png = png_bytes(side, side, rng)
+            doc.add_paragraph().add_run().add_picture(io.BytesIO(png), width=Inches(1))
+            doc.add_paragraph(f"图{image_no // 10 + 1}-{image_no} 工程位置示意图")
+
+    doc.save(path)
+
+
+def _add_table(doc, rng, rows, cols, merged_cells):
+    table = doc.add_table(rows=rows, cols=cols)
+    table.style = 'Table Grid'
+    for r, row in enumerate(table.rows):
+        for c, cell in enumerate(row.cells):
+            cell.text = f"项目{c + 1}" if r == 0 else f"{rng.uniform(0, 1000):.2f}"
+            if r and rng.random() < 0.2:
+                cell.paragraphs[0].runs[0].font.size = Pt(9)
+    if merged_cells and rows > 2 and cols > 2:
+        # 表头横向合并、首列纵向合并，row.cells 会重复返回合并单元格
+        table.cell(0, 0).merge(table.cell(0, 1))
+        table.cell(1, 0).merge(table.cell(2, 0))
+
+
+def generate_txt(path, paragraphs=20000, heading_ratio=0.1, empty_ratio=0.1, caption_ratio=0.01, seed=1,
+                 encoding='utf-8'):
+    """
+    生成合成 .txt 文档
+
+    Args:
+        path (str): 输出路径
+        paragraphs (int): 行数
+        heading_ratio (float): 标题行占比
+        empty_ratio (float): 空行占比
+        caption_ratio (float): 以"表"开头的行占比
+        seed (int): 随机种子
+        encoding (str): 文件编码
+    """
+    rng = random.Random(seed)
+    numbers = _HeadingNumbers()
+    with open(path, 'w', encoding=encoding, newline='\n') as f:
+        for _ in range(paragraphs):
+            roll = rng.random()
+            if roll < heading_ratio:
+                line = numbers.next(_pick_heading_level(rng)) + "工程概况"
+            elif roll < heading_ratio + empty_ratio:
+                line = ""
+            elif roll < heading_ratio + empty_ratio + caption_ratio:
+                line = "表1 主要指标"
+            else:
+                line = "\t" + _body_text(rng) if rng.random() < 0.2 else _body_text(rng)
+            f.write(line + "\n")
+
+
+def ensure_corpus(output_dir, presets=None, regenerate=False):
+    """
+    生成（或复用已生成的）预设语料
+
+    Args:
+        output_dir (str): 语料目录
+        presets: 预设名称列表，默认全部
+        regenerate (bool): 是否重新生成已存在的文件
+
+    Returns:
+        dict: 预设名称 -> 文件路径
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    paths = {}
+    for name in presets or CORPUS_PRESETS:
+        params = dict(CORPUS_PRESETS[name])
+        kind = params.pop('kind')
+        path = os.path.join(output_dir, f"{name}.{kind}")
+        if regenerate or not os.path.exists(path):
+            (generate_docx if kind == 'docx' else generate_txt)(path, **params)
+        paths[name] = path
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='生成合成基准语料')
+    parser.add_argument('--output', default=os.path.join('benchmarks', 'corpus'), help='语料目录')
+    parser.add_argument('--preset', action='append', choices=sorted(CORPUS_PRESETS),
+                        help='要生成的预设，可重复指定，默认全部')
+    parser.add_argument('--regenerate', action='store_true', help='重新生成已存在的文件')
+    args = parser.parse_args(argv)
+
+    for name, path in ensure_corpus(args.output, args.preset, args.regenerate).items():
+        print(f"{name:<14} {os.path.getsize(path) / 1024 / 1024:8.2f} MB  {path}")
+
+
+if __name__ == '__main__':
+    main()
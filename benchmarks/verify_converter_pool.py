@@ -0,0 +1,175 @@
+"""
+转换池检查：用模拟转换器（FakeConverter）代替WPS/Word运行转换池，不需要安装Office，可在Linux上运行
+
+检查以下各项，任一项不符合预期时返回非零退出码：
+- recycle：每个转换器处理 recycle_after 个文档后关闭并重建；
+- restart：转换器健康检查失败时重新创建，任务不受影响；
+- error：任务出错时该任务失败，出错的转换器被关闭，后续任务使用新的转换器；
+- parallel：多个转换器同时处理队列中的任务；
+- prefetch：.doc/.wps 文件提前提交转换，排版时取用转换结果，处理完成后不留临时文件。
+
+用法（在项目根目录执行）:
+    python -m benchmarks.verify_converter_pool
+    python -m benchmarks.verify_converter_pool --delay 0.3
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import zipfile
+
+from modules.converter_pool import ConverterPool, FakeConverter
+
+
+class ConverterFactory:
+    """创建模拟转换器并记录创建的所有实例"""
+
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.instances = []
+
+    def __call__(self):
+        converter = FakeConverter(**self.kwargs)
+        self.instances.append(converter)
+        return converter
+
+
+def _run_tasks(pool, count):
+    for future in [pool.submit('preprocess', 'unused.docx') for _ in range(count)]:
+        pool.result(future)
+
+
+def check_recycle(delay):
+    """1个转换器、每3个文档重建，7个任务应依次使用3个转换器实例"""
+    factory = ConverterFactory(delay=delay)
+    logs = []
+    with ConverterPool(factory, size=1, recycle_after=3, log_callback=logs.append) as pool:
+        _run_tasks(pool, 7)
+    rebuilt = sum('正在重建' in message for message in logs)
+    problems = []
+    if [converter.processed for converter in factory.instances] != [3, 3, 1]:
+        problems.append(f"各转换器处理的文档数为 {[c.processed for c in factory.instances]}，应为 [3, 3, 1]")
+    if rebuilt != 2:
+        problems.append(f"重建日志 {rebuilt} 条，应为2条")
+    if any(converter.started for converter in factory.instances):
+        problems.append("转换池关闭后仍有转换器未关闭")
+    return problems
+
+
+def check_restart(delay):
+    """转换器处理2个文档后失效，5个任务应依次使用3个转换器实例，全部成功"""
+    factory = ConverterFactory(delay=delay, fail_after=2)
+    logs = []
+    with ConverterPool(factory, size=1, recycle_after=0, log_callback=logs.append) as pool:
+        _run_tasks(pool, 5)
+    restarted = sum('已失效' in message for message in logs)
+    problems = []
+    if len(factory.instances) != 3:
+        problems.append(f"创建了 {len(factory.instances)} 个转换器，应为3个")
+    if restarted != 2:
+        problems.append(f"失效重启日志 {restarted} 条，应为2条")
+    return problems
+
+
+def check_error(delay, temp_dir):
+    """转换不存在的文件应失败并关闭该转换器，下一个任务使用新的转换器并成功"""
+    factory = ConverterFactory(delay=delay)
+    output_path = os.path.join(temp_dir, 'error_out.docx')
+    problems = []
+    with ConverterPool(factory, size=1, recycle_after=0) as pool:
+        try:
+            pool.convert_to_docx(os.path.join(temp_dir, 'missing.doc'), output_path)
+            problems.append("转换不存在的文件没有报错")
+        except OSError:
+            pass
+        pool.preprocess(output_path)
+    if len(factory.instances) != 2:
+        problems.append(f"创建了 {len(factory.instances)} 个转换器，应为2个")
+    elif factory.instances[0].started:
+        problems.append("出错的转换器没有被关闭")
+    return problems
+
+
+def check_parallel(delay):
+    """2个转换器处理6个任务，耗时应明显少于逐个处理"""
+    factory = ConverterFactory(delay=delay)
+    with ConverterPool(factory, size=2, recycle_after=0) as pool:
+        start = time.perf_counter()
+        _run_tasks(pool, 6)
+        elapsed = time.perf_counter() - start
+    problems = []
+    if len(factory.instances) != 2:
+        problems.append(f"创建了 {len(factory.instances)} 个转换器，应为2个")
+    if elapsed > delay * 6 * 0.75:
+        problems.append(f"耗时 {elapsed:.2f}s，逐个处理约 {delay * 6:.2f}s，没有并行")
+    return problems
+
+
+def check_prefetch(delay, temp_dir):
+    """提前提交2个 .doc 文件的转换后依次排版，转换结果应被取用，输出包含原文内容"""
+    from modules.config_manager import ConfigManager
+    from modules.word_processor import WordProcessor
+
+    inputs = []
+    for index, extension in enumerate(('.doc', '.wps'), 1):
+        path = os.path.join(temp_dir, f'input{index}{extension}')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(f"第{index}个文档\n正文内容。\n")
+        inputs.append(path)
+
+    factory = ConverterFactory(delay=delay)
+    problems = []
+    with ConverterPool(factory, size=2, recycle_after=0) as pool:
+        processor = WordProcessor(ConfigManager().default_format_params, temp_dir=temp_dir, converter_pool=pool)
+        processor.prefetch_conversions(inputs)
+        pending = len(processor.file_processor._pending_conversions)
+        if pending != len(inputs):
+            problems.append(f"提前提交了 {pending} 个转换，应为{len(inputs)}个")
+        for index, path in enumerate(inputs, 1):
+            output_path = path + '.out.docx'
+            try:
+                processor.format_document(path, output_path)
+            except Exception as e:
+                problems.append(f"{os.path.basename(path)} 排版失败: {e}")
+                continue
+            with zipfile.ZipFile(output_path) as z:
+                if f"第{index}个文档".encode('utf-8') not in z.read('word/document.xml'):
+                    problems.append(f"{os.path.basename(path)} 的输出中没有原文内容")
+        processor.quit_com_app()
+    if processor.file_processor._pending_conversions:
+        problems.append("仍有未取用的提前转换")
+    converted = sum(converter.processed for converter in factory.instances)
+    if converted != len(inputs):
+        problems.append(f"转换了 {converted} 次，应为{len(inputs)}次")
+    leftovers = [name for name in os.listdir(temp_dir) if name.startswith('~')]
+    if leftovers:
+        problems.append(f"留有临时文件: {leftovers}")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='转换池检查（模拟转换器）')
+    parser.add_argument('--delay', type=float, default=0.1, help='模拟转换器处理每个文档的耗时（秒）')
+    args = parser.parse_args(argv)
+
+    failed = 0
+    with tempfile.TemporaryDirectory(prefix='verify_converter_pool_') as temp_dir:
+        checks = (
+            ('recycle', lambda: check_recycle(args.delay)),
+            ('restart', lambda: check_restart(args.delay)),
+            ('error', lambda: check_error(args.delay, temp_dir)),
+            ('parallel', lambda: check_parallel(args.delay)),
+            ('prefetch', lambda: check_prefetch(args.delay, temp_dir)),
+        )
+        for name, check in checks:
+            problems = check()
+            print(f"{name:<10} {'不符合预期' if problems else '通过'}")
+            for problem in problems:
+                print(f"    {problem}")
+            failed += bool(problems)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
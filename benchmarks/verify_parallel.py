@@ -0,0 +1,116 @@
+"""
+单文档并行排版一致性检查：同一文档分别顺序排版和并行排版，逐个比较输出 .docx 中的文件内容和日志
+
+并行排版的结果必须与顺序排版逐字节相同，任一用例不同时返回非零退出码。
+为了让小文档也走并行路径，检查时将 parallel_min_blocks 设为 0。
+
+用法（在项目根目录执行）:
+    python -m benchmarks.verify_parallel
+    python -m benchmarks.verify_parallel --case docx_large --workers 4 --config '{"style_mode": true}'
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import zipfile
+
+from benchmarks.corpus import CORPUS_PRESETS, ensure_corpus
+
+DEFAULT_CASES = ('docx_small', 'docx_tables', 'docx_medium')
+# 默认检查的配置：直接格式化、样式模式、逐段日志
+DEFAULT_CONFIGS = ({}, {'style_mode': True}, {'log_level': 'debug'})
+
+
+def format_once(path, output_path, config):
+    """排版一次，返回 (日志列表, 耗时)"""
+    from modules.word_processor import WordProcessor
+
+    logs = []
+    processor = WordProcessor(config, logs.append)
+    try:
+        start = time.perf_counter()
+        processor.format_document(path, output_path)
+        elapsed = time.perf_counter() - start
+    finally:
+        processor.quit_com_app()
+    return logs, elapsed
+
+
+def read_entries(path):
+    """读取 .docx 中的全部文件内容"""
+    with zipfile.ZipFile(path) as z:
+        return {name: z.read(name) for name in z.namelist()}
+
+
+def _is_volatile_log(message):
+    return message.startswith('  > 处理统计：')
+
+
+def compare_outputs(sequential_path, parallel_path, sequential_logs, parallel_logs):
+    """
+    比较顺序排版和并行排版的结果
+
+    Returns:
+        list: 不同之处的说明，相同时为空列表
+    """
+    differences = []
+    expected, actual = read_entries(sequential_path), read_entries(parallel_path)
+    if sorted(expected) != sorted(actual):
+        differences.append(f"文件列表不同: {sorted(set(expected) ^ set(actual))}")
+    for name in sorted(set(expected) & set(actual)):
+        if expected[name] != actual[name]:
+            differences.append(f"{name} 内容不同（{len(expected[name])} / {len(actual[name])} 字节）")
+    # 并行排版多输出一行进程数提示，处理统计中的耗时每次都不同，其余日志应完全相同
+    sequential_logs = [message for message in sequential_logs if not _is_volatile_log(message)]
+    parallel_logs = [message for message in parallel_logs
+                     if not _is_volatile_log(message) and '个进程并行格式化' not in message]
+    if sequential_logs != parallel_logs:
+        differences.append(f"日志不同（{len(sequential_logs)} / {len(parallel_logs)} 行）")
+    return differences
+
+
+def verify_case(path, config, workers):
+    """检查一个文档在一种配置下的顺序/并行排版结果，返回 (不同之处, 顺序耗时, 并行耗时)"""
+    from modules.config_manager import ConfigManager
+
+    config = dict(ConfigManager().default_format_params, **config)
+    with tempfile.TemporaryDirectory(prefix='verify_parallel_') as temp_dir:
+        sequential_path = os.path.join(temp_dir, 'sequential.docx')
+        parallel_path = os.path.join(temp_dir, 'parallel.docx')
+        sequential_logs, sequential_time = format_once(path, sequential_path, dict(config, parallel_workers=0))
+        parallel_logs, parallel_time = format_once(
+            path, parallel_path, dict(config, parallel_workers=workers, parallel_min_blocks=0))
+        differences = compare_outputs(sequential_path, parallel_path, sequential_logs, parallel_logs)
+    return differences, sequential_time, parallel_time
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='单文档并行排版一致性检查')
+    parser.add_argument('--case', action='append', choices=sorted(CORPUS_PRESETS),
+                        help=f"要检查的用例，可重复指定，默认 {', '.join(DEFAULT_CASES)}")
+    parser.add_argument('--corpus-dir', default=os.path.join('benchmarks', 'corpus'), help='语料目录')
+    parser.add_argument('--workers', type=int, default=2, help='并行排版的进程数')
+    parser.add_argument('--config', action='append',
+                        help='排版配置覆盖项的JSON，可重复指定，默认检查直接格式化、样式模式和逐段日志三种配置')
+    args = parser.parse_args(argv)
+
+    cases = [case for case in args.case or DEFAULT_CASES if CORPUS_PRESETS[case]['kind'] == 'docx']
+    configs = [json.loads(config) for config in args.config] if args.config else list(DEFAULT_CONFIGS)
+    paths = ensure_corpus(args.corpus_dir, cases)
+    failed = 0
+    for case in cases:
+        for config in configs:
+            differences, sequential_time, parallel_time = verify_case(paths[case], config, args.workers)
+            status = '不一致' if differences else '一致'
+            print(f"{case:<14} {json.dumps(config, ensure_ascii=False):<24} {status}  "
+                  f"顺序 {sequential_time:.2f}s  并行 {parallel_time:.2f}s")
+            for difference in differences:
+                print(f"    {difference}")
+            failed += bool(differences)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""
+流式排版一致性检查：同一文档分别用常规方式（dom）和流式方式（streaming）排版，逐个比较输出 .docx 中的文件内容
+
+两种方式的输出必须逐字节相同，任一用例不同时返回非零退出码。流式排版在写出文档时才逐块格式化，
+进度日志的顺序与常规方式不同，因此只比较文件内容，并报告两种方式的耗时和流式排版是否改用了常规方式。
+
+用法（在项目根目录执行）:
+    python -m benchmarks.verify_streaming
+    python -m benchmarks.verify_streaming --case docx_large --config '{"style_mode": true}'
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+from benchmarks.corpus import CORPUS_PRESETS, ensure_corpus
+from benchmarks.verify_parallel import format_once, read_entries
+
+DEFAULT_CASES = ('docx_small', 'docx_tables', 'docx_medium')
+# 默认检查的配置：直接格式化、样式模式、不设置大纲级别
+DEFAULT_CONFIGS = ({}, {'style_mode': True}, {'set_outline': False})
+
+
+def compare_entries(expected_path, actual_path):
+    """
+    比较两个 .docx 中的文件列表和内容
+
+    Returns:
+        list: 不同之处的说明，相同时为空列表
+    """
+    differences = []
+    expected, actual = read_entries(expected_path), read_entries(actual_path)
+    if sorted(expected) != sorted(actual):
+        differences.append(f"文件列表不同: {sorted(set(expected) ^ set(actual))}")
+    for name in sorted(set(expected) & set(actual)):
+        if expected[name] != actual[name]:
+            differences.append(f"{name} 内容不同（{len(expected[name])} / {len(actual[name])} 字节）")
+    return differences
+
+
+def verify_case(path, config):
+    """检查一个文档在一种配置下的常规/流式排版结果，返回 (不同之处, 是否流式排版, 常规耗时, 流式耗时)"""
+    from modules.config_manager import ConfigManager
+
+    config = dict(ConfigManager().default_format_params, **config)
+    with tempfile.TemporaryDirectory(prefix='verify_streaming_') as temp_dir:
+        dom_path = os.path.join(temp_dir, 'dom.docx')
+        streaming_path = os.path.join(temp_dir, 'streaming.docx')
+        _, dom_time = format_once(path, dom_path, dict(config, format_engine='dom'))
+        streaming_logs, streaming_time = format_once(path, streaming_path, dict(config, format_engine='streaming'))
+        differences = compare_entries(dom_path, streaming_path)
+    streamed = not any('改用常规方式排版' in message for message in streaming_logs)
+    return differences, streamed, dom_time, streaming_time
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='流式排版一致性检查')
+    parser.add_argument('--case', action='append', choices=sorted(CORPUS_PRESETS),
+                        help=f"要检查的用例，可重复指定，默认 {', '.join(DEFAULT_CASES)}")
+    parser.add_argument('--corpus-dir', default=os.path.join('benchmarks', 'corpus'), help='语料目录')
+    parser.add_argument('--config', action='append',
+                        help='排版配置覆盖项的JSON，可重复指定，默认检查直接格式化、样式模式和不设置大纲级别三种配置')
+    args = parser.parse_args(argv)
+
+    cases = [case for case in args.case or DEFAULT_CASES if CORPUS_PRESETS[case]['kind'] == 'docx']
+    configs = [json.loads(config) for config in args.config] if args.config else list(DEFAULT_CONFIGS)
+    paths = ensure_corpus(args.corpus_dir, cases)
+    failed = 0
+    for case in cases:
+        for config in configs:
+            differences, streamed, dom_time, streaming_time = verify_case(paths[case], config)
+            status = '不一致' if differences else '一致'
+            engine = '' if streamed else '（已改用常规方式）'
+            print(f"{case:<14} {json.dumps(config, ensure_ascii=False):<24} {status}{engine}  "
+                  f"常规 {dom_time:.2f}s  流式 {streaming_time:.2f}s")
+            for difference in differences:
+                print(f"    {difference}")
+            failed += bool(differences)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -170,6 +170,16 @@ class SettingsWindow(tk.Toplevel):
         figure_bold_checkbox.grid(row=row, column=5, sticky=tk.W, padx=5, pady=3)
         self.checkboxes['figure_caption_bold'] = figure_bold_var
         row += 1
+        create_checkbox("样式模式（字体写入段落样式）", 'style_mode', row, 0, default_value=False)
+        # debug 输出逐段详情，info 只输出主要步骤和分类汇总，warning 只输出警告和错误
+        create_combo("日志详细程度", 'log_level', ['debug', 'info', 'warning'], row, 2)
+        create_checkbox("排版缓存（复用未修改文件的结果）", 'format_cache', row, 4, default_value=False)
+        row += 1
+        # 块数不少于 parallel_min_blocks 的大文档分段并行格式化，0 为不启用
+        create_combo("单文档并行进程数", 'parallel_workers', ['0', '2', '4', '8'], row, 0)
+        # auto：document.xml 不小于 streaming_min_mb 时流式排版；streaming 强制流式，dom 强制常规
+        create_combo("排版引擎", 'format_engine', ['auto', 'dom', 'streaming'], row, 2)
+        row += 1
         
         # Section: Global Options
         ttk.Separator(params_frame, orient='horizontal').grid(row=row, column=0, columnspan=6, sticky='ew', pady=10)
@@ -0,0 +1,54 @@
+"""
+无界面批量排版入口
+
+用法示例:
+    python -m modules "reports/**/*.docx" -o output -c default_config.json -j 4
+    python -m modules reports -o output --cache-dir .format_cache
+"""
+import argparse
+import sys
+
+from .config_manager import ConfigManager
+from .batch_processor import BatchProcessor
+from .format_cache import FormatCache
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m modules', description='报告自动排版工具 - 批量处理模式')
+    parser.add_argument('inputs', nargs='+', help='待处理的文件、文件夹或通配符（支持 ** 递归匹配）')
+    parser.add_argument('-o', '--output-dir', required=True, help='处理后文件的输出目录')
+    parser.add_argument('-c', '--config', default='default_config.json', help='排版配置文件路径')
+    parser.add_argument('-j', '--workers', type=int, default=None, help='工作进程数，默认为CPU核心数')
+    parser.add_argument('--manifest', default=None, help='处理清单路径，默认为输出目录下的 manifest.json')
+    parser.add_argument('-v', '--verbose', action='store_true', help='输出逐段处理日志')
+    parser.add_argument('--cache-dir', default=None,
+                        help='排版缓存目录：内容和配置均未改变的文件直接复用上次的结果（配置中启用 format_cache 时默认使用 format_cache_dir）')
+    parser.add_argument('--no-cache', action='store_true', help='不使用排版缓存')
+    parser.add_argument('--cache-max-mb', type=float, default=1024, help='排版缓存大小上限（MB），0 表示不限制')
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    config = ConfigManager(args.config).load_config()
+    cache_dir = args.cache_dir or (config['format_cache_dir'] if config.get('format_cache') else None)
+    cache = None
+    if cache_dir and not args.no_cache:
+        cache = FormatCache(cache_dir, max_size_mb=args.cache_max_mb, log_callback=print)
+    batch = BatchProcessor(config, args.output_dir, max_workers=args.workers, log_callback=print,
+                           verbose=args.verbose, cache=cache)
+
+    try:
+        input_paths = batch.collect_inputs(args.inputs)
+        manifest = batch.run(input_paths)
+        batch.write_manifest(manifest, args.manifest)
+    finally:
+        if cache is not None:
+            cache.close()
+
+    return 0 if all(item['status'] == 'success' for item in manifest) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,259 @@
+import glob
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import util as mp_util
+
+from .word_processor import WordProcessor
+from .config_manager import ConfigManager
+from .exception_handler import global_exception_handler
+from .processing_stats import aggregate_stats, format_summary
+
+# 支持批量处理的文件类型，与界面中的文件列表保持一致
+SUPPORTED_EXTENSIONS = ('.docx', '.doc', '.wps', '.txt')
+
+# 每个工作进程持有一个 WordProcessor 实例（含各自的WPS/Word应用和临时目录）
+_worker_processor = None
+
+
+def _init_worker(config, plan, verbose):
+    """工作进程初始化：创建独立的临时目录和 WordProcessor 实例，排版计划由主进程生成后传入"""
+    global _worker_processor
+    temp_dir = tempfile.mkdtemp(prefix='wordformatter_')
+    # 仅在需要时输出逐段日志，避免多进程同时刷屏；逐段日志为 DEBUG 级别
+    log_callback = logging.getLogger('WordFormatter.batch').info if verbose else None
+    # 批量处理已按文件并行，工作进程内不再启动单文档并行排版
+    config = dict(config, parallel_workers=0)
+    if verbose:
+        config = dict(config, log_level='debug')
+    _worker_processor = WordProcessor(config, log_callback, temp_dir=temp_dir, plan=plan)
+    # 工作进程退出时关闭WPS/Word应用并删除临时目录
+    mp_util.Finalize(None, _shutdown_worker, args=(temp_dir,), exitpriority=10)
+
+
+def _shutdown_worker(temp_dir):
+    """工作进程退出时的清理"""
+    if _worker_processor is not None:
+        try:
+            _worker_processor.quit_com_app()
+        except Exception:
+            pass
+    shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def _format_one(input_path, output_path):
+    """
+    在工作进程中排版单个文件
+
+    Returns:
+        dict: 该文件的处理结果（写入清单）
+    """
+    start_time = time.perf_counter()
+    result = {'input': input_path, 'output': output_path, 'status': 'success', 'error': None, 'cached': False,
+              'stats': None}
+    try:
+        _worker_processor.format_document(input_path, output_path)
+        result['stats'] = _worker_processor.last_stats.to_dict()
+    except Exception as e:
+        result['status'] = 'failed'
+        result['error'] = global_exception_handler.handle_exception(e, f"批量排版 {os.path.basename(input_path)}")
+    finally:
+        _worker_processor._cleanup_temp_files()
+    result['elapsed'] = round(time.perf_counter() - start_time, 3)
+    return result
+
+
+class BatchProcessor:
+    """批量排版处理器，将 WordProcessor.format_document 分发到多进程工作池中执行"""
+
+    def __init__(self, config, output_dir, max_workers=None, log_callback=None, verbose=False, cache=None):
+        """
+        初始化批量处理器
+
+        Args:
+            config (dict): 排版配置
+            output_dir (str): 输出目录
+            max_workers (int): 工作进程数，为None时使用CPU核心数
+            log_callback (callable): 日志回调函数
+            verbose (bool): 是否输出工作进程中的逐段处理日志
+            cache (FormatCache): 排版结果缓存，为None时不使用缓存
+        """
+        self.config = config
+        self.output_dir = output_dir
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.log_callback = log_callback
+        self.verbose = verbose
+        self.cache = cache
+        # 排版计划只在主进程生成一次，随工作进程初始化参数传入
+        self.plan = ConfigManager().build_formatting_plan(config)
+
+    def _log(self, message):
+        if self.log_callback:
+            self.log_callback(message)
+
+    @staticmethod
+    def collect_inputs(patterns):
+        """
+        展开输入的通配符和文件夹，得到待处理文件列表
+
+        Args:
+            patterns (list): 文件路径、文件夹或通配符（支持 ** 递归匹配）
+
+        Returns:
+            list: 去重后的待处理文件路径，保持输入顺序
+        """
+        input_paths = []
+        seen = set()
+
+        def add(path):
+            if not path.lower().endswith(SUPPORTED_EXTENSIONS):
+                return
+            # 跳过Word打开文档时产生的锁文件
+            if os.path.basename(path).startswith('~$'):
+                return
+            full_path = os.path.abspath(path)
+            if full_path not in seen:
+                seen.add(full_path)
+                input_paths.append(full_path)
+
+        for pattern in patterns:
+            matches = sorted(glob.glob(pattern, recursive=True)) or [pattern]
+            for match in matches:
+                if os.path.isdir(match):
+                    for root, _, files in os.walk(match):
+                        for f in sorted(files):
+                            add(os.path.join(root, f))
+                elif os.path.isfile(match):
+                    add(match)
+        return input_paths
+
+    def plan_outputs(self, input_paths):
+        """
+        为每个输入文件确定输出路径，同名文件自动追加序号避免互相覆盖
+
+        Returns:
+            list: (input_path, output_path) 列表
+        """
+        used_names = set()
+        jobs = []
+        for input_path in input_paths:
+            base_name = os.path.splitext(os.path.basename(input_path))[0]
+            output_name = f"{base_name}_formatted.docx"
+            counter = 1
+            while output_name.lower() in used_names:
+                output_name = f"{base_name}_formatted_{counter}.docx"
+                counter += 1
+            used_names.add(output_name.lower())
+            jobs.append((input_path, os.path.join(self.output_dir, output_name)))
+        return jobs
+
+    def run(self, input_paths):
+        """
+        并行处理所有文件
+
+        Args:
+            input_paths (list): 待处理文件路径列表
+
+        Returns:
+            list: 按输入顺序排列的逐文件处理结果清单
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        jobs = self.plan_outputs(input_paths)
+        if not jobs:
+            self._log("没有找到可处理的文件。")
+            return []
+
+        results = {}
+        cache_keys = {}
+        if self.cache is not None:
+            jobs_to_run = []
+            for input_path, output_path in jobs:
+                result = self._restore_from_cache(input_path, output_path, cache_keys)
+                if result is None:
+                    jobs_to_run.append((input_path, output_path))
+                else:
+                    results[input_path] = result
+            if results:
+                self._log(f"排版缓存命中 {len(results)} 个文件（内容和配置均未改变），已直接复制上次的结果")
+        else:
+            jobs_to_run = jobs
+
+        if jobs_to_run:
+            worker_count = min(self.max_workers, len(jobs_to_run))
+            self._log(f"开始批量处理 {len(jobs_to_run)} 个文件，工作进程数: {worker_count}")
+            with ProcessPoolExecutor(max_workers=worker_count, initializer=_init_worker,
+                                     initargs=(self.config, self.plan, self.verbose)) as executor:
+                # 只传递输入、输出路径，文档内容不经 pickle 在进程间复制：工作进程以只读内存映射方式读取输入，
+                # 直接写出结果文件，返回的只是处理结果字典
+                futures = {executor.submit(_format_one, input_path, output_path): input_path
+                           for input_path, output_path in jobs_to_run}
+                for done_count, future in enumerate(as_completed(futures), start=1):
+                    input_path = futures[future]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        # 工作进程异常退出等情况
+                        result = {'input': input_path, 'output': None, 'status': 'failed',
+                                  'error': f"工作进程异常: {e}", 'cached': False, 'elapsed': None, 'stats': None}
+                    results[input_path] = result
+                    mark = "✅" if result['status'] == 'success' else "❌"
+                    self._log(f"[{done_count}/{len(jobs_to_run)}] {mark} {os.path.basename(input_path)}")
+                    if result['error']:
+                        self._log(f"  > {result['error']}")
+                    if result['status'] == 'success' and input_path in cache_keys:
+                        self.cache.store(cache_keys[input_path], input_path, self.config, result['output'])
+
+        if self.cache is not None:
+            self.cache.prune()
+
+        manifest = [results[input_path] for input_path, _ in jobs]
+        success_count = sum(1 for item in manifest if item['status'] == 'success')
+        self._log(f"批量处理完成！成功: {success_count}个，失败: {len(manifest) - success_count}个")
+        if any(item['stats'] for item in manifest):
+            self._log(f"处理统计（合计）：{format_summary(aggregate_stats(item['stats'] for item in manifest))}")
+        return manifest
+
+    def _restore_from_cache(self, input_path, output_path, cache_keys):
+        """
+        查找排版缓存，命中时复制缓存结果到输出路径
+
+        Returns:
+            dict: 命中时返回该文件的处理结果，否则返回None（缓存键记入 cache_keys，处理成功后写入缓存）
+        """
+        start_time = time.perf_counter()
+        hit, cache_key = self.cache.restore(input_path, self.config, output_path)
+        if not hit:
+            cache_keys[input_path] = cache_key
+            return None
+        return {'input': input_path, 'output': output_path, 'status': 'success', 'error': None, 'cached': True,
+                'stats': None, 'elapsed': round(time.perf_counter() - start_time, 3)}
+
+    def write_manifest(self, manifest, manifest_path=None):
+        """
+        将处理结果清单写入JSON文件
+
+        Args:
+            manifest (list): run() 返回的处理结果清单
+            manifest_path (str): 清单文件路径，为None时写入输出目录下的 manifest.json
+
+        Returns:
+            str: 清单文件路径
+        """
+        if manifest_path is None:
+            manifest_path = os.path.join(self.output_dir, 'manifest.json')
+        summary = {
+            'total': len(manifest),
+            'success': sum(1 for item in manifest if item['status'] == 'success'),
+            'failed': sum(1 for item in manifest if item['status'] != 'success'),
+            'cached': sum(1 for item in manifest if item.get('cached')),
+            'stats': aggregate_stats(item.get('stats') for item in manifest),
+            'files': manifest,
+        }
+        with open(manifest_path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=4)
+        self._log(f"处理清单已保存至: {manifest_path}")
+        return manifest_path
@@ -0,0 +1,261 @@
+import re
+from collections import namedtuple
+from enum import Enum
+
+from docx.oxml.ns import qn
+from docx.table import Table
+
+
+class BlockKind(Enum):
+    """文档块的分类结果"""
+    TABLE = 'table'                        # 表格
+    CAPTION = 'caption'                    # 已在预扫描中作为图表标题处理的段落
+    EMPTY = 'empty'                        # 空白段落
+    PICTURE = 'picture'                    # 含图片的段落，仅格式化文字
+    EMBEDDED_OBJECT = 'embedded_object'    # 含嵌入对象（附件）的段落，仅格式化文字
+    TABLE_CAPTION = 'table_caption'        # 以"表"开头的段落
+    OUTLINE_HEADING = 'outline_heading'    # 带大纲级别或标题样式的段落
+    NUMBERED_HEADING = 'numbered_heading'  # 单独成行的数字编号标题（如 7.9 / 7.9.4）
+    BODY = 'body'                          # 正文
+
+
+# 分类记录：块序号、类别、层级
+# - PICTURE / EMBEDDED_OBJECT: 段落文字识别出的层级，1-4 对应 一、/（一）/1./(1)，0 为正文
+# - OUTLINE_HEADING: 标题级别 1-9
+# - NUMBERED_HEADING: 标题级别 2-5
+# - BODY: 1 表示文字形似常规标题（已禁用自动识别，仅用于日志），否则为 0
+BlockRecord = namedtuple('BlockRecord', ['index', 'kind', 'level'])
+
+# 块中包含的对象类型标志，由 build_object_index() 生成
+HAS_DRAWING = 0x1  # <w:drawing>，图片、图表等
+HAS_PICT = 0x2     # <w:pict>，VML 图片
+HAS_OBJECT = 0x4   # <w:object>，嵌入对象（附件）
+HAS_PICTURE = HAS_DRAWING | HAS_PICT
+
+_OBJECT_TAG_FLAGS = {
+    qn('w:drawing'): HAS_DRAWING,
+    qn('w:pict'): HAS_PICT,
+    qn('w:object'): HAS_OBJECT,
+}
+
+
+class BlockClassifier:
+    """
+    文档块分类器
+
+    所有正则表达式在构造时编译一次，classify() 对全部块只遍历一遍，
+    每个段落只提取一次文本，输出紧凑的 (块序号, 类别, 层级) 记录供格式化阶段使用。
+    """
+
+    # 常规标题格式（一、/（一）/1./(1)），已禁用自动识别，仅用于图片段落文字和日志
+    _RE_H1 = re.compile(r'^[一二三四五六七八九十百千万零]+\s*、')
+    _RE_H2 = re.compile(r'^[（\(][一二三四五六七八九十百千万零]+[）\)]')
+    _RE_H3 = re.compile(r'^\d+\s*[\.．]')
+    _RE_H4 = re.compile(r'^[（\(]\d+[）\)]')
+
+    # 单独成行的数字编号标题，按编号层数识别级别，按 2 级到 5 级的顺序依次匹配
+    # 2级标题格式: "7.9 文本" 或 "7.9. 文本"
+    # 3级标题格式: "7.9.4 文本" 或 "7.9.4. 文本"
+    # 4级标题格式: "7.9.4.1 文本" 或 "7.9.4.1. 文本"
+    # 5级标题格式: "7.9.4.1.1 文本" 或 "7.9.4.1.1. 文本"，五个或更多数字
+    _NUMBERED_HEADING_PATTERNS = (
+        (2, re.compile(r'^\d+[\.．]\d+(?:[\.．]\s*)?\s+[\u4e00-\u9fa5a-zA-Z]')),
+        (3, re.compile(r'^\d+[\.．]\d+[\.．]\d+(?:[\.．]\s*)?\s+[\u4e00-\u9fa5a-zA-Z]')),
+        (4, re.compile(r'^\d+[\.．]\d+[\.．]\d+[\.．]\d+(?:[\.．]\s*)?\s+[\u4e00-\u9fa5a-zA-Z]')),
+        (5, re.compile(r'^\d+[\.．]\d+[\.．]\d+[\.．]\d+[\.．]\d+(?:[\.．]\d*)*(?:[\.．]\s*)?\s+[\u4e00-\u9fa5a-zA-Z]')),
+    )
+
+    _RE_STYLE_LEVEL = re.compile(r'\d+')
+
+    def __init__(self, config):
+        self.config = config
+
+    def extract_texts(self, all_blocks):
+        """
+        一次性提取所有段落的文本
+
+        Returns:
+            list: 与 all_blocks 等长的列表，段落为其文本，表格为 None
+        """
+        return [None if isinstance(block, Table) else block.text for block in all_blocks]
+
+    def build_object_index(self, body, all_blocks):
+        """
+        对文档主体做一次后代元素扫描，建立每个顶层块的"含图片/VML图片/嵌入对象"索引
+
+        直接查询 lxml 元素树，避免为检测 <w:drawing> 等标签而把每个段落序列化为字符串。
+
+        Args:
+            body: 文档的 <w:body> 元素
+            all_blocks (list): 文档顶层块（段落和表格）
+
+        Returns:
+            list: 与 all_blocks 等长的标志位列表（HAS_DRAWING / HAS_PICT / HAS_OBJECT 的组合）
+        """
+        position = {block._element: idx for idx, block in enumerate(all_blocks)}
+        object_flags = [0] * len(all_blocks)
+        for element in body.iter(*_OBJECT_TAG_FLAGS):
+            # 向上找到该元素所在的顶层块
+            top = element
+            parent = top.getparent()
+            while parent is not None and parent is not body:
+                top = parent
+                parent = top.getparent()
+            idx = position.get(top)
+            if idx is not None:
+                object_flags[idx] |= _OBJECT_TAG_FLAGS[element.tag]
+        return object_flags
+
+    @staticmethod
+    def block_object_flags(element):
+        """单个块的对象标志位，与 build_object_index() 中该块的结果相同（流式排版时逐块计算）"""
+        flags = 0
+        for child in element.iter(*_OBJECT_TAG_FLAGS):
+            flags |= _OBJECT_TAG_FLAGS[child.tag]
+        return flags
+
+    def classify(self, all_blocks, texts, object_flags, caption_indices=()):
+        """
+        对所有块进行一次分类
+
+        Args:
+            all_blocks (list): 文档顶层块（段落和表格）
+            texts (list): extract_texts() 的结果
+            object_flags (list): build_object_index() 的结果
+            caption_indices (set): 预扫描中已作为图表标题处理的块序号
+
+        Returns:
+            list: BlockRecord 列表，与 all_blocks 一一对应
+        """
+        records = []
+        # 同一文档中样式ID -> 样式名称，python-docx 每次查找样式都要遍历整个样式表
+        style_names = {}
+        for idx, block in enumerate(all_blocks):
+            if idx in caption_indices:
+                records.append(BlockRecord(idx, BlockKind.CAPTION, 0))
+            elif isinstance(block, Table):
+                records.append(BlockRecord(idx, BlockKind.TABLE, 0))
+            else:
+                kind, level = self.classify_paragraph(block, texts[idx], object_flags[idx], style_names)
+                records.append(BlockRecord(idx, kind, level))
+        return records
+
+    def classify_paragraph(self, para, text, flags=0, style_names=None):
+        """
+        对单个段落分类
+
+        Args:
+            para (Paragraph): 段落
+            text (str): 段落文本
+            flags (int): 段落的对象标志位
+            style_names (dict): 同一文档内共用的 样式ID -> 样式名称 缓存，为None时不缓存
+
+        Returns:
+            tuple: (BlockKind, level)
+        """
+        stripped_text = text.strip()
+        if not stripped_text:
+            return BlockKind.EMPTY, 0
+
+        if flags & HAS_PICTURE:
+            return BlockKind.PICTURE, self.regular_heading_level(text.lstrip())
+        if flags & HAS_OBJECT:
+            return BlockKind.EMBEDDED_OBJECT, self.regular_heading_level(text.lstrip())
+
+        # 特殊处理：如果段落以"表"开头，强制识别为表格标题，不作为普通标题处理
+        if stripped_text.startswith("表"):
+            return BlockKind.TABLE_CAPTION, 0
+
+        # 段落自身的大纲级别或标题样式
+        outline_level = self._read_outline_level(para)
+        is_heading_style = False
+        try:
+            style_name = self._style_name(para, style_names)
+            # 检查样式名称是否为标题样式，如"标题1"、"标题2"、"Heading 1"等
+            if style_name and (style_name.startswith("标题") or style_name.startswith("Heading")):
+                is_heading_style = True
+                # 如果是标题样式但没有大纲级别，尝试从标题样式名称中提取级别数字
+                if outline_level is None:
+                    level_match = self._RE_STYLE_LEVEL.search(style_name)
+                    if level_match:
+                        level = int(level_match.group())
+                        if 1 <= level <= 9:
+                            outline_level = level - 1  # 转换为0-8范围
+        except (AttributeError, ValueError):
+            pass  # 忽略获取样式时可能出现的错误
+
+        if outline_level is not None or is_heading_style:
+            return BlockKind.OUTLINE_HEADING, (outline_level or 0) + 1  # 大纲级别0-8对应标题级别1-9
+
+        return self._classify_by_text(text, stripped_text)
+
+    def classify_text(self, text):
+        """
+        仅根据文本对无样式、无大纲级别、不含对象的段落分类（如TXT文件中的行），结果与 classify_paragraph() 一致
+
+        Returns:
+            tuple: (BlockKind, level)
+        """
+        stripped_text = text.strip()
+        if not stripped_text:
+            return BlockKind.EMPTY, 0
+        if stripped_text.startswith("表"):
+            return BlockKind.TABLE_CAPTION, 0
+        return self._classify_by_text(text, stripped_text)
+
+    def _classify_by_text(self, text, stripped_text):
+        """数字编号标题或正文"""
+        # 单独成行（排除段落中间的数字编号）的数字编号标题
+        if '\n' not in text:
+            for level, pattern in self._NUMBERED_HEADING_PATTERNS:
+                if pattern.match(stripped_text):
+                    return BlockKind.NUMBERED_HEADING, level
+
+        # 取消自动识别"一、"、"（一）"、"1."、"(1)"等常规标题的功能，按正文处理
+        return BlockKind.BODY, 1 if self.regular_heading_level(text.lstrip()) else 0
+
+    def regular_heading_level(self, text):
+        """
+        识别"一、"、"（一）"、"1."、"(1)"等常规标题格式
+
+        Returns:
+            int: 1-4 对应上述四种格式，0 表示都不匹配
+        """
+        if self._RE_H1.match(text):
+            return 1
+        if self._RE_H2.match(text):
+            return 2
+        if self._RE_H3.match(text):
+            return 3
+        if self._RE_H4.match(text):
+            return 4
+        return 0
+
+    @staticmethod
+    def _style_name(para, style_names):
+        """段落样式名称，style_names 不为None时按样式ID缓存"""
+        if style_names is None:
+            return getattr(para.style, 'name', '')
+        style_id = para._p.style
+        style_name = style_names.get(style_id)
+        if style_name is None:
+            style_name = style_names[style_id] = getattr(para.style, 'name', '')
+        return style_name
+
+    @staticmethod
+    def _read_outline_level(para):
+        """读取段落直接设置的大纲级别（0-8），不修改段落；未设置时返回 None"""
+        pPr = para._p.pPr
+        if pPr is None:
+            return None
+        outlineLvl = pPr.find(qn('w:outlineLvl'))
+        if outlineLvl is not None:
+            val = outlineLvl.get(qn('w:val'))
+            if val is not None:
+                try:
+                    level = int(val)
+                    if 0 <= level <= 8:
+                        return level
+                except ValueError:
+                    pass
+        return None
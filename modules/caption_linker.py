@@ -0,0 +1,80 @@
+from .block_classifier import HAS_PICTURE
+
+
+class CaptionLinker:
+    """
+    图表标题关联
+
+    为每个图片段落和表格查找最近的前一个/后一个非空段落，若以"图"或"表"开头则认定为其标题。
+    规则与逐个对象向两侧扫描的做法一致：
+    - 先向前找，找到标题后不再向后找；
+    - 空白段落跳过，遇到表格或非标题的非空段落即停止；
+    - 已被其他对象认领的标题跳过，继续向外查找。
+
+    通过预先计算的前后"停止点"数组和对已认领标题的路径压缩，总耗时与块数成线性关系。
+    """
+
+    def link(self, texts, object_flags):
+        """
+        计算标题映射
+
+        Args:
+            texts (list): 与顶层块对应的文本列表，表格为 None
+            object_flags (list): 与顶层块对应的对象标志位
+
+        Returns:
+            dict: {标题块序号: (对象块序号, "图" 或 "表")}，按对象顺序排列
+        """
+        count = len(texts)
+        stripped = [text.strip() if text is not None else None for text in texts]
+        # 停止点：表格或非空段落
+        is_stop = [text is None or text != '' for text in stripped]
+
+        # prev_stop[i] / next_stop[i]: i 之前/之后最近的停止点，不存在时为 -1 / count
+        prev_stop = [-1] * count
+        last = -1
+        for i in range(count):
+            prev_stop[i] = last
+            if is_stop[i]:
+                last = i
+        next_stop = [count] * count
+        last = count
+        for i in range(count - 1, -1, -1):
+            next_stop[i] = last
+            if is_stop[i]:
+                last = i
+
+        claimed = [False] * count
+        caption_map = {}
+        for idx in range(count):
+            is_table = stripped[idx] is None
+            if not (is_table or object_flags[idx] & HAS_PICTURE):
+                continue
+            for links in (prev_stop, next_stop):
+                candidate = self._nearest_unclaimed(links, links[idx], claimed)
+                if not 0 <= candidate < count:
+                    continue
+                text = stripped[candidate]
+                # 遇到表格停止查找
+                if text is None:
+                    continue
+                # 单独成行且以"图"或"表"开头的段落都识别为图表标题，不要求居中对齐
+                if text.startswith("图") or text.startswith("表"):
+                    claimed[candidate] = True
+                    caption_map[candidate] = (idx, "图" if text.startswith("图") else "表")
+                    break
+        return caption_map
+
+    @staticmethod
+    def _nearest_unclaimed(links, start, claimed):
+        """沿停止点链跳过已认领的标题，并压缩路径使后续查找不再重复经过"""
+        count = len(claimed)
+        target = start
+        while 0 <= target < count and claimed[target]:
+            target = links[target]
+        node = start
+        while node != target:
+            next_node = links[node]
+            links[node] = target
+            node = next_node
+        return target
@@ -2,9 +2,15 @@ import json
 import os
 import logging
 
+from .logger import LOG_LEVEL_NAMES
+from .formatting_plan import FORMAT_ENGINES, FormattingPlan, config_fingerprint
+
 
 class ConfigManager:
     """配置管理器，用于处理应用程序的配置加载、保存和验证"""
+
+    # 已生成的排版计划：配置指纹 -> FormattingPlan，同一配置只生成一次
+    _plan_cache = {}
     
     def __init__(self, default_config_path="default_config.json", update_config_path="update_config.json"):
         self.default_config_path = default_config_path
@@ -37,13 +43,29 @@ class ConfigManager:
             'table_caption_bold': False,  # 表格标题默认不加粗
             'figure_caption_bold': False,  # 图形标题默认不加粗
             'body_use_times_roman': True,  # 正文默认使用Times New Roman
-            'table_use_times_roman': True  # 表格默认使用Times New Roman
+            'table_use_times_roman': True,  # 表格默认使用Times New Roman
+            'style_mode': False,  # 样式模式：字体写入命名段落样式，默认关闭（直接格式化每个run）
+            # WPS/Word转换池：同时运行的转换器数量，每个转换器处理多少个文档后重建（0为不重建）
+            'converter_pool_size': 1, 'converter_recycle_after': 50,
+            # 预处理引擎：native 直接修改文档XML接受修订、转换自动编号（默认，无需Office），com 借助WPS/Word
+            'preprocess_engine': 'native',
+            # 日志详细程度：debug 输出逐段分类和格式化详情，info 只输出主要步骤和分类汇总（默认），warning 只输出警告和错误
+            'log_level': 'info',
+            # 排版缓存：内容和配置均未改变的文件直接复用上次的排版结果，默认关闭
+            'format_cache': False, 'format_cache_dir': 'format_cache',
+            # 单文档并行排版：块数不少于 parallel_min_blocks 的文档由 parallel_workers 个进程分段格式化（0为不启用）
+            'parallel_workers': 0, 'parallel_min_blocks': 2000,
+            # 排版引擎：dom 为常规方式（整个文档读入内存），streaming 为流式排版（逐块读取、格式化并写出），
+            # auto 时 document.xml 解压后不小于 streaming_min_mb（MB）的文档使用流式排版
+            'format_engine': 'auto', 'streaming_min_mb': 64
         }
         
         # 默认自动更新配置参数
         self.default_update_params = {
             'auto_update': True,  # 默认启用自动更新
-            'update_check_url': 'http://172.14.60.197/update.xml'  # 默认更新检查地址
+            'update_check_url': 'http://172.14.60.197/update.xml',  # 默认更新检查地址
+            'update_download_retries': 3,  # 更新包下载中断后从断点继续的最多重试次数
+            'check_update_interval': 21600  # 检查更新间隔（秒），间隔内启动不访问更新服务器，0为每次启动都检查
         }
         
         # 合并所有默认参数（用于兼容旧代码）
@@ -191,8 +213,44 @@ class ConfigManager:
                     except (ValueError, TypeError):
                         self.logger.warning(f"无效的数值参数 '{key}': {value}，使用默认值")
                 # 验证布尔类型参数
-                elif key in ['set_outline', 'h1_bold', 'h2_bold', 'h3_bold', 'table_caption_bold', 'figure_caption_bold', 'body_use_times_roman', 'table_use_times_roman']:
+                elif key in ['set_outline', 'h1_bold', 'h2_bold', 'h3_bold', 'table_caption_bold', 'figure_caption_bold', 'body_use_times_roman', 'table_use_times_roman', 'style_mode', 'format_cache']:
                     validated_config[key] = bool(value)
+                # 验证转换池参数（非负整数，转换器数量至少为1）
+                elif key in ['converter_pool_size', 'converter_recycle_after']:
+                    try:
+                        minimum = 1 if key == 'converter_pool_size' else 0
+                        validated_config[key] = max(minimum, int(value))
+                    except (ValueError, TypeError):
+                        self.logger.warning(f"无效的转换池参数 '{key}': {value}，使用默认值")
+                # 验证单文档并行排版参数（非负整数）
+                elif key in ['parallel_workers', 'parallel_min_blocks']:
+                    try:
+                        validated_config[key] = max(0, int(value))
+                    except (ValueError, TypeError):
+                        self.logger.warning(f"无效的并行排版参数 '{key}': {value}，使用默认值")
+                # 验证日志级别参数
+                elif key == 'log_level':
+                    if str(value).lower() in LOG_LEVEL_NAMES:
+                        validated_config[key] = str(value).lower()
+                    else:
+                        self.logger.warning(f"无效的日志级别 '{value}'，使用默认值")
+                # 验证预处理引擎参数
+                elif key == 'preprocess_engine':
+                    if value in ('native', 'com'):
+                        validated_config[key] = value
+                    else:
+                        self.logger.warning(f"无效的预处理引擎 '{value}'，使用默认值")
+                # 验证排版引擎参数
+                elif key == 'format_engine':
+                    if value in FORMAT_ENGINES:
+                        validated_config[key] = value
+                    else:
+                        self.logger.warning(f"无效的排版引擎 '{value}'，使用默认值")
+                elif key == 'streaming_min_mb':
+                    try:
+                        validated_config[key] = max(0.0, float(value))
+                    except (ValueError, TypeError):
+                        self.logger.warning(f"无效的流式排版参数 '{key}': {value}，使用默认值")
                 # 验证大纲级别参数
                 elif key in ['table_caption_outline_level', 'figure_caption_outline_level']:
                     if value == '无' or value == '':
@@ -232,6 +290,11 @@ class ConfigManager:
                 # 更新检查URL
                 elif key == 'update_check_url':
                     validated_config[key] = str(value)
+                elif key in ('update_download_retries', 'check_update_interval'):
+                    try:
+                        validated_config[key] = max(0, int(value))
+                    except (TypeError, ValueError):
+                        pass
                     
         return validated_config
 
@@ -258,6 +321,25 @@ class ConfigManager:
             **validated_update_config
         }
 
+    def build_formatting_plan(self, config=None):
+        """
+        验证排版配置并生成不可变的排版计划，指纹相同的配置直接复用已生成的计划
+
+        Args:
+            config (dict): 排版配置，为None时使用已加载的排版配置（未加载时使用默认配置）
+
+        Returns:
+            FormattingPlan: 排版计划
+        """
+        if config is None:
+            config = self.format_config if self.format_config is not None else self.default_format_params
+        validated_config = self._validate_format_config(config)
+        fingerprint = config_fingerprint(validated_config)
+        plan = self._plan_cache.get(fingerprint)
+        if plan is None:
+            plan = self._plan_cache[fingerprint] = FormattingPlan.from_config(validated_config)
+        return plan
+
     def get_font_options(self, font_type):
         """
         获取指定类型的字体选项
@@ -0,0 +1,380 @@
+import os
+import queue
+import shutil
+import threading
+import time
+import zipfile
+from concurrent.futures import Future
+
+from .exception_handler import ApplicationError
+
+
+def wait_for_file(path, timeout=10.0, interval=0.05):
+    """
+    等待WPS/Word保存的文件写入完成：文件存在、大小连续两次不变且可以独占打开
+
+    代替保存后固定等待的做法，文件就绪后立即返回。
+
+    Args:
+        path (str): 文件路径
+        timeout (float): 最长等待秒数
+        interval (float): 轮询间隔秒数
+
+    Returns:
+        bool: 文件在超时前就绪时返回True
+    """
+    deadline = time.monotonic() + timeout
+    last_size = -1
+    while True:
+        try:
+            size = os.path.getsize(path)
+            if size > 0 and size == last_size:
+                # 仍被WPS/Word占用时以追加方式打开会失败（Windows）
+                with open(path, 'ab'):
+                    return True
+            last_size = size
+        except OSError:
+            last_size = -1
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(interval)
+
+
+class BaseConverter:
+    """
+    文档转换器接口
+
+    转换器实例只在一个工作线程中创建、使用和关闭（COM对象与创建它的线程绑定）。
+    各方法通过 log 回调输出日志，由转换池在调用方线程中统一输出。
+    """
+
+    name = "转换器"
+
+    def start(self, log):
+        """启动转换器（如启动WPS/Word应用）"""
+
+    def convert_to_docx(self, input_path, output_path, log):
+        """将 .doc/.wps 文件转换为 .docx"""
+        raise NotImplementedError
+
+    def preprocess(self, docx_path, log):
+        """就地预处理 .docx 文件：关闭修订追踪、接受所有修订、将自动编号转换为文本"""
+        raise NotImplementedError
+
+    def is_healthy(self):
+        """检查转换器是否仍可用"""
+        return True
+
+    def close(self, log):
+        """关闭转换器"""
+
+
+class ComConverter(BaseConverter):
+    """通过 WPS/Word 的COM接口转换和预处理文档，优先使用WPS"""
+
+    name = "WPS/Word"
+    PROG_IDS = (('KWPS.Application', "WPS"), ('Word.Application', "Word"))
+
+    def __init__(self, file_ready_timeout=10.0):
+        self.app = None
+        self.file_ready_timeout = file_ready_timeout
+        self._pythoncom = None
+
+    def start(self, log):
+        # 延迟导入，非Windows环境或未安装pywin32时只有真正使用COM时才报错
+        import pythoncom
+        import win32com.client
+
+        pythoncom.CoInitialize()
+        self._pythoncom = pythoncom
+        log("首次需要，正在启动WPS/Word应用...")
+        errors = []
+        for prog_id, app_name in self.PROG_IDS:
+            try:
+                self.app = win32com.client.Dispatch(prog_id)
+                log(f"  > 已成功连接到{app_name}。")
+                break
+            except Exception as e:
+                errors.append(e)
+        else:
+            pythoncom.CoUninitialize()
+            self._pythoncom = None
+            raise ApplicationError(f"未能启动WPS或Word，请确保已安装。错误: {errors[-1]}", errors[-1])
+        self.app.Visible = False
+
+    def convert_to_docx(self, input_path, output_path, log):
+        doc_com = self.app.Documents.Open(os.path.abspath(input_path), ReadOnly=1)
+        try:
+            doc_com.SaveAs2(os.path.abspath(output_path), FileFormat=12)
+        finally:
+            doc_com.Close()
+        if not wait_for_file(output_path, self.file_ready_timeout):
+            log(f"  > 警告：等待转换结果写入超时: {output_path}")
+
+    def preprocess(self, docx_path, log):
+        log("正在对副本执行预处理（接受所有修订、转换自动编号）...")
+        try:
+            doc_com = self.app.Documents.Open(os.path.abspath(docx_path))
+
+            doc_com.TrackRevisions = False
+            log("  > 已关闭修订追踪。")
+
+            if doc_com.Revisions.Count > 0:
+                doc_com.AcceptAllRevisions()
+                log("  > 已接受文档副本中的所有修订。")
+
+            doc_com.Content.ListFormat.ConvertNumbersToText()
+            log("  > 已将副本中的自动编号转换为文本。")
+
+            if doc_com.Revisions.Count > 0:
+                doc_com.AcceptAllRevisions()
+                log("  > 已接受编号转换产生的修订。")
+
+            doc_com.TrackRevisions = False
+
+            # 确保文档被正确保存
+            doc_com.Save()
+            doc_com.Close()
+            log("预处理完成。")
+
+            # 等待文件写入完成后再读取
+            if not wait_for_file(docx_path, self.file_ready_timeout):
+                log(f"  > 警告：等待预处理结果写入超时: {docx_path}")
+        except Exception as e:
+            log(f"警告：执行预处理任务时出错: {e}")
+
+    def is_healthy(self):
+        try:
+            self.app.Documents.Count
+            return True
+        except Exception:
+            return False
+
+    def close(self, log):
+        if self.app is not None:
+            log("正在关闭WPS/Word应用...")
+            try:
+                self.app.Quit()
+            except Exception as e:
+                log(f"  > 警告：关闭WPS/Word应用失败: {e}")
+            self.app = None
+            log("  > 应用已关闭。")
+        if self._pythoncom is not None:
+            self._pythoncom.CoUninitialize()
+            self._pythoncom = None
+
+
+class FakeConverter(BaseConverter):
+    """
+    本地模拟转换器，不依赖WPS/Word，用于在Linux等环境下运行转换池
+
+    - 输入本身是 .docx（zip）时直接复制，否则按文本逐行生成 .docx；
+    - 预处理不做任何修改；
+    - 可模拟转换耗时，以及处理若干个文档后失效（健康检查失败）。
+    """
+
+    name = "模拟转换器"
+
+    def __init__(self, delay=0.0, fail_after=None):
+        self.delay = delay
+        self.fail_after = fail_after
+        self.processed = 0
+        self.started = False
+
+    def start(self, log):
+        self.started = True
+        log(f"  > 已启动{self.name}。")
+
+    def _tick(self):
+        if self.delay:
+            time.sleep(self.delay)
+        self.processed += 1
+
+    def convert_to_docx(self, input_path, output_path, log):
+        self._tick()
+        if zipfile.is_zipfile(input_path):
+            shutil.copyfile(input_path, output_path)
+            return
+        from docx import Document
+        doc = Document()
+        with open(input_path, 'rb') as f:
+            for line in f.read().decode('utf-8', errors='replace').splitlines():
+                doc.add_paragraph(line.strip())
+        doc.save(output_path)
+
+    def preprocess(self, docx_path, log):
+        self._tick()
+        log("  > （模拟）预处理完成。")
+
+    def is_healthy(self):
+        return self.started and (self.fail_after is None or self.processed < self.fail_after)
+
+    def close(self, log):
+        self.started = False
+
+
+class ConverterPool:
+    """
+    文档转换池：N 个常驻工作线程各自持有一个转换器实例，前面是一个任务队列
+
+    - 转换器在工作线程首次取到任务时启动，每次执行任务前做健康检查，失效时重新创建；
+    - 每个转换器处理 recycle_after 个文档后关闭并重建，避免WPS/Word长时间运行后变慢或泄漏；
+    - 任务出错时关闭该转换器，下一个任务使用新实例；
+    - 转换器输出的日志随结果返回，由调用方线程输出（界面日志回调不是线程安全的）。
+    """
+
+    def __init__(self, converter_factory=ComConverter, size=1, recycle_after=50, log_callback=None):
+        """
+        初始化转换池
+
+        Args:
+            converter_factory (callable): 创建转换器实例的工厂（如 ComConverter、FakeConverter）
+            size (int): 工作线程（转换器）数量
+            recycle_after (int): 每个转换器处理多少个文档后重建，0 表示不重建
+            log_callback (callable): 日志回调函数
+        """
+        self.converter_factory = converter_factory
+        self.size = max(1, int(size))
+        self.recycle_after = int(recycle_after)
+        self.log_callback = log_callback
+        self._tasks = queue.Queue()
+        self._workers = []
+        self._lock = threading.Lock()
+        self._closed = False
+        # 工作线程退出时关闭转换器产生的日志，由 shutdown() 在调用方线程中输出
+        self._exit_logs = []
+
+    def _log(self, message):
+        if self.log_callback:
+            self.log_callback(message)
+
+    def _ensure_workers(self):
+        with self._lock:
+            if self._closed:
+                raise ApplicationError("转换池已关闭")
+            while len(self._workers) < self.size:
+                worker = threading.Thread(target=self._worker_loop, name=f"converter-{len(self._workers) + 1}",
+                                          daemon=True)
+                worker.start()
+                self._workers.append(worker)
+
+    def submit(self, method, *args):
+        """
+        提交转换任务
+
+        Args:
+            method (str): 转换器方法名，'convert_to_docx' 或 'preprocess'
+            *args: 方法参数（不含 log）
+
+        Returns:
+            Future: 结果为 (返回值, 日志列表)
+        """
+        self._ensure_workers()
+        future = Future()
+        self._tasks.put((method, args, future))
+        return future
+
+    def result(self, future):
+        """等待任务完成，在调用方线程中输出任务日志并返回结果"""
+        try:
+            value, messages = future.result()
+        except Exception as e:
+            for message in getattr(e, 'converter_logs', ()):
+                self._log(message)
+            raise
+        for message in messages:
+            self._log(message)
+        return value
+
+    def convert_to_docx(self, input_path, output_path):
+        """将 .doc/.wps 文件转换为 .docx（阻塞直到完成）"""
+        return self.result(self.submit('convert_to_docx', input_path, output_path))
+
+    def preprocess(self, docx_path):
+        """就地预处理 .docx 文件（阻塞直到完成）"""
+        return self.result(self.submit('preprocess', docx_path))
+
+    def _worker_loop(self):
+        converter = None
+        processed = 0
+        try:
+            while True:
+                task = self._tasks.get()
+                if task is None:
+                    break
+                method, args, future = task
+                if not future.set_running_or_notify_cancel():
+                    continue
+
+                messages = []
+                try:
+                    if converter is not None and not converter.is_healthy():
+                        messages.append(f"  > {converter.name}已失效，正在重新启动...")
+                        self._close_converter(converter, messages)
+                        converter = None
+                    if converter is None:
+                        converter = self.converter_factory()
+                        processed = 0
+                        converter.start(messages.append)
+                    value = getattr(converter, method)(*args, messages.append)
+                except Exception as e:
+                    # 出错的转换器（如无响应的WPS/Word）不再复用
+                    if converter is not None:
+                        self._close_converter(converter, messages)
+                        converter = None
+                    e.converter_logs = messages
+                    future.set_exception(e)
+                    continue
+
+                processed += 1
+                if self.recycle_after and processed >= self.recycle_after:
+                    messages.append(f"  > {converter.name}已处理 {processed} 个文档，正在重建...")
+                    self._close_converter(converter, messages)
+                    converter = None
+                future.set_result((value, messages))
+        finally:
+            if converter is not None:
+                messages = []
+                self._close_converter(converter, messages)
+                with self._lock:
+                    self._exit_logs.extend(messages)
+
+    @staticmethod
+    def _close_converter(converter, messages):
+        try:
+            converter.close(messages.append)
+        except Exception as e:
+            messages.append(f"  > 警告：关闭{converter.name}失败: {e}")
+
+    @property
+    def started(self):
+        """是否已有工作线程在运行"""
+        return bool(self._workers)
+
+    def shutdown(self, wait=True):
+        """
+        关闭转换池：等待队列中已提交的任务完成后关闭所有转换器
+
+        Args:
+            wait (bool): 是否等待工作线程退出
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            workers = list(self._workers)
+        for _ in workers:
+            self._tasks.put(None)
+        if wait:
+            for worker in workers:
+                worker.join()
+            with self._lock:
+                messages, self._exit_logs = self._exit_logs, []
+            for message in messages:
+                self._log(message)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
@@ -0,0 +1,211 @@
+import hashlib
+import json
+import lzma
+import os
+import re
+import struct
+
+from .hashing import file_sha256
+
+# 增量更新包格式：魔数、头部长度（4字节小端）、JSON头部，之后是 lzma 压缩的操作序列
+DELTA_MAGIC = b'WFDELTA1'
+DELTA_FORMAT = 1
+DELTA_SUFFIX = '.wfdelta'
+
+# 内容定义分块：块在这些字节对之后结束（在压缩数据中约每16KB出现一次），
+# 插入或删除内容后，其后的分块边界很快与旧文件重新对齐，未变化的内容仍能按块匹配
+_CHUNK_ANCHOR = re.compile(rb'\x8f\xd3|\x4b\xe1|\xc6\x2a|\x1d\x97')
+MIN_CHUNK_SIZE = 4 * 1024
+MAX_CHUNK_SIZE = 64 * 1024
+
+# 操作：从旧文件复制（偏移、长度），或插入随后的数据（长度）；长度为4字节，程序文件不超过4GB
+_OP_COPY = b'C'
+_OP_INSERT = b'I'
+_COPY_ARGS = struct.Struct('<QI')
+_INSERT_ARGS = struct.Struct('<I')
+_HEADER_LENGTH = struct.Struct('<I')
+_IO_BLOCK = 1024 * 1024
+
+
+class DeltaError(Exception):
+    """增量更新包无效，或与本机的程序文件不匹配"""
+
+
+def iter_chunks(data):
+    """
+    将数据按内容切分为块
+
+    Args:
+        data (bytes): 文件内容
+
+    Yields:
+        tuple: (起始偏移, 长度)
+    """
+    size = len(data)
+    start = 0
+    while start < size:
+        limit = min(start + MAX_CHUNK_SIZE, size)
+        match = _CHUNK_ANCHOR.search(data, start + MIN_CHUNK_SIZE, limit)
+        end = match.end() if match else limit
+        yield start, end - start
+        start = end
+
+
+def _chunk_key(view):
+    return hashlib.blake2b(view, digest_size=16).digest()
+
+
+def make_delta(old_path, new_path, delta_path, source_version='', target_version=''):
+    """
+    生成从旧文件到新文件的增量更新包（构建端使用）
+
+    新文件按内容分块，与旧文件中某一块完全相同的块记为复制操作，其余内容原样写入；
+    相邻的复制、插入操作合并后整体用 lzma 压缩。
+
+    Args:
+        old_path (str): 上一版本的程序文件
+        new_path (str): 新版本的程序文件
+        delta_path (str): 输出的增量更新包路径
+        source_version (str): 旧文件的版本号，记录在头部
+        target_version (str): 新文件的版本号，记录在头部
+
+    Returns:
+        dict: 增量更新包的头部信息，另含 copied_bytes、inserted_bytes、delta_size
+    """
+    with open(old_path, 'rb') as f:
+        old = f.read()
+    with open(new_path, 'rb') as f:
+        new = f.read()
+
+    old_view, new_view = memoryview(old), memoryview(new)
+    index = {}
+    for offset, length in iter_chunks(old):
+        index.setdefault(_chunk_key(old_view[offset:offset + length]), offset)
+
+    # 操作列表：[复制, 旧文件偏移, 长度] 或 [插入, 新文件偏移, 长度]
+    ops = []
+    for offset, length in iter_chunks(new):
+        old_offset = index.get(_chunk_key(new_view[offset:offset + length]))
+        if old_offset is not None and old[old_offset:old_offset + length] == new[offset:offset + length]:
+            last = ops[-1] if ops else None
+            if last and last[0] == _OP_COPY and last[1] + last[2] == old_offset:
+                last[2] += length
+            else:
+                ops.append([_OP_COPY, old_offset, length])
+        else:
+            last = ops[-1] if ops else None
+            if last and last[0] == _OP_INSERT and last[1] + last[2] == offset:
+                last[2] += length
+            else:
+                ops.append([_OP_INSERT, offset, length])
+
+    header = {
+        'format': DELTA_FORMAT,
+        'source_version': source_version,
+        'target_version': target_version,
+        'source_size': len(old),
+        'source_sha256': hashlib.sha256(old).hexdigest(),
+        'target_size': len(new),
+        'target_sha256': hashlib.sha256(new).hexdigest(),
+    }
+    header_bytes = json.dumps(header).encode('utf-8')
+    copied_bytes = inserted_bytes = 0
+    with open(delta_path, 'wb') as f:
+        f.write(DELTA_MAGIC + _HEADER_LENGTH.pack(len(header_bytes)) + header_bytes)
+        with lzma.LZMAFile(f, 'wb', preset=6) as out:
+            for op, offset, length in ops:
+                if op == _OP_COPY:
+                    out.write(_OP_COPY + _COPY_ARGS.pack(offset, length))
+                    copied_bytes += length
+                else:
+                    out.write(_OP_INSERT + _INSERT_ARGS.pack(length))
+                    out.write(new_view[offset:offset + length])
+                    inserted_bytes += length
+    return dict(header, copied_bytes=copied_bytes, inserted_bytes=inserted_bytes,
+                delta_size=os.path.getsize(delta_path))
+
+
+def read_delta_header(f):
+    """读取增量更新包的头部，文件位置移到操作序列的开头"""
+    magic = f.read(len(DELTA_MAGIC))
+    if magic != DELTA_MAGIC:
+        raise DeltaError("不是有效的增量更新包")
+    length_bytes = f.read(_HEADER_LENGTH.size)
+    if len(length_bytes) != _HEADER_LENGTH.size:
+        raise DeltaError("增量更新包已损坏")
+    try:
+        header = json.loads(f.read(_HEADER_LENGTH.unpack(length_bytes)[0]).decode('utf-8'))
+    except ValueError:
+        raise DeltaError("增量更新包已损坏")
+    if header.get('format') != DELTA_FORMAT:
+        raise DeltaError(f"不支持的增量更新包格式: {header.get('format')}")
+    return header
+
+
+def _read_exact(f, size):
+    data = f.read(size)
+    if len(data) != size:
+        raise DeltaError("增量更新包已损坏")
+    return data
+
+
+def apply_delta(old_path, delta_path, new_path):
+    """
+    用增量更新包和本机的旧文件生成新文件，并校验新文件的大小和SHA-256
+
+    旧文件不会被修改；新文件校验失败时删除并抛出 DeltaError。
+
+    Args:
+        old_path (str): 本机的程序文件
+        delta_path (str): 增量更新包
+        new_path (str): 生成的新文件路径
+
+    Returns:
+        dict: 增量更新包的头部信息
+    """
+    with open(delta_path, 'rb') as f:
+        header = read_delta_header(f)
+        if os.path.getsize(old_path) != header['source_size'] or file_sha256(old_path) != header['source_sha256']:
+            raise DeltaError("本机程序文件与增量更新包的基准版本不一致")
+
+        digest = hashlib.sha256()
+        written = 0
+        try:
+            with open(old_path, 'rb') as old, open(new_path, 'wb') as out, lzma.LZMAFile(f, 'rb') as ops:
+                while True:
+                    op = ops.read(1)
+                    if not op:
+                        break
+                    if op == _OP_COPY:
+                        offset, length = _COPY_ARGS.unpack(_read_exact(ops, _COPY_ARGS.size))
+                        if offset + length > header['source_size']:
+                            raise DeltaError("增量更新包已损坏")
+                        old.seek(offset)
+                        source = old
+                    elif op == _OP_INSERT:
+                        (length,) = _INSERT_ARGS.unpack(_read_exact(ops, _INSERT_ARGS.size))
+                        source = ops
+                    else:
+                        raise DeltaError("增量更新包已损坏")
+                    while length:
+                        block = _read_exact(source, min(length, _IO_BLOCK))
+                        out.write(block)
+                        digest.update(block)
+                        written += len(block)
+                        length -= len(block)
+            if written != header['target_size'] or digest.hexdigest() != header['target_sha256']:
+                raise DeltaError("增量更新后的文件校验失败")
+        except DeltaError:
+            _remove_quietly(new_path)
+            raise
+        except (lzma.LZMAError, EOFError) as e:
+            _remove_quietly(new_path)
+            raise DeltaError(f"增量更新包已损坏: {e}")
+    return header
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
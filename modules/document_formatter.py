@@ -1,6 +1,6 @@
 import logging
 from docx import Document
-from docx.shared import Pt, Cm, RGBColor
+from docx.shared import Pt, Cm
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 from docx.oxml import OxmlElement
 from docx.oxml.ns import qn
@@ -11,7 +11,8 @@ from docx.oxml.text.paragraph import CT_P
 from docx.table import Table, _Cell
 from docx.text.paragraph import Paragraph
 
-from .logger import global_logger
+from .logger import emit_log, global_logger, resolve_log_level
+from .run_formatter import RunFormatter
 
 
 class DocumentFormatter:
@@ -19,12 +20,14 @@ class DocumentFormatter:
         self.config = config
         self.log_callback = log_callback
         self.logger = global_logger
+        self.log_level = resolve_log_level(config.get('log_level', 'info'))
+        self.run_formatter = RunFormatter()
 
-    def _log(self, message):
-        if self.log_callback:
-            self.log_callback(message)
-        else:
-            self.logger.info(message)
+    def _log(self, message, *args, level=logging.INFO):
+        """输出日志，级别过滤和格式化见 logger.emit_log；没有日志回调时写入全局日志"""
+        message = emit_log(self.log_callback, self.log_level, message, args, level)
+        if message is not None and not self.log_callback:
+            self.logger.logger.log(level, message)
 
     def _set_run_font(self, run, font_name, size_pt, set_color=False, is_bold=False, use_times_roman_for_ascii=False):
         """设置单个run的字体属性
@@ -32,90 +35,13 @@ class DocumentFormatter:
         参数:
             use_times_roman_for_ascii: 如果为True，将ASCII字符（英文、数字、符号）设置为Times New Roman字体
         """
-        # 尝试多种字体名称设置方式
-        # 1. 设置高级API的font.name属性
-        run.font.name = font_name
-        run.font.size = Pt(size_pt)
-        run.font.bold = is_bold
-
-        if set_color:
-            run.font.color.rgb = RGBColor(0, 0, 0)
-        
-        # 2. 直接设置XML的rFonts元素，确保所有字符类型都使用相同字体
-        rPr = run._r.get_or_add_rPr()
-        rFonts = rPr.get_or_add_rFonts()
-        
-        # 确定要使用的字体
-        ascii_font = "Times New Roman" if use_times_roman_for_ascii else font_name
-        
-        # 设置所有字符类型的字体
-        rFonts.set(qn('w:ascii'), ascii_font)      # ASCII字符（英文、数字、符号）
-        rFonts.set(qn('w:hAnsi'), ascii_font)      # 高ASCII字符
-        rFonts.set(qn('w:eastAsia'), font_name)    # 中文字体
-        
-        # 3. 额外设置cs（复杂脚本）字体，确保所有语言都能正确显示
-        rFonts.set(qn('w:cs'), font_name)
-        
-        # 4. 清除可能存在的字体主题设置，确保使用指定的字体
-        if hasattr(rFonts, 'themeFont'):
-            rFonts.themeFont = None
-        if hasattr(rFonts, 'themeFontAscii'):
-            rFonts.themeFontAscii = None
-        if hasattr(rFonts, 'themeFontHAnsi'):
-            rFonts.themeFontHAnsi = None
-        if hasattr(rFonts, 'themeFontEastAsia'):
-            rFonts.themeFontEastAsia = None
-        if hasattr(rFonts, 'themeFontCs'):
-            rFonts.themeFontCs = None
-
-    def _set_run_font_without_size(self, run, font_name, set_color=False, use_times_roman_for_ascii=False):
-        """设置单个run的字体属性，但不修改字体大小
-        
-        参数:
-            use_times_roman_for_ascii: 如果为True，将ASCII字符（英文、数字、符号）设置为Times New Roman字体
-        """
-        # 尝试多种字体名称设置方式
-        # 1. 设置高级API的font.name属性
-        run.font.name = font_name
-        # 不设置字体大小，保持原始大小不变
-        # run.font.size = Pt(size_pt)  # 这行被注释掉，不设置字体大小
-        # 不设置字体粗细，保持原始粗细不变
-        # run.font.bold = is_bold  # 这行被注释掉，不设置字体粗细
-
-        if set_color:
-            run.font.color.rgb = RGBColor(0, 0, 0)
-        
-        # 2. 直接设置XML的rFonts元素，确保所有字符类型都使用相同字体
-        rPr = run._r.get_or_add_rPr()
-        rFonts = rPr.get_or_add_rFonts()
-        
-        # 确定要使用的字体
-        ascii_font = "Times New Roman" if use_times_roman_for_ascii else font_name
-        
-        # 设置所有字符类型的字体
-        rFonts.set(qn('w:ascii'), ascii_font)      # ASCII字符（英文、数字、符号）
-        rFonts.set(qn('w:hAnsi'), ascii_font)      # 高ASCII字符
-        rFonts.set(qn('w:eastAsia'), font_name)    # 中文字体
-        
-        # 3. 额外设置cs（复杂脚本）字体，确保所有语言都能正确显示
-        rFonts.set(qn('w:cs'), font_name)
-        
-        # 4. 清除可能存在的字体主题设置，确保使用指定的字体
-        if hasattr(rFonts, 'themeFont'):
-            rFonts.themeFont = None
-        if hasattr(rFonts, 'themeFontAscii'):
-            rFonts.themeFontAscii = None
-        if hasattr(rFonts, 'themeFontHAnsi'):
-            rFonts.themeFontHAnsi = None
-        if hasattr(rFonts, 'themeFontEastAsia'):
-            rFonts.themeFontEastAsia = None
-        if hasattr(rFonts, 'themeFontCs'):
-            rFonts.themeFontCs = None
+        self.run_formatter.apply(run._r, font_name, size_pt, is_bold=is_bold, set_color=set_color,
+                                 use_times_roman_for_ascii=use_times_roman_for_ascii)
 
     def _apply_font_to_runs(self, para, font_name, size_pt, set_color=False, is_bold=False, use_times_roman_for_ascii=False):
-        """应用字体设置到段落的所有runs"""
-        for run in para.runs:
-            self._set_run_font(run, font_name, size_pt, set_color=set_color, is_bold=is_bold, use_times_roman_for_ascii=use_times_roman_for_ascii)
+        """应用字体设置到段落的所有runs（直接遍历run元素，不创建Run对象）"""
+        self.run_formatter.apply_to_runs(para._p.r_lst, font_name, size_pt, is_bold=is_bold, set_color=set_color,
+                                         use_times_roman_for_ascii=use_times_roman_for_ascii)
 
     def _get_paragraph_font_info(self, para):
         """获取段落主要字体和字号信息"""
@@ -143,7 +69,7 @@ class DocumentFormatter:
         stripped_text = original_text.lstrip()
         if original_text != stripped_text:
             first_run.text = stripped_text
-            self._log("  > 已移除段落前的多余空格。")
+            self._log("  > 已移除段落前的多余空格。", level=logging.DEBUG)
 
     def _reset_pagination_properties(self, para):
         para.paragraph_format.widow_control = False
@@ -178,7 +104,7 @@ class DocumentFormatter:
         返回: 原有的大纲级别 (0-8) 或 None
         """
         if level < 1 or level > 9:
-            self._log(f"  > 警告：大纲级别 {level} 超出范围 (1-9)，已跳过设置")
+            self._log("  > 警告：大纲级别 %s 超出范围 (1-9)，已跳过设置", level, level=logging.WARNING)
             return None
 
         # 读取原有大纲级别
@@ -242,7 +168,7 @@ class DocumentFormatter:
             para._has_no_indent = True
             
         except Exception as e:
-            self._log(f"设置标题缩进时出错: {e}")
+            self._log("设置标题缩进时出错: %s", e, level=logging.WARNING)
             # 即使发生异常，仍然尝试通过简单的API调用确保没有缩进
             try:
                 para.paragraph_format.first_line_indent = None
@@ -271,7 +197,7 @@ class DocumentFormatter:
             if outlineLvl is not None:
                 pPr.remove(outlineLvl)
         except Exception as e:
-            self._log(f"清除正文段落大纲级别时出错: {e}")
+            self._log("清除正文段落大纲级别时出错: %s", e, level=logging.WARNING)
 
     def _iter_block_items(self, parent):
         parent_elm = parent.element.body if isinstance(parent, _Document) else parent._tc
@@ -1,206 +1,376 @@
+import codecs
+import io
+import itertools
+import logging
+import mmap
 import os
 import re
-import shutil
 import tempfile
-import win32com.client
-from docx import Document
+from docx.oxml.ns import qn
 
+from .converter_pool import ComConverter, ConverterPool
 from .exception_handler import FileProcessingError, global_exception_handler
+from .logger import emit_log, resolve_log_level
+from .ooxml_preprocessor import OoxmlPreprocessor
+
+# XML 1.0 不允许的控制字符（制表符、换行、回车除外），TXT日志文件中常见的换页符等会导致写入失败
+_XML_INVALID_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+# 检测编码时每次读取的字节数
+_ENCODING_SNIFF_CHUNK = 1024 * 1024
+
+# 修订标记，存在时需要预处理（接受所有修订）
+_REVISION_TAGS = tuple(qn(f'w:{name}') for name in (
+    'ins', 'del', 'moveFrom', 'moveTo', 'rPrChange', 'pPrChange', 'sectPrChange', 'tblPrChange',
+    'trPrChange', 'tcPrChange', 'tblGridChange', 'numberingChange', 'cellIns', 'cellDel', 'cellMerge',
+))
+_NUM_PR = qn('w:numPr')
+# 需要借助WPS/Word转换为 .docx 的格式
+_CONVERTIBLE_EXTS = ('.wps', '.doc')
+
+
+class MappedFile:
+    """
+    以只读内存映射方式打开的文件，提供与 BytesIO 相同的读取接口（read/seek/tell/getbuffer/getvalue）
+
+    文件内容由操作系统按需读入页缓存，不再在进程中复制一份；批量处理的多个工作进程、重复处理同一文件时
+    共享同一份页缓存，图片较多的大文档内存占用明显减少。映射期间文件被占用（Windows 下不能删除或替换），
+    用完后应调用 close()。
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def read(self, size=-1):
+        return self._map.read(size)
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        # mmap.seek 越界时抛出 ValueError；与 BytesIO 一致，位置限制在文件范围内
+        # （zipfile 对过短的文件从末尾向前定位，越界时应得到“不是zip文件”的错误）
+        if whence == os.SEEK_CUR:
+            offset += self._map.tell()
+        elif whence == os.SEEK_END:
+            offset += len(self._map)
+        self._map.seek(min(max(offset, 0), len(self._map)))
+        return self._map.tell()
+
+    def tell(self):
+        return self._map.tell()
+
+    def seekable(self):
+        return True
+
+    def readable(self):
+        return True
+
+    def getbuffer(self):
+        return memoryview(self._map)
+
+    def getvalue(self):
+        return self._map[:]
+
+    @property
+    def closed(self):
+        return self._map.closed
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
 
 class FileProcessor:
-    def __init__(self, log_callback=None):
+    def __init__(self, log_callback=None, temp_dir=None, converter_pool=None, pool_size=1, recycle_after=50,
+                 log_level='info'):
+        """
+        初始化文件处理器
+
+        Args:
+            log_callback (callable): 日志回调函数
+            temp_dir (str): 临时文件目录
+            converter_pool (ConverterPool): 共享的转换池；为None时首次需要转换时创建自己的WPS/Word转换池
+            pool_size (int): 自建转换池的转换器数量
+            recycle_after (int): 自建转换池中每个转换器处理多少个文档后重建
+            log_level (str): 日志级别，'debug'、'info' 或 'warning'
+        """
         self.temp_files = []
         self.log_callback = log_callback
-        self.com_app = None
-
-    def _log(self, message):
-        if self.log_callback:
-            self.log_callback(message)
+        self.log_level = resolve_log_level(log_level)
+        # 临时文件目录，默认使用系统临时目录；批量多进程处理时每个工作进程使用独立目录，避免同名副本互相覆盖
+        self.temp_dir = temp_dir
+        self.converter_pool = converter_pool
+        self._owns_pool = converter_pool is None
+        self.pool_size = pool_size
+        self.recycle_after = recycle_after
+        # 已提前提交的格式转换：输入路径 -> (Future, 临时文件路径)
+        self._pending_conversions = {}
+        self._temp_counter = itertools.count(1)
+
+    def _log(self, message, *args, level=logging.INFO):
+        """输出日志，级别过滤和格式化见 logger.emit_log"""
+        emit_log(self.log_callback, self.log_level, message, args, level)
 
     def _cleanup_temp_files(self):
         self._log("正在清理本轮临时文件...")
+        # 提前提交、尚未使用的转换结果留到对应文件处理时再删除
+        pending = {temp_docx_path for _, temp_docx_path in self._pending_conversions.values()}
         for f in self.temp_files:
+            if f in pending:
+                continue
             try:
                 if os.path.exists(f):
                     os.remove(f)
-                    self._log(f"  > 临时文件 {os.path.basename(f)} 已删除")
+                    self._log("  > 临时文件 %s 已删除", os.path.basename(f), level=logging.DEBUG)
             except OSError as e:
-                self._log(f"  > 警告：删除临时文件 {f} 失败: {e}")
-        self.temp_files.clear()
+                self._log("  > 警告：删除临时文件 %s 失败: %s", f, e, level=logging.WARNING)
+        self.temp_files = [f for f in self.temp_files if f in pending]
 
-    def _get_wps_app(self):
-        if self.com_app is None:
-            self._log("首次需要，正在启动WPS/Word应用...")
-            try:
-                self.com_app = win32com.client.Dispatch('KWPS.Application')
-                self._log("  > 已成功连接到WPS。")
-            except Exception:
-                try:
-                    self.com_app = win32com.client.Dispatch('Word.Application')
-                    self._log("  > 已成功连接到Word。")
-                except Exception as e:
-                    raise RuntimeError(f"未能启动WPS或Word，请确保已安装。错误: {e}")
-            self.com_app.Visible = False
-        return self.com_app
+    def detect_txt_encoding(self, input_path):
+        """
+        检测TXT文件编码：整个文件能按UTF-8解码时使用UTF-8，否则使用GBK
 
-    def quit_com_app(self):
-        if self.com_app:
-            self._log("所有任务完成，正在关闭WPS/Word应用...")
-            self.com_app.Quit()
-            self.com_app = None
-            self._log("  > 应用已关闭。")
+        分块增量解码，不把整个文件读入内存；先确定编码再读取，避免读到一半才发现
+        不是UTF-8而重复生成已读取的段落。
 
-    def convert_to_docx(self, input_path):
+        Returns:
+            str: 'utf-8-sig'（兼容带BOM的UTF-8）或 'gbk'
+        """
+        decoder = codecs.getincrementaldecoder('utf-8')()
         try:
-            file_ext = os.path.splitext(input_path)[1].lower()
-            is_from_txt = (file_ext == '.txt')
+            with open(input_path, 'rb') as f:
+                while True:
+                    chunk = f.read(_ENCODING_SNIFF_CHUNK)
+                    decoder.decode(chunk, final=not chunk)
+                    if not chunk:
+                        break
+        except UnicodeDecodeError:
+            self._log("  > UTF-8读取失败，尝试使用 GBK 编码...")
+            return 'gbk'
+        return 'utf-8-sig'
+
+    def iter_txt_lines(self, input_path):
+        """
+        逐行读取TXT文件，编码在调用时即确定，文本在迭代时逐行读取
+
+        Returns:
+            iterator: 每一行去除首尾空白和XML非法控制字符后的文本（空行为空字符串）
+        """
+        encoding = self.detect_txt_encoding(input_path)
+        if encoding == 'gbk':
+            self._log("  > 已成功使用 GBK 编码读取TXT文件。")
+        else:
+            self._log("  > 已使用 UTF-8 编码读取TXT文件。")
+        return self._read_txt_lines(input_path, encoding)
+
+    @staticmethod
+    def _read_txt_lines(input_path, encoding):
+        with open(input_path, 'r', encoding=encoding) as f:
+            for line in f:
+                yield _XML_INVALID_CHARS.sub('', line).strip()
+
+    def _get_converter_pool(self):
+        if self.converter_pool is None:
+            self.converter_pool = ConverterPool(ComConverter, size=self.pool_size,
+                                                recycle_after=self.recycle_after, log_callback=self.log_callback)
+        return self.converter_pool
 
-            # 使用系统临时目录来避免权限问题
-            temp_dir = tempfile.gettempdir()
-            base_name = os.path.splitext(os.path.basename(input_path))[0]
+    def quit_com_app(self):
+        """关闭自建的转换池及其中的WPS/Word应用；共享的转换池由创建者负责关闭"""
+        # 取消尚未开始的提前转换
+        for future, _ in self._pending_conversions.values():
+            future.cancel()
+        if self._owns_pool and self.converter_pool is not None and self.converter_pool.started:
+            self._log("所有任务完成，正在关闭WPS/Word应用...")
+            self.converter_pool.shutdown()
+            self.converter_pool = None
+        for _, temp_docx_path in self._pending_conversions.values():
+            self._remove_temp_file(temp_docx_path)
+        self._pending_conversions.clear()
+
+    def _temp_docx_path(self, input_name, prefix):
+        """生成临时 .docx 文件路径，清理文件名中的特殊字符，避免在Windows系统中出现问题"""
+        # 使用系统临时目录来避免权限问题
+        temp_dir = self.temp_dir or tempfile.gettempdir()
+        base_name = os.path.splitext(os.path.basename(input_name))[0]
+        # 移除或替换可能引起问题的字符
+        cleaned_base_name = re.sub(r'[<>:"/\\|?*\x00-\x1F]', '_', base_name)
+        # 限制文件名长度，避免超过系统限制；移除末尾的点和空格（Windows不允许）
+        cleaned_base_name = cleaned_base_name[:100].rstrip('. ') or 'document'
+        # 加序号，同时转换的同名文件（来自不同目录）不会互相覆盖
+        return os.path.join(temp_dir, f"{prefix}{cleaned_base_name}_{next(self._temp_counter)}.docx")
+
+    def prefetch_conversions(self, input_paths):
+        """
+        提前把 .doc/.wps 文件提交给转换池，转换与前面文档的排版并行进行
+
+        Args:
+            input_paths: 之后将依次处理的输入文件路径
+        """
+        for input_path in input_paths:
+            input_path = os.fspath(input_path)
+            if os.path.splitext(input_path)[1].lower() not in _CONVERTIBLE_EXTS:
+                continue
+            if input_path in self._pending_conversions:
+                continue
+            temp_docx_path = self._temp_docx_path(input_path, "~temp_converted_")
+            self.temp_files.append(temp_docx_path)
+            future = self._get_converter_pool().submit('convert_to_docx', input_path, temp_docx_path)
+            self._pending_conversions[input_path] = (future, temp_docx_path)
 
-            # 清理文件名中的特殊字符，避免在Windows系统中出现问题
-            # 移除或替换可能引起问题的字符
-            cleaned_base_name = re.sub(r'[<>:"/\\|?*\x00-\x1F]', '_', base_name)
-            # 限制文件名长度，避免超过系统限制
-            cleaned_base_name = cleaned_base_name[:100] if len(cleaned_base_name) > 100 else cleaned_base_name
-            # 移除末尾的点和空格（Windows不允许）
-            cleaned_base_name = cleaned_base_name.rstrip('. ')
+    def _remove_temp_file(self, path):
+        """删除临时文件，失败时留给 _cleanup_temp_files() 处理"""
+        try:
+            if os.path.exists(path):
+                os.remove(path)
+            if path in self.temp_files:
+                self.temp_files.remove(path)
+        except OSError as e:
+            self._log("  > 警告：删除临时文件 %s 失败: %s", path, e, level=logging.WARNING)
+
+    def load_docx_stream(self, source):
+        """
+        将输入读入内存，得到 .docx 内容的 BytesIO
+
+        .docx 文件以只读内存映射方式打开（MappedFile），不复制到临时目录，也不在进程中另存一份；
+        .doc/.wps 文件需借助WPS/Word转换，转换结果读入内存后立即删除临时文件。
+
+        Args:
+            source: 文件路径（.docx/.doc/.wps），或 .docx 文件内容（bytes 或可读的文件对象）
+
+        Returns:
+            io.BytesIO 或 MappedFile: .docx 文件内容，用完后由调用方关闭
+        """
+        try:
+            if isinstance(source, (bytes, bytearray, memoryview)):
+                return io.BytesIO(source)
+            if hasattr(source, 'read'):
+                # 可能是不可定位的流（如网络流），复制一份供 python-docx 随机读取
+                return io.BytesIO(source.read())
 
-            # 添加调试信息
+            input_path = os.fspath(source)
+            file_ext = os.path.splitext(input_path)[1].lower()
             self._log(f"  > 原始文件路径: {input_path}")
-            self._log(f"  > 系统临时目录: {temp_dir}")
-            self._log(f"  > 清理后的文件名: {cleaned_base_name}")
 
             if file_ext == '.docx':
-                self._log("检测到 .docx 文件，正在创建安全的处理副本...")
-                temp_docx_path = os.path.join(temp_dir, f"~temp_copy_{cleaned_base_name}.docx")
-                self._log(f"  > 临时文件路径: {temp_docx_path}")
-
-                # 检查目标路径是否存在同名文件，如果存在则删除
-                if os.path.exists(temp_docx_path):
-                    self._log(f"  > 检测到同名临时文件，正在删除: {temp_docx_path}")
-                    try:
-                        os.remove(temp_docx_path)
-                    except Exception as e:
-                        self._log(f"  > 删除同名临时文件失败: {e}")
-
                 try:
-                    shutil.copy2(input_path, temp_docx_path)
+                    stream = MappedFile(input_path)
+                except (OSError, ValueError):
+                    # 空文件不能映射，某些网络位置不支持映射，改为整体读入
+                    with open(input_path, 'rb') as f:
+                        stream = io.BytesIO(f.read())
+                self._log("检测到 .docx 文件，已读入内存处理，原始文件不会被修改。")
+                return stream
+
+            if file_ext in _CONVERTIBLE_EXTS:
+                self._log(f"正在转换 {file_ext} 文件为 .docx...")
+                pool = self._get_converter_pool()
+                pending = self._pending_conversions.pop(input_path, None)
+                if pending is None:
+                    temp_docx_path = self._temp_docx_path(input_path, "~temp_converted_")
                     self.temp_files.append(temp_docx_path)
-                    self._log(f"  > 副本创建成功: {os.path.basename(temp_docx_path)}")
-
-                    # 验证文件是否创建成功
-                    if os.path.exists(temp_docx_path):
-                        self._log(f"  > 验证文件存在: {temp_docx_path}")
-                    else:
-                        self._log(f"  > 警告：文件创建后不存在: {temp_docx_path}")
-
-                    return temp_docx_path, is_from_txt
-                except Exception as e:
-                    self._log(f"  > 创建副本失败: {e}")
-                    # 如果复制失败，尝试使用不同的临时文件名
-                    for i in range(10):
-                        alt_temp_docx_path = os.path.join(temp_dir, f"~temp_copy_{cleaned_base_name}_{i}.docx")
-                        self._log(f"  > 尝试备用路径: {alt_temp_docx_path}")
-                        if not os.path.exists(alt_temp_docx_path):
-                            try:
-                                shutil.copy2(input_path, alt_temp_docx_path)
-                                self.temp_files.append(alt_temp_docx_path)
-                                self._log(f"  > 使用备用名称创建副本成功: {os.path.basename(alt_temp_docx_path)}")
-                                return alt_temp_docx_path, is_from_txt
-                            except Exception as e2:
-                                self._log(f"  > 备用名称创建副本也失败: {e2}")
-                                continue
-                    # 如果所有尝试都失败，抛出异常
-                    raise FileProcessingError(f"无法创建文件副本: {e}", e)
-
-            temp_docx_path = os.path.join(temp_dir, f"~temp_converted_{cleaned_base_name}.docx")
-            self.temp_files.append(temp_docx_path)
-            self._log(f"  > 转换文件路径: {temp_docx_path}")
-
-            if file_ext == '.txt':
-                self._log("检测到 .txt 文件，正在创建 .docx...")
-                doc = Document()
-                try:
-                    with open(input_path, 'r', encoding='utf-8') as f:
-                        for line in f:
-                            doc.add_paragraph(line.strip())
-                    self._log("  > 已使用 UTF-8 编码读取TXT文件。")
-                except UnicodeDecodeError:
-                    self._log("  > UTF-8读取失败，尝试使用 GBK 编码...")
-                    with open(input_path, 'r', encoding='gbk') as f:
-                        for line in f:
-                            doc.add_paragraph(line.strip())
-                    self._log("  > 已成功使用 GBK 编码读取TXT文件。")
-                doc.save(temp_docx_path)
-                self._log("TXT转换完成。")
-
-                # 验证文件是否创建成功
-                if os.path.exists(temp_docx_path):
-                    self._log(f"  > 验证文件存在: {temp_docx_path}")
+                    future = pool.submit('convert_to_docx', input_path, temp_docx_path)
                 else:
-                    self._log(f"  > 警告：文件创建后不存在: {temp_docx_path}")
-
-                return temp_docx_path, is_from_txt
-            elif file_ext in ['.wps', '.doc']:
-                self._log(f"正在转换 {file_ext} 文件为 .docx...")
-                app = self._get_wps_app()
-                doc_com = app.Documents.Open(os.path.abspath(input_path), ReadOnly=1)
-                doc_com.SaveAs2(os.path.abspath(temp_docx_path), FileFormat=12)
-                doc_com.Close()
+                    future, temp_docx_path = pending
+                self._log(f"  > 转换文件路径: {temp_docx_path}")
+                pool.result(future)
+                with open(temp_docx_path, 'rb') as f:
+                    stream = io.BytesIO(f.read())
+                self._remove_temp_file(temp_docx_path)
                 self._log("文件格式转换完成。")
-
-                # 验证文件是否创建成功
-                if os.path.exists(temp_docx_path):
-                    self._log(f"  > 验证文件存在: {temp_docx_path}")
-                else:
-                    self._log(f"  > 警告：文件创建后不存在: {temp_docx_path}")
-
-                return temp_docx_path, is_from_txt
+                return stream
 
             raise FileProcessingError(f"不支持的文件格式: {file_ext}")
         except Exception as e:
             error_msg = global_exception_handler.handle_exception(e, "文件转换")
-            self._log(f"文件转换过程中发生错误: {error_msg}")
+            self._log("文件转换过程中发生错误: %s", error_msg, level=logging.ERROR)
             raise
 
-    def _preprocess_com_tasks(self, docx_path):
-        self._log("正在对副本执行预处理（接受所有修订、转换自动编号）...")
-        app = self._get_wps_app()
-        try:
-            doc_com = app.Documents.Open(os.path.abspath(docx_path))
-
-            doc_com.TrackRevisions = False
-            self._log("  > 已关闭修订追踪。")
-
-            if doc_com.Revisions.Count > 0:
-                doc_com.AcceptAllRevisions()
-                self._log("  > 已接受文档副本中的所有修订。")
-
-            doc_com.Content.ListFormat.ConvertNumbersToText()
-            self._log("  > 已将副本中的自动编号转换为文本。")
-
-            if doc_com.Revisions.Count > 0:
-                doc_com.AcceptAllRevisions()
-                self._log("  > 已接受编号转换产生的修订。")
-
-            doc_com.TrackRevisions = False
-
-            # 确保文档被正确保存
-            doc_com.Save()
-            doc_com.Close()
-            self._log("预处理完成。")
-
-            # 添加延迟以确保文件操作完成
-            import time
-            time.sleep(0.5)
-
-            # 验证文件是否存在
-            if os.path.exists(docx_path):
-                self._log(f"  > 验证预处理后文件存在: {docx_path}")
-            else:
-                self._log(f"  > 警告：预处理后文件不存在: {docx_path}")
-        except Exception as e:
-            self._log(f"警告：执行预处理任务时出错: {e}")
+    @staticmethod
+    def needs_preprocessing(doc):
+        """
+        检查文档是否含有需要借助WPS/Word预处理的内容：修订标记或自动编号
+
+        Args:
+            doc (Document): 已在内存中打开的文档
+
+        Returns:
+            bool: 正文、页眉、页脚、脚注等任一部件中有修订，或正文/样式中有自动编号时返回True
+        """
+        if any(FileProcessor.has_revisions(element) for element in OoxmlPreprocessor.revision_part_elements(doc)):
+            return True
+        return FileProcessor.has_numbering(doc.element.body, FileProcessor.numbered_style_ids(doc.styles.element))
+
+    @staticmethod
+    def has_revisions(element):
+        """元素（部件根元素、正文或一个顶层块）中是否含有修订标记"""
+        return next(element.iter(*_REVISION_TAGS), None) is not None
+
+    @staticmethod
+    def has_numbering(element, numbered_styles):
+        """
+        元素中的段落是否带有自动编号：直接设置的编号，或所用样式中关联的编号
+
+        Args:
+            element: 正文或一个顶层块
+            numbered_styles (set): numbered_style_ids() 的结果
+        """
+        if next(element.iter(_NUM_PR), None) is not None:
+            return True
+        return any(pStyle.get(qn('w:val')) in numbered_styles for pStyle in element.iter(qn('w:pStyle')))
+
+    @staticmethod
+    def numbered_style_ids(styles_element):
+        """关联了自动编号的样式ID（含通过 basedOn 继承编号的样式），如标题样式链接的多级列表"""
+        numbered_styles = set()
+        based_on = {}
+        for style in styles_element.iterchildren(qn('w:style')):
+            style_id = style.get(qn('w:styleId'))
+            if style.find(f"{qn('w:pPr')}/{_NUM_PR}") is not None:
+                numbered_styles.add(style_id)
+            parent = style.find(qn('w:basedOn'))
+            if parent is not None:
+                based_on[style_id] = parent.get(qn('w:val'))
+        resolved = set()
+        for style_id in set(based_on) | numbered_styles:
+            current, visited = style_id, set()
+            while current is not None and current not in visited:
+                if current in numbered_styles:
+                    resolved.add(style_id)
+                    break
+                visited.add(current)
+                current = based_on.get(current)
+        return resolved
+
+    @staticmethod
+    def disable_track_revisions(doc):
+        """关闭文档的修订追踪设置（不需要预处理时在内存中直接完成）"""
+        settings = doc.settings.element
+        for element in settings.findall(qn('w:trackRevisions')):
+            settings.remove(element)
+
+    def preprocess_stream(self, stream, input_name="document"):
+        """
+        对内存中的文档执行WPS/Word预处理（接受所有修订、转换自动编号）
+
+        COM接口只能打开磁盘文件，因此仅在需要预处理时写出临时文件，处理完成后读回内存并删除。
+
+        Args:
+            stream (io.BytesIO): .docx 文件内容
+            input_name (str): 原始文件名，用于生成临时文件名
+
+        Returns:
+            io.BytesIO: 预处理后的 .docx 文件内容
+        """
+        temp_docx_path = self._temp_docx_path(input_name, "~temp_preprocess_")
+        self.temp_files.append(temp_docx_path)
+        with open(temp_docx_path, 'wb') as f:
+            f.write(stream.getvalue())
+        self._get_converter_pool().preprocess(temp_docx_path)
+        with open(temp_docx_path, 'rb') as f:
+            processed = io.BytesIO(f.read())
+        self._remove_temp_file(temp_docx_path)
+        return processed
@@ -0,0 +1,218 @@
+import hashlib
+import os
+import shutil
+import sqlite3
+import threading
+import time
+
+from .formatting_plan import config_fingerprint
+from .hashing import file_sha256
+
+# 排版逻辑改变（同样的输入和配置会得到不同结果）时递增，使旧的缓存结果全部失效
+FORMAT_CACHE_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS input_hashes (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS outputs (
+    cache_key TEXT PRIMARY KEY,
+    input_sha256 TEXT NOT NULL,
+    config_sha256 TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+"""
+
+
+class FormatCache:
+    """
+    排版结果缓存
+
+    以输入文件内容的 sha256 和排版配置指纹为键，保存上次排版得到的 .docx。
+    再次处理内容和配置都未改变的文件时直接复制缓存结果，不再转换和排版。
+
+    缓存目录结构：
+        index.sqlite3          索引（输入文件哈希、缓存结果元数据）
+        objects/ab/<key>.docx  缓存的排版结果
+
+    输入文件的哈希按 (路径, 大小, 修改时间) 记录，文件未改动时不必重新读取计算。
+    索引只应在一个进程中访问（批量处理时由主进程统一查询和写入）。
+    """
+
+    def __init__(self, cache_dir, max_size_mb=1024, log_callback=None):
+        """
+        初始化缓存
+
+        Args:
+            cache_dir (str): 缓存目录，不存在时自动创建
+            max_size_mb (float): 缓存结果的总大小上限（MB），prune() 时按最近使用时间淘汰，0 表示不限制
+            log_callback (callable): 日志回调函数
+        """
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_size_mb = max_size_mb
+        self.log_callback = log_callback
+        self._objects_dir = os.path.join(self.cache_dir, 'objects')
+        os.makedirs(self._objects_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(self.cache_dir, 'index.sqlite3'), check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+        self._db.commit()
+
+    def _log(self, message, *args):
+        if args:
+            message = message % args
+        if self.log_callback:
+            self.log_callback(message)
+
+    def _object_path(self, cache_key):
+        return os.path.join(self._objects_dir, cache_key[:2], f"{cache_key}.docx")
+
+    def input_sha256(self, input_path):
+        """
+        输入文件内容的 sha256，文件大小和修改时间未变时直接使用记录的哈希
+
+        Args:
+            input_path (str): 输入文件路径
+
+        Returns:
+            str: 十六进制哈希
+        """
+        path = os.path.abspath(input_path)
+        st = os.stat(path)
+        with self._lock:
+            row = self._db.execute("SELECT size, mtime_ns, sha256 FROM input_hashes WHERE path = ?",
+                                   (path,)).fetchone()
+        if row is not None and row[0] == st.st_size and row[1] == st.st_mtime_ns:
+            return row[2]
+        sha256 = file_sha256(path)
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO input_hashes (path, size, mtime_ns, sha256) VALUES (?, ?, ?, ?)",
+                             (path, st.st_size, st.st_mtime_ns, sha256))
+            self._db.commit()
+        return sha256
+
+    def cache_key(self, input_path, config):
+        """输入文件和排版配置对应的缓存键"""
+        payload = f"{FORMAT_CACHE_VERSION}:{self.input_sha256(input_path)}:{config_fingerprint(config)}"
+        return hashlib.sha256(payload.encode('ascii')).hexdigest()
+
+    def lookup(self, input_path, config):
+        """
+        查找缓存结果
+
+        Args:
+            input_path (str): 输入文件路径
+            config (dict): 排版配置
+
+        Returns:
+            tuple: (缓存键, 缓存的 .docx 路径)，未命中时路径为None
+        """
+        cache_key = self.cache_key(input_path, config)
+        with self._lock:
+            row = self._db.execute("SELECT 1 FROM outputs WHERE cache_key = ?", (cache_key,)).fetchone()
+        object_path = self._object_path(cache_key)
+        if row is None or not os.path.exists(object_path):
+            return cache_key, None
+        with self._lock:
+            self._db.execute("UPDATE outputs SET last_used = ? WHERE cache_key = ?", (time.time(), cache_key))
+            self._db.commit()
+        return cache_key, object_path
+
+    def restore(self, input_path, config, output_path):
+        """
+        命中缓存时将缓存结果复制到输出路径；读取缓存出错时只输出警告，按未命中处理
+
+        Returns:
+            tuple: (是否命中, 缓存键)，出错时缓存键为None
+        """
+        try:
+            cache_key, object_path = self.lookup(input_path, config)
+            if object_path is None:
+                return False, cache_key
+            shutil.copyfile(object_path, output_path)
+            return True, cache_key
+        except (OSError, sqlite3.Error) as e:
+            self._log("  > 警告：读取排版缓存失败，将重新排版: %s", e)
+            return False, None
+
+    def store(self, cache_key, input_path, config, output_path):
+        """
+        保存排版结果，写入缓存出错时只输出警告
+
+        Args:
+            cache_key (str): lookup()/restore() 返回的缓存键，为None时不保存
+            input_path (str): 输入文件路径
+            config (dict): 排版配置
+            output_path (str): 排版结果文件路径
+        """
+        if cache_key is None:
+            return
+        try:
+            self._store(cache_key, input_path, config, output_path)
+        except (OSError, sqlite3.Error) as e:
+            self._log("  > 警告：写入排版缓存失败: %s", e)
+
+    def _store(self, cache_key, input_path, config, output_path):
+        object_path = self._object_path(cache_key)
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        # 先复制到临时文件再改名，避免中断时留下不完整的缓存结果
+        temp_path = f"{object_path}.{os.getpid()}.tmp"
+        shutil.copyfile(output_path, temp_path)
+        os.replace(temp_path, object_path)
+        input_sha256 = self.input_sha256(input_path)
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO outputs (cache_key, input_sha256, config_sha256, size, created, last_used)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (cache_key, input_sha256, config_fingerprint(config), os.path.getsize(object_path), now, now))
+            self._db.commit()
+
+    def prune(self):
+        """
+        缓存结果总大小超过上限时，按最近使用时间从旧到新删除
+
+        Returns:
+            int: 删除的缓存结果数
+        """
+        if not self.max_size_mb:
+            return 0
+        limit = self.max_size_mb * 1024 * 1024
+        try:
+            with self._lock:
+                rows = self._db.execute("SELECT cache_key, size FROM outputs ORDER BY last_used DESC").fetchall()
+            total, expired = 0, []
+            for cache_key, size in rows:
+                total += size
+                if total > limit:
+                    expired.append(cache_key)
+            for cache_key in expired:
+                try:
+                    os.remove(self._object_path(cache_key))
+                except FileNotFoundError:
+                    pass
+            if expired:
+                with self._lock:
+                    self._db.executemany("DELETE FROM outputs WHERE cache_key = ?", [(key,) for key in expired])
+                    self._db.commit()
+        except (OSError, sqlite3.Error) as e:
+            self._log("  > 警告：清理排版缓存失败: %s", e)
+            return 0
+        if expired:
+            self._log("排版缓存超过 %sMB，已删除 %d 个最久未使用的结果。", self.max_size_mb, len(expired))
+        return len(expired)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,144 @@
+import hashlib
+import json
+from collections import namedtuple
+
+# 影响排版结果的配置项，配置指纹只由这些配置项生成：FormattingPlan.from_config 读取的各项，
+# 以及决定预处理方式的 preprocess_engine。from_config 读取新的配置项时需同时加入此处
+FORMAT_KEYS = (
+    'body_font', 'body_size', 'body_use_times_roman', 'table_use_times_roman',
+    'h1_font', 'h1_size', 'h1_bold', 'h1_space_before', 'h1_space_after',
+    'h2_font', 'h2_size', 'h2_bold', 'h2_space_before', 'h2_space_after',
+    'h3_font', 'h3_size', 'h3_bold', 'h3_space_before', 'h3_space_after',
+    'table_caption_font', 'table_caption_size', 'table_caption_bold', 'table_caption_outline_level',
+    'figure_caption_font', 'figure_caption_size', 'figure_caption_bold', 'figure_caption_outline_level',
+    'line_spacing', 'set_outline', 'style_mode', 'page_number_font', 'page_number_size',
+    'margin_top', 'margin_bottom', 'margin_left', 'margin_right', 'preprocess_engine',
+)
+
+# 排版引擎：常规方式、流式方式、按文档大小自动选择（见 streaming_engine）
+FORMAT_ENGINES = ('dom', 'streaming', 'auto')
+
+# 样式角色（见 style_manager.STYLE_ROLES）的字体格式
+RoleFont = namedtuple('RoleFont', ['font_name', 'size_pt', 'is_bold', 'use_times_roman'])
+
+# 页边距（Length，EMU）
+Margins = namedtuple('Margins', ['top', 'bottom', 'left', 'right'])
+
+_PLAN_FIELDS = [
+    'fingerprint',
+    # 各样式角色的字体格式
+    'body', 'h1', 'h2', 'h3', 'table_caption', 'figure_caption',
+    # 表格内容：正文字体，西文是否使用Times New Roman
+    'table_font_name', 'table_use_times_roman',
+    # 一至三级标题的 (段前, 段后) 间距，Length
+    'heading_spacing',
+    # 行距，Length
+    'line_spacing',
+    # 图表标题的大纲级别（1-9），None 表示不设置
+    'table_caption_outline_level', 'figure_caption_outline_level',
+    'set_outline', 'style_mode',
+    # 页码字体、字号（磅）和页边距
+    'page_number_font', 'page_number_size', 'margins',
+]
+
+
+def config_fingerprint(config):
+    """
+    排版配置的指纹：取出影响排版结果的配置项（FORMAT_KEYS）按键排序序列化，再计算 sha256
+
+    日志、更新、转换池等其他配置项不参与指纹，修改它们不会使排版计划和排版缓存失效。
+
+    Args:
+        config (dict): 排版配置
+
+    Returns:
+        str: 十六进制指纹
+    """
+    normalized = {key: config[key] for key in FORMAT_KEYS if key in config}
+    payload = json.dumps(normalized, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _emu(length):
+    """
+    转换为 Length 基类：Pt/Cm 等子类的构造参数是磅/厘米而不是EMU，pickle 后会被当作磅/厘米重新换算，
+    Length 的构造参数就是EMU，可以原样 pickle
+    """
+    # 与 from_config 相同，python-docx 在首次使用时才导入
+    from docx.shared import Length
+    return Length(length)
+
+
+def _parse_outline_level(value):
+    """解析图表标题大纲级别配置：'无'、空值或无效值返回None"""
+    if value == '无' or value == '':
+        return None
+    try:
+        level = int(value)
+    except (ValueError, TypeError):
+        return None
+    return level if 1 <= level <= 9 else None
+
+
+class FormattingPlan(namedtuple('FormattingPlan', _PLAN_FIELDS)):
+    """
+    排版计划：由排版配置一次性生成的不可变格式参数
+
+    字号、间距、页边距等在生成时即换算为 python-docx 的 Length（EMU），字体按样式角色组合为 RoleFont，
+    大纲级别解析为整数，逐段格式化时不再反复查找配置、转换数值。
+    计划可哈希、可pickle，可直接传给批量处理的工作进程，fingerprint 可作为缓存键。
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        由排版配置生成排版计划
+
+        Args:
+            config (dict): 排版配置（通常为 ConfigManager 验证后的配置）
+
+        Returns:
+            FormattingPlan: 排版计划
+        """
+        # python-docx 导入较慢，首次生成排版计划时才导入，程序启动时导入配置管理器不受影响
+        from docx.shared import Cm, Pt
+
+        def role(prefix, default_bold=False):
+            return RoleFont(config[f'{prefix}_font'], config[f'{prefix}_size'],
+                            bool(config.get(f'{prefix}_bold', default_bold)), False)
+
+        return cls(
+            fingerprint=config_fingerprint(config),
+            body=RoleFont(config['body_font'], config['body_size'], False,
+                          bool(config.get('body_use_times_roman', True))),
+            # 二级标题默认加粗，一级、三级标题默认不加粗
+            h1=role('h1'), h2=role('h2', default_bold=True), h3=role('h3'),
+            table_caption=role('table_caption'), figure_caption=role('figure_caption'),
+            table_font_name=config['body_font'],
+            table_use_times_roman=bool(config.get('table_use_times_roman', True)),
+            heading_spacing=tuple((_emu(Pt(float(config[f'h{level}_space_before']))),
+                                   _emu(Pt(float(config[f'h{level}_space_after'])))) for level in (1, 2, 3)),
+            line_spacing=_emu(Pt(config['line_spacing'])),
+            table_caption_outline_level=_parse_outline_level(config.get('table_caption_outline_level', '无')),
+            figure_caption_outline_level=_parse_outline_level(config.get('figure_caption_outline_level', '无')),
+            set_outline=bool(config['set_outline']),
+            style_mode=bool(config.get('style_mode', False)),
+            page_number_font=config['page_number_font'],
+            page_number_size=config['page_number_size'],
+            margins=Margins(_emu(Cm(config['margin_top'])), _emu(Cm(config['margin_bottom'])),
+                            _emu(Cm(config['margin_left'])), _emu(Cm(config['margin_right']))),
+        )
+
+    def role(self, role):
+        """
+        样式角色对应的字体格式，直接格式化和样式模式共用同一套规则
+
+        Args:
+            role (str): 样式角色，见 style_manager.STYLE_ROLES
+
+        Returns:
+            RoleFont: (字体, 字号, 是否加粗, 西文是否使用Times New Roman)
+        """
+        return getattr(self, role)
@@ -0,0 +1,13 @@
+import hashlib
+
+# 计算文件摘要时每次读取的字节数
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(path):
+    """按块读取文件并计算SHA-256摘要（十六进制小写）"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -181,6 +181,53 @@ class LogCollector:
                 f.write(f"[{log['timestamp']}] {log['level']}: {log['message']}\n")
 
 
+# 排版日志详细程度（配置项 log_level）：
+# debug 输出逐段分类和格式化详情，info 只输出文档级步骤和分类汇总，warning 只输出警告和错误
+LOG_LEVEL_NAMES = {
+    'debug': logging.DEBUG,
+    'info': logging.INFO,
+    'warning': logging.WARNING,
+}
+
+
+def resolve_log_level(name):
+    """
+    将配置中的日志级别名称转换为 logging 级别
+
+    Args:
+        name (str): 'debug'、'info' 或 'warning'，无效值按 'info' 处理
+
+    Returns:
+        int: logging 级别
+    """
+    return LOG_LEVEL_NAMES.get(str(name).lower(), logging.INFO)
+
+
+def emit_log(log_callback, log_level, message, args=(), level=logging.INFO):
+    """
+    按配置的日志级别输出排版日志：低于配置级别的日志直接丢弃，有 args 时才按 % 格式化消息
+
+    逐段日志为 DEBUG 级别，默认 INFO 级别下在格式化之前就被丢弃，不再逐段拼接日志文本。
+
+    Args:
+        log_callback (callable): 日志回调函数，为None时只返回消息
+        log_level (int): 配置的日志级别（见 resolve_log_level）
+        message (str): 日志消息，有 args 时为 % 格式串
+        args (tuple): 格式化参数
+        level (int): 本条日志的级别
+
+    Returns:
+        str: 格式化后的消息；低于配置级别被丢弃时返回None
+    """
+    if level < log_level:
+        return None
+    if args:
+        message = message % args
+    if log_callback:
+        log_callback(message)
+    return message
+
+
 # 全局日志记录器实例
 global_logger = Logger("WordFormatter")
 
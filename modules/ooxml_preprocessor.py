@@ -0,0 +1,553 @@
+import logging
+from copy import deepcopy
+
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+
+from .logger import emit_log, resolve_log_level
+
+_W_P = qn('w:p')
+_W_VAL = qn('w:val')
+_W_PPR = qn('w:pPr')
+_W_RPR = qn('w:rPr')
+_W_NUMPR = qn('w:numPr')
+_W_NUMID = qn('w:numId')
+_W_ILVL = qn('w:ilvl')
+_W_PSTYLE = qn('w:pStyle')
+_W_IND = qn('w:ind')
+_XML_SPACE = qn('xml:space')
+
+# 接受修订：插入内容保留（去掉包装元素），删除内容移除
+_UNWRAP_TAGS = tuple(qn(f'w:{name}') for name in ('ins', 'moveTo'))
+_REMOVE_TAGS = tuple(qn(f'w:{name}') for name in (
+    'del', 'moveFrom', 'moveFromRangeStart', 'moveFromRangeEnd', 'moveToRangeStart', 'moveToRangeEnd',
+))
+# 属性修订：保留当前属性，移除修订前的属性记录
+_PROPERTY_CHANGE_TAGS = tuple(qn(f'w:{name}') for name in (
+    'rPrChange', 'pPrChange', 'sectPrChange', 'tblPrChange', 'trPrChange', 'tcPrChange', 'tblGridChange',
+    'numberingChange', 'cellIns', 'cellMerge',
+))
+_PARA_MARK_INS = f"{_W_PPR}/{_W_RPR}/{qn('w:ins')}"
+_PARA_MARK_DEL = f"{_W_PPR}/{_W_RPR}/{qn('w:del')}"
+_ROW_INS = f"{qn('w:trPr')}/{qn('w:ins')}"
+_ROW_DEL = f"{qn('w:trPr')}/{qn('w:del')}"
+_CELL_DEL = f"{qn('w:tcPr')}/{qn('w:cellDel')}"
+
+# 含有修订标记、需要接受修订的部件
+_REVISION_PART_SUFFIXES = ('.main+xml', '.header+xml', '.footer+xml', '.footnotes+xml', '.endnotes+xml',
+                           '.styles+xml', '.numbering+xml')
+
+_CHINESE_DIGITS = "〇一二三四五六七八九"
+_CHINESE_LEGAL_DIGITS = "零壹贰叁肆伍陆柒捌玖"
+_IDEOGRAPH_TRADITIONAL = "甲乙丙丁戊己庚辛壬癸"
+_IDEOGRAPH_ZODIAC = "子丑寅卯辰巳午未申酉戌亥"
+_ROMAN_NUMERALS = ((1000, 'M'), (900, 'CM'), (500, 'D'), (400, 'CD'), (100, 'C'), (90, 'XC'),
+                   (50, 'L'), (40, 'XL'), (10, 'X'), (9, 'IX'), (5, 'V'), (4, 'IV'), (1, 'I'))
+
+
+def _int_val(element, default=None):
+    if element is None:
+        return default
+    try:
+        return int(element.get(_W_VAL))
+    except (TypeError, ValueError):
+        return default
+
+
+def _to_roman(number):
+    if number <= 0:
+        return str(number)
+    result = []
+    for value, symbol in _ROMAN_NUMERALS:
+        count, number = divmod(number, value)
+        result.append(symbol * count)
+    return ''.join(result)
+
+
+def _to_letter(number):
+    # Word的字母编号：A..Z, AA..ZZ, AAA..
+    if number <= 0:
+        return str(number)
+    letter = chr(ord('A') + (number - 1) % 26)
+    return letter * ((number - 1) // 26 + 1)
+
+
+def _to_chinese_counting(number, digits=_CHINESE_DIGITS, units="十百千万"):
+    """中文计数：1 -> 一，10 -> 十，21 -> 二十一，105 -> 一百零五"""
+    if number <= 0:
+        return digits[0] if number == 0 else str(number)
+    if number >= 100000:
+        return str(number)
+    parts = []
+    text = str(number)
+    length = len(text)
+    zero_pending = False
+    for i, char in enumerate(text):
+        digit = int(char)
+        position = length - 1 - i
+        if digit == 0:
+            zero_pending = bool(parts)
+            continue
+        if zero_pending:
+            parts.append(digits[0])
+            zero_pending = False
+        # 10-19 读作"十、十一"而不是"一十、一十一"
+        if not (digit == 1 and position == 1 and length == 2 and digits is _CHINESE_DIGITS):
+            parts.append(digits[digit])
+        if position:
+            parts.append(units[position - 1])
+    return ''.join(parts)
+
+
+def format_number(number, num_fmt):
+    """
+    按 numbering.xml 中的编号格式（w:numFmt）格式化编号数值
+
+    Args:
+        number (int): 编号数值
+        num_fmt (str): 编号格式，如 decimal、upperRoman、chineseCounting
+
+    Returns:
+        str: 编号文本，不支持的格式按阿拉伯数字输出
+    """
+    if num_fmt in ('none', 'bullet'):
+        return ''
+    if num_fmt == 'decimalZero':
+        return f"{number:02d}"
+    if num_fmt == 'upperRoman':
+        return _to_roman(number)
+    if num_fmt == 'lowerRoman':
+        return _to_roman(number).lower()
+    if num_fmt == 'upperLetter':
+        return _to_letter(number)
+    if num_fmt == 'lowerLetter':
+        return _to_letter(number).lower()
+    if num_fmt in ('chineseCounting', 'chineseCountingThousand', 'japaneseCounting', 'taiwaneseCounting',
+                   'ideographLegalTraditional'):
+        return _to_chinese_counting(number)
+    if num_fmt == 'chineseLegalSimplified':
+        return _to_chinese_counting(number, _CHINESE_LEGAL_DIGITS, "拾佰仟万")
+    if num_fmt in ('ideographDigital', 'taiwaneseDigital', 'japaneseDigitalTenThousand'):
+        return ''.join(_CHINESE_DIGITS[int(char)] for char in str(number))
+    if num_fmt == 'ideographTraditional' and 1 <= number <= len(_IDEOGRAPH_TRADITIONAL):
+        return _IDEOGRAPH_TRADITIONAL[number - 1]
+    if num_fmt == 'ideographZodiac' and 1 <= number <= len(_IDEOGRAPH_ZODIAC):
+        return _IDEOGRAPH_ZODIAC[number - 1]
+    if num_fmt in ('decimalEnclosedCircle', 'decimalEnclosedCircleChinese') and 1 <= number <= 20:
+        return chr(0x2460 + number - 1)
+    if num_fmt == 'decimalEnclosedParen' and 1 <= number <= 20:
+        return chr(0x2474 + number - 1)
+    if num_fmt == 'decimalEnclosedFullstop' and 1 <= number <= 20:
+        return chr(0x2488 + number - 1)
+    if num_fmt == 'decimalFullWidth':
+        return ''.join(chr(ord(char) + 0xFEE0) for char in str(number))
+    if num_fmt == 'ordinal':
+        suffix = 'th' if 10 <= number % 100 <= 20 else {1: 'st', 2: 'nd', 3: 'rd'}.get(number % 10, 'th')
+        return f"{number}{suffix}"
+    return str(number)
+
+
+class _Level:
+    """numbering.xml 中一个列表级别（w:lvl）的定义"""
+
+    def __init__(self, lvl):
+        self.element = lvl
+        self.start = _int_val(lvl.find(qn('w:start')), 1)
+        num_fmt = lvl.find(qn('w:numFmt'))
+        self.num_fmt = num_fmt.get(_W_VAL) if num_fmt is not None else 'decimal'
+        lvl_text = lvl.find(qn('w:lvlText'))
+        self.lvl_text = lvl_text.get(_W_VAL, '') if lvl_text is not None else ''
+        self.restart = _int_val(lvl.find(qn('w:lvlRestart')))
+        is_lgl = lvl.find(qn('w:isLgl'))
+        self.is_legal = is_lgl is not None and is_lgl.get(_W_VAL, 'true') not in ('0', 'false', 'off')
+        suff = lvl.find(qn('w:suff'))
+        self.suffix = suff.get(_W_VAL) if suff is not None else 'tab'
+        self.rPr = lvl.find(_W_RPR)
+        self.ind = lvl.find(f"{_W_PPR}/{_W_IND}")
+
+
+class _NumberingDefinitions:
+    """解析 numbering.xml：编号实例（w:num）到抽象编号（w:abstractNum）各级别定义的映射"""
+
+    def __init__(self, numbering_element, styles_element):
+        self.abstract_levels = {}
+        self.num_abstract = {}
+        self.start_overrides = {}
+        self.level_overrides = {}
+        if numbering_element is None:
+            return
+
+        style_links = {}
+        abstract_style_links = {}
+        for abstract in numbering_element.iterchildren(qn('w:abstractNum')):
+            abstract_id = abstract.get(qn('w:abstractNumId'))
+            self.abstract_levels[abstract_id] = {
+                int(lvl.get(qn('w:ilvl'), 0)): _Level(lvl) for lvl in abstract.iterchildren(qn('w:lvl'))
+            }
+            style_link = abstract.find(qn('w:styleLink'))
+            if style_link is not None:
+                style_links[style_link.get(_W_VAL)] = abstract_id
+            num_style_link = abstract.find(qn('w:numStyleLink'))
+            if num_style_link is not None:
+                abstract_style_links[abstract_id] = num_style_link.get(_W_VAL)
+
+        for num in numbering_element.iterchildren(qn('w:num')):
+            num_id = num.get(qn('w:numId'))
+            self.num_abstract[num_id] = _int_val(num.find(qn('w:abstractNumId')))
+            for override in num.iterchildren(qn('w:lvlOverride')):
+                ilvl = int(override.get(qn('w:ilvl'), 0))
+                start = _int_val(override.find(qn('w:startOverride')))
+                if start is not None:
+                    self.start_overrides[(num_id, ilvl)] = start
+                lvl = override.find(qn('w:lvl'))
+                if lvl is not None:
+                    self.level_overrides[(num_id, ilvl)] = _Level(lvl)
+        self.num_abstract = {num_id: str(abstract_id) for num_id, abstract_id in self.num_abstract.items()
+                             if abstract_id is not None}
+
+        # numStyleLink：抽象编号的级别定义来自编号样式所链接的另一个抽象编号
+        for abstract_id, style_id in abstract_style_links.items():
+            linked = style_links.get(style_id)
+            if linked is None and styles_element is not None:
+                linked = self._abstract_of_numbering_style(styles_element, style_id)
+            if linked is not None and linked != abstract_id:
+                self.abstract_levels[abstract_id] = self.abstract_levels.get(linked, {})
+
+    def _abstract_of_numbering_style(self, styles_element, style_id):
+        for style in styles_element.iterchildren(qn('w:style')):
+            if style.get(qn('w:styleId')) == style_id:
+                num_id = style.find(f"{_W_PPR}/{_W_NUMPR}/{_W_NUMID}")
+                if num_id is not None:
+                    return self.num_abstract.get(num_id.get(_W_VAL))
+        return None
+
+    def levels(self, num_id):
+        """返回编号实例对应的 (抽象编号ID, {级别: _Level})，实例不存在时返回 (None, None)"""
+        abstract_id = self.num_abstract.get(num_id)
+        if abstract_id is None:
+            return None, None
+        levels = self.abstract_levels.get(abstract_id, {})
+        overrides = {ilvl: lvl for (override_num, ilvl), lvl in self.level_overrides.items() if override_num == num_id}
+        if overrides:
+            levels = dict(levels, **overrides)
+        return abstract_id, levels
+
+
+class OoxmlPreprocessor:
+    """
+    在内存中直接修改OOXML完成预处理，替代借助WPS/Word的COM预处理：
+    - 接受所有修订：插入内容保留、删除内容移除、属性修订保留当前属性；
+    - 将自动编号（w:numPr，含样式中关联的编号）转换为段落开头的普通文本，
+      与 Word 的 ConvertNumbersToText 一致，编号所带的缩进写入段落。
+
+    不需要启动WPS/Word，可在没有Office的环境中运行。
+    """
+
+    def __init__(self, log_callback=None, log_level='info'):
+        """
+        Args:
+            log_callback (callable): 日志回调函数
+            log_level (str): 日志级别，'debug'、'info' 或 'warning'
+        """
+        self.log_callback = log_callback
+        self.log_level = resolve_log_level(log_level)
+
+    def _log(self, message, *args, level=logging.INFO):
+        """输出日志，级别过滤和格式化见 logger.emit_log"""
+        emit_log(self.log_callback, self.log_level, message, args, level)
+
+    def process(self, doc):
+        """
+        对文档执行预处理（接受所有修订、转换自动编号）
+
+        Args:
+            doc (Document): 已在内存中打开的文档
+        """
+        self._log("正在执行预处理（接受所有修订、转换自动编号）...")
+        revision_count = 0
+        for element in self.revision_part_elements(doc):
+            revision_count += self.accept_revisions(element)
+        if revision_count:
+            self._log(f"  > 已接受文档中的 {revision_count} 处修订。")
+
+        numbered_count = self.convert_numbers_to_text(doc)
+        if numbered_count:
+            self._log(f"  > 已将 {numbered_count} 个自动编号转换为文本。")
+        self._log("预处理完成。")
+
+    @staticmethod
+    def revision_part_elements(doc):
+        """文档中需要接受修订的各部件（正文、页眉、页脚、脚注、尾注、样式、编号）的根元素"""
+        for part in doc.part.package.iter_parts():
+            if OoxmlPreprocessor.is_revision_part(part.content_type) and hasattr(part, 'element'):
+                yield part.element
+
+    @staticmethod
+    def is_revision_part(content_type):
+        """该内容类型的部件（正文、页眉、页脚、脚注、尾注、样式、编号）是否需要接受修订"""
+        return content_type.endswith(_REVISION_PART_SUFFIXES)
+
+    @staticmethod
+    def accept_revisions(root):
+        """
+        接受元素树中的所有修订
+
+        Args:
+            root: 部件的根元素（如 w:document、w:hdr、w:styles）
+
+        Returns:
+            int: 处理的修订数量
+        """
+        count = 0
+
+        # 删除的表格行、单元格
+        for marker in list(root.iterfind(f".//{_ROW_DEL}")) + list(root.iterfind(f".//{_CELL_DEL}")):
+            owner = marker.getparent().getparent()
+            if owner.getparent() is not None:
+                owner.getparent().remove(owner)
+                count += 1
+
+        count += OoxmlPreprocessor._merge_deleted_paragraph_marks(root)
+
+        for marker in list(root.iterfind(f".//{_PARA_MARK_INS}")) + list(root.iterfind(f".//{_ROW_INS}")):
+            marker.getparent().remove(marker)
+            count += 1
+
+        for element in list(root.iter(*_REMOVE_TAGS)):
+            parent = element.getparent()
+            if parent is not None:
+                parent.remove(element)
+                count += 1
+
+        for element in list(root.iter(*_UNWRAP_TAGS)):
+            parent = element.getparent()
+            if parent is None:
+                continue
+            # 插入内容保留：子元素替换包装元素，保持原有顺序
+            for child in list(element):
+                element.addprevious(child)
+            parent.remove(element)
+            count += 1
+
+        for element in list(root.iter(*_PROPERTY_CHANGE_TAGS)):
+            element.getparent().remove(element)
+            count += 1
+        return count
+
+    @staticmethod
+    def _merge_deleted_paragraph_marks(root):
+        """删除的段落标记：该段落内容并入下一段落开头，段落属性以下一段落为准"""
+        count = 0
+        for p in list(root.iter(_W_P)):
+            marker = p.find(_PARA_MARK_DEL)
+            if marker is None:
+                continue
+            marker.getparent().remove(marker)
+            count += 1
+            next_p = p.getnext()
+            if next_p is None or next_p.tag != _W_P:
+                continue
+            next_pPr = next_p.find(_W_PPR)
+            anchor = next_pPr
+            for child in list(p):
+                if child.tag == _W_PPR:
+                    continue
+                if anchor is None:
+                    next_p.insert(0, child)
+                else:
+                    anchor.addnext(child)
+                anchor = child
+            p.getparent().remove(p)
+        return count
+
+    def convert_numbers_to_text(self, doc):
+        """
+        将正文（含表格）中的自动编号转换为段落开头的文本
+
+        Args:
+            doc (Document): 文档对象
+
+        Returns:
+            int: 转换的编号段落数
+        """
+        try:
+            numbering_element = doc.part.numbering_part.element
+        except (KeyError, NotImplementedError):
+            numbering_element = None
+        converter = NumberingConverter(numbering_element, doc.styles.element)
+        converter.convert(doc.element.body)
+        return converter.count
+
+    @staticmethod
+    def _style_numbering(styles_element):
+        """样式ID -> (编号实例ID, 级别)，沿 basedOn 继承"""
+        direct = {}
+        based_on = {}
+        for style in styles_element.iterchildren(qn('w:style')):
+            style_id = style.get(qn('w:styleId'))
+            numPr = style.find(f"{_W_PPR}/{_W_NUMPR}")
+            if numPr is not None:
+                num_id = numPr.find(_W_NUMID)
+                direct[style_id] = (num_id.get(_W_VAL) if num_id is not None else None,
+                                    _int_val(numPr.find(_W_ILVL)))
+            parent = style.find(qn('w:basedOn'))
+            if parent is not None:
+                based_on[style_id] = parent.get(_W_VAL)
+
+        resolved = {}
+        for style_id in set(direct) | set(based_on):
+            current, visited = style_id, set()
+            while current is not None and current not in visited:
+                if current in direct:
+                    resolved[style_id] = direct[current]
+                    break
+                visited.add(current)
+                current = based_on.get(current)
+        return resolved
+
+    @staticmethod
+    def _paragraph_numbering(p, style_numbering):
+        """段落的有效编号 (编号实例ID, 级别)：段落直接设置优先，其次为段落样式中的设置"""
+        pPr = p.find(_W_PPR)
+        if pPr is None:
+            return None
+        style_num_id, style_ilvl = None, None
+        pStyle = pPr.find(_W_PSTYLE)
+        if pStyle is not None:
+            style_num_id, style_ilvl = style_numbering.get(pStyle.get(_W_VAL), (None, None))
+        numPr = pPr.find(_W_NUMPR)
+        num_id, ilvl = style_num_id, style_ilvl
+        if numPr is not None:
+            num_id_element = numPr.find(_W_NUMID)
+            if num_id_element is not None:
+                num_id = num_id_element.get(_W_VAL)
+            ilvl = _int_val(numPr.find(_W_ILVL), ilvl)
+        if num_id is None:
+            return None
+        return num_id, ilvl or 0
+
+    @staticmethod
+    def _number_text(level, levels, level_counters):
+        """按 w:lvlText 生成编号文本，%1..%9 替换为对应级别的当前编号"""
+        if level.num_fmt == 'bullet':
+            return level.lvl_text
+        text = level.lvl_text
+        for index in range(9, 0, -1):
+            placeholder = f"%{index}"
+            if placeholder not in text:
+                continue
+            referenced = levels.get(index - 1)
+            start = referenced.start if referenced is not None else 1
+            value = level_counters.get(index - 1, start)
+            num_fmt = referenced.num_fmt if referenced is not None else 'decimal'
+            if level.is_legal:
+                num_fmt = 'decimal'
+            text = text.replace(placeholder, format_number(value, num_fmt))
+        return text
+
+    @staticmethod
+    def _insert_number_run(p, text, level):
+        """在段落开头插入编号文本run，编号后缀为制表符、空格或无"""
+        if not text and level.suffix == 'nothing':
+            return
+        r = OxmlElement('w:r')
+        if level.rPr is not None:
+            r.append(deepcopy(level.rPr))
+        if text:
+            t = OxmlElement('w:t')
+            t.text = text if level.suffix != 'space' else text + ' '
+            t.set(_XML_SPACE, 'preserve')
+            r.append(t)
+        elif level.suffix == 'space':
+            t = OxmlElement('w:t')
+            t.text = ' '
+            t.set(_XML_SPACE, 'preserve')
+            r.append(t)
+        if level.suffix == 'tab':
+            r.append(OxmlElement('w:tab'))
+        pPr = p.find(_W_PPR)
+        if pPr is None:
+            p.insert(0, r)
+        else:
+            pPr.addnext(r)
+
+    @staticmethod
+    def _remove_numbering(p, style_numbering, level=None):
+        """
+        去掉段落的编号：删除直接编号设置，编号来自样式时写入 numId=0 覆盖；
+        编号级别带有的缩进在段落没有直接缩进时写入段落
+        """
+        pPr = p.find(_W_PPR)
+        numPr = pPr.find(_W_NUMPR)
+        if numPr is not None:
+            pPr.remove(numPr)
+        pStyle = pPr.find(_W_PSTYLE)
+        if pStyle is not None and pStyle.get(_W_VAL) in style_numbering:
+            numPr = pPr._add_numPr()
+            numPr._add_numId(val=0)
+        if level is not None and level.ind is not None and pPr.find(_W_IND) is None:
+            pPr._insert_ind(deepcopy(level.ind))
+
+
+class NumberingConverter:
+    """
+    按文档顺序将段落的自动编号转换为文本
+
+    编号计数保存在实例中：可以一次转换整个正文，也可以按顶层块依次调用 convert()（流式排版），结果相同。
+    """
+
+    def __init__(self, numbering_element, styles_element):
+        """
+        Args:
+            numbering_element: numbering.xml 的根元素，文档没有编号定义时为None
+            styles_element: styles.xml 的根元素
+        """
+        self.definitions = _NumberingDefinitions(numbering_element, styles_element)
+        self.style_numbering = OoxmlPreprocessor._style_numbering(styles_element)
+        # 编号计数按抽象编号共享：引用同一抽象编号的多个编号实例连续编号
+        self.counters = {}
+        self.started_nums = set()
+        self.count = 0
+
+    def convert(self, root):
+        """
+        转换元素（正文或一个顶层块）中所有段落的自动编号
+
+        Returns:
+            int: 本次转换的编号段落数
+        """
+        definitions = self.definitions
+        style_numbering = self.style_numbering
+        count = 0
+        for p in list(root.iter(_W_P)):
+            numbering = OoxmlPreprocessor._paragraph_numbering(p, style_numbering)
+            if numbering is None:
+                continue
+            num_id, ilvl = numbering
+            if num_id is None or num_id == '0':
+                continue
+            abstract_id, levels = definitions.levels(num_id)
+            level = levels.get(ilvl) if levels else None
+            if level is None:
+                OoxmlPreprocessor._remove_numbering(p, style_numbering)
+                continue
+
+            level_counters = self.counters.setdefault(abstract_id, {})
+            if num_id not in self.started_nums:
+                self.started_nums.add(num_id)
+                for (override_num, override_ilvl), start in definitions.start_overrides.items():
+                    if override_num == num_id:
+                        level_counters[override_ilvl] = start - 1
+            level_counters[ilvl] = level_counters.get(ilvl, level.start - 1) + 1
+            for deeper in [d for d in level_counters if d > ilvl]:
+                deeper_level = levels.get(deeper)
+                restart = deeper_level.restart if deeper_level is not None else None
+                if restart is None or (restart != 0 and ilvl < restart):
+                    del level_counters[deeper]
+
+            text = OoxmlPreprocessor._number_text(level, levels, level_counters)
+            OoxmlPreprocessor._insert_number_run(p, text, level)
+            OoxmlPreprocessor._remove_numbering(p, style_numbering, level)
+            count += 1
+        self.count += count
+        return count
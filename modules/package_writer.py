@@ -0,0 +1,127 @@
+import time
+import zipfile
+import zlib
+
+from docx.opc.pkgwriter import PackageWriter
+
+# 原样复制时支持的压缩方式（Word 只使用这两种）
+_RAW_COPY_COMPRESS_TYPES = (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED)
+# 本地文件头的固定长度，文件名长度和扩展字段长度分别位于偏移 26、28 处
+_LOCAL_HEADER_SIZE = 30
+_LOCAL_HEADER_SIGNATURE = b'PK\x03\x04'
+
+
+def read_raw_entry(source_zip, info):
+    """
+    读取 zip 条目压缩后的原始数据（不解压）
+
+    Args:
+        source_zip (zipfile.ZipFile): 源文件
+        info (zipfile.ZipInfo): 源文件中的条目
+
+    Returns:
+        bytes: 压缩数据；条目已加密或使用了不支持的压缩方式时返回None
+    """
+    if info.flag_bits & 0x01 or info.compress_type not in _RAW_COPY_COMPRESS_TYPES:
+        return None
+    fp = source_zip.fp
+    fp.seek(info.header_offset)
+    header = fp.read(_LOCAL_HEADER_SIZE)
+    if len(header) != _LOCAL_HEADER_SIZE or header[:4] != _LOCAL_HEADER_SIGNATURE:
+        return None
+    name_length = int.from_bytes(header[26:28], 'little')
+    extra_length = int.from_bytes(header[28:30], 'little')
+    fp.seek(info.header_offset + _LOCAL_HEADER_SIZE + name_length + extra_length)
+    data = fp.read(info.compress_size)
+    return data if len(data) == info.compress_size else None
+
+
+def write_raw_entry(target_zip, info, data, date_time=None):
+    """
+    将压缩数据原样写入 zip 条目，不重新压缩
+
+    zipfile 没有写入已压缩数据的公开接口，这里按 ZipFile.open(mode='w') 的写入流程
+    直接写本地文件头和数据，再登记到中央目录（关闭时写出）。
+
+    Args:
+        target_zip (zipfile.ZipFile): 以 'w' 模式打开的目标文件
+        info (zipfile.ZipInfo): 源条目（提供名称、压缩方式、CRC和大小）
+        data (bytes): read_raw_entry() 读出的压缩数据
+        date_time (tuple): 条目的修改时间，默认为源条目的时间
+    """
+    zinfo = zipfile.ZipInfo(info.filename, date_time=date_time or info.date_time)
+    zinfo.compress_type = info.compress_type
+    zinfo.external_attr = info.external_attr or 0o600 << 16
+    zinfo.CRC = info.CRC
+    zinfo.file_size = info.file_size
+    zinfo.compress_size = len(data)
+    zip64 = zinfo.file_size > zipfile.ZIP64_LIMIT or zinfo.compress_size > zipfile.ZIP64_LIMIT
+    with target_zip._lock:
+        if target_zip._seekable:
+            target_zip.fp.seek(target_zip.start_dir)
+        zinfo.header_offset = target_zip.fp.tell()
+        target_zip._writecheck(zinfo)
+        target_zip._didModify = True
+        target_zip.fp.write(zinfo.FileHeader(zip64))
+        target_zip.fp.write(data)
+        target_zip.start_dir = target_zip.fp.tell()
+        target_zip.filelist.append(zinfo)
+        target_zip.NameToInfo[zinfo.filename] = zinfo
+
+
+class _PassThroughZipWriter:
+    """
+    python-docx PhysPkgWriter 的替代：部件内容与源文件中同名条目相同（大小和CRC一致）时
+    直接复制原压缩数据，其余部件与 python-docx 相同地压缩写入
+    """
+
+    def __init__(self, pkg_file, source_zip):
+        self._zipf = zipfile.ZipFile(pkg_file, 'w', compression=zipfile.ZIP_DEFLATED)
+        self._source = source_zip
+        self.copied = 0
+        self.copied_bytes = 0
+
+    def write(self, pack_uri, blob):
+        name = pack_uri.membername
+        info = self._source.NameToInfo.get(name)
+        if info is not None and info.file_size == len(blob) and info.CRC == zlib.crc32(blob):
+            data = read_raw_entry(self._source, info)
+            if data is not None:
+                # 与 writestr 相同，条目时间为写出时间
+                write_raw_entry(self._zipf, info, data, date_time=time.localtime(time.time())[:6])
+                self.copied += 1
+                self.copied_bytes += info.file_size
+                return
+        self._zipf.writestr(name, blob)
+
+    def close(self):
+        self._zipf.close()
+
+
+def save_document(doc, source, target):
+    """
+    保存 python-docx 文档，未修改的部件（图片、嵌入对象、字体等）直接复制源文件中的压缩数据
+
+    写出的条目、顺序和内容与 doc.save() 相同，只是未修改的部件不再解压后重新压缩。
+
+    Args:
+        doc (Document): 要保存的文档
+        source: 文档的源 .docx（路径或可定位的文件对象，如 BytesIO）
+        target: 输出文件路径或可写的文件对象
+
+    Returns:
+        tuple: (原样复制的部件数, 这些部件解压后的总字节数)
+    """
+    package = doc.part.package
+    parts = list(package.parts)
+    for part in parts:
+        part.before_marshal()
+    with zipfile.ZipFile(source) as source_zip:
+        writer = _PassThroughZipWriter(target, source_zip)
+        try:
+            PackageWriter._write_content_types_stream(writer, parts)
+            PackageWriter._write_pkg_rels(writer, package.rels)
+            PackageWriter._write_parts(writer, parts)
+        finally:
+            writer.close()
+    return writer.copied, writer.copied_bytes
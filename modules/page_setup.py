@@ -1,18 +1,26 @@
+import logging
+
 from docx.shared import Cm
 from docx.oxml import OxmlElement
 from docx.oxml.ns import qn
 from docx.shared import Pt
 from docx.shared import RGBColor
 
+from .logger import emit_log, resolve_log_level
+from .formatting_plan import FormattingPlan
+
 
 class PageSetup:
-    def __init__(self, config, log_callback=None):
+    def __init__(self, config, log_callback=None, plan=None):
         self.config = config
+        # 排版计划：页码字体字号、页边距等预先换算好的参数
+        self.plan = plan if plan is not None else FormattingPlan.from_config(config)
         self.log_callback = log_callback
+        self.log_level = resolve_log_level(config.get('log_level', 'info'))
 
-    def _log(self, message):
-        if self.log_callback:
-            self.log_callback(message)
+    def _log(self, message, *args, level=logging.INFO):
+        """输出日志，级别过滤和格式化见 logger.emit_log"""
+        emit_log(self.log_callback, self.log_level, message, args, level)
 
     def _set_run_font(self, run, font_name, size_pt, set_color=False, is_bold=False):
         """设置单个run的字体属性"""
@@ -50,8 +58,8 @@ class PageSetup:
             rFonts.themeFontCs = None
 
     def _create_page_number(self, paragraph, text):
-        font_name = self.config['page_number_font']
-        font_size = self.config['page_number_size']
+        font_name = self.plan.page_number_font
+        font_size = self.plan.page_number_size
         self._set_run_font(paragraph.add_run('— '), font_name, font_size, set_color=True)
         run_field = paragraph.add_run()
         self._set_run_font(run_field, font_name, font_size, set_color=True)
@@ -73,15 +81,26 @@ class PageSetup:
         should_set_a4 = is_from_txt
 
         for section in doc.sections:
-            section.top_margin = Cm(self.config['margin_top'])
-            section.bottom_margin = Cm(self.config['margin_bottom'])
-            section.left_margin = Cm(self.config['margin_left'])
-            section.right_margin = Cm(self.config['margin_right'])
-
-            # 设置纸张大小为A4 (仅在需要时)
-            if should_set_a4:
-                section.page_width = Cm(21)
-                section.page_height = Cm(29.7)
+            self.apply_section(section, set_a4=should_set_a4)
 
         if should_set_a4:
-            self._log("  > 已将页面大小设置为 A4。")
\ No newline at end of file
+            self._log("  > 已将页面大小设置为 A4。")
+
+    def apply_section(self, section, set_a4=False):
+        """
+        设置单个节的页边距（流式排版时逐个节调用）
+
+        Args:
+            section (Section): 节
+            set_a4 (bool): 是否将纸张大小设置为A4
+        """
+        margins = self.plan.margins
+        section.top_margin = margins.top
+        section.bottom_margin = margins.bottom
+        section.left_margin = margins.left
+        section.right_margin = margins.right
+
+        # 设置纸张大小为A4 (仅在需要时)
+        if set_a4:
+            section.page_width = Cm(21)
+            section.page_height = Cm(29.7)
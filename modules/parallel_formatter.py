@@ -0,0 +1,143 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from copy import deepcopy
+
+from docx.oxml import parse_xml
+from docx.oxml.ns import qn
+from docx.table import Table
+from docx.text.paragraph import Paragraph
+from lxml import etree
+
+from .block_classifier import BlockKind
+from .processing_stats import ProcessingStats
+
+_W_BODY = qn('w:body')
+
+# 每个工作进程的 WordProcessor 实例及其日志缓冲，由 _init_chunk_worker() 创建
+_chunk_processor = None
+_chunk_logs = []
+
+
+def _init_chunk_worker(config, plan):
+    """工作进程初始化：创建只用于格式化的 WordProcessor，日志写入缓冲后随结果返回主进程"""
+    global _chunk_processor
+    from .word_processor import WordProcessor
+
+    _chunk_processor = WordProcessor(dict(config, parallel_workers=0), _chunk_logs.append, plan=plan)
+
+
+def _format_chunk(fragment, records, texts, apply_color, prepared_styles):
+    """
+    在工作进程中格式化一段连续的块
+
+    Args:
+        fragment (bytes): 以 <w:body> 包裹的块XML
+        records (list): 这些块的分类记录（序号为在整个文档中的序号）
+        texts (dict): 块序号 -> 段落文本
+        apply_color (bool): 是否设置字体颜色
+        prepared_styles (tuple): 样式模式下主进程 StyleManager 的 prepared_styles，否则为None
+
+    Returns:
+        tuple: (格式化后的XML, 日志, 格式化的run数, 计数项)
+    """
+    processor = _chunk_processor
+    del _chunk_logs[:]
+    processor._stats = ProcessingStats()
+    run_formatter = processor.document_formatter.run_formatter
+    runs_before = run_formatter.runs_formatted
+    if prepared_styles is not None:
+        processor.style_manager.attach(*prepared_styles)
+
+    container = parse_xml(fragment)
+    # 块对象只用于读写XML，不需要父对象；按文档中的序号索引，与顺序格式化时一致
+    blocks = {}
+    for record, element in zip(records, container):
+        blocks[record.index] = Table(element, None) if record.kind == BlockKind.TABLE else Paragraph(element, None)
+    processor._apply_block_records(blocks, texts, records, apply_color)
+    return (etree.tostring(container), list(_chunk_logs), run_formatter.runs_formatted - runs_before,
+            dict(processor._stats.counts))
+
+
+class ParallelBlockFormatter:
+    """
+    单个大文档的并行格式化
+
+    分类在主进程中完成（图表标题与相邻图片/表格的关联等跨块上下文已包含在分类记录中），
+    格式化阶段将文档主体的块按顺序切分为连续的若干段，每段序列化为XML交给工作进程格式化，
+    返回后按原位置替换回文档。每个块的格式化只依赖其自身和分类记录，结果与顺序格式化逐字节相同。
+    """
+
+    # 每个工作进程分到的段数，段数多于进程数可以平衡各段耗时的差异
+    CHUNKS_PER_WORKER = 4
+
+    def __init__(self, config, plan, workers):
+        """
+        Args:
+            config (dict): 排版配置
+            plan (FormattingPlan): 排版计划
+            workers (int): 工作进程数
+        """
+        self.config = config
+        self.plan = plan
+        self.workers = workers
+        self._executor = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            # 统一使用 spawn：主进程中可能有界面线程和转换池线程，fork 后的子进程状态不可靠
+            self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context('spawn'),
+                                                 initializer=_init_chunk_worker, initargs=(self.config, self.plan))
+        return self._executor
+
+    def partition(self, count):
+        """将 count 个块切分为连续的段，返回 (起始序号, 结束序号) 列表"""
+        chunk_count = max(1, min(count, self.workers * self.CHUNKS_PER_WORKER))
+        bounds = [count * i // chunk_count for i in range(chunk_count + 1)]
+        return [(start, end) for start, end in zip(bounds, bounds[1:]) if start < end]
+
+    def apply(self, all_blocks, texts, records, apply_color, prepared_styles=None):
+        """
+        并行格式化所有块，格式化后的块替换回文档中原来的位置
+
+        Args:
+            all_blocks (list): 文档顶层块
+            texts (list): 各块的文本
+            records (list): 各块的分类记录
+            apply_color (bool): 是否设置字体颜色
+            prepared_styles (tuple): 样式模式下 StyleManager 的 prepared_styles
+
+        Returns:
+            tuple: (按顺序排列的日志, 格式化的run数, 计数项)
+        """
+        chunks = self.partition(len(all_blocks))
+        nsmap = all_blocks[0]._element.getparent().nsmap
+        fragments = []
+        for start, end in chunks:
+            container = etree.Element(_W_BODY, nsmap=nsmap)
+            for block in all_blocks[start:end]:
+                container.append(deepcopy(block._element))
+            fragments.append(etree.tostring(container))
+
+        # 先取回全部结果再替换：任一段失败时文档保持未格式化，调用方可以改为顺序格式化
+        results = list(self._get_executor().map(
+            _format_chunk, fragments, [records[start:end] for start, end in chunks],
+            [{idx: texts[idx] for idx in range(start, end)} for start, end in chunks],
+            [apply_color] * len(chunks), [prepared_styles] * len(chunks)))
+
+        logs, runs_formatted, counts = [], 0, {}
+        for (start, end), (fragment, chunk_logs, chunk_runs, chunk_counts) in zip(chunks, results):
+            container = parse_xml(fragment)
+            for block, element in zip(all_blocks[start:end], list(container)):
+                old_element = block._element
+                old_element.getparent().replace(old_element, element)
+            logs.extend(chunk_logs)
+            runs_formatted += chunk_runs
+            for name, count in chunk_counts.items():
+                counts[name] = counts.get(name, 0) + count
+        return logs, runs_formatted, counts
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
@@ -0,0 +1,136 @@
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+# 处理阶段及其在汇总中的名称，按流程顺序排列
+STAGE_LABELS = (
+    ('convert', "格式转换"),
+    ('preprocess', "预处理"),
+    ('open', "打开"),
+    ('caption_scan', "图表标题扫描"),
+    ('classify', "分类"),
+    ('block_loop', "逐段格式化"),
+    ('table_loop', "表格格式化"),
+    ('page_setup', "页面设置"),
+    ('save', "保存"),
+)
+STAGES = tuple(stage for stage, _ in STAGE_LABELS)
+
+# 计数项及其在汇总中的名称
+COUNTER_LABELS = (
+    ('paragraphs', "段落"),
+    ('runs', "run"),
+    ('tables', "表格"),
+    ('cells', "单元格"),
+    ('parts_copied', "原样复制部件"),
+)
+
+
+class ProcessingStats:
+    """
+    单个文档的处理统计：各阶段耗时、段落/run/表格/单元格/原样复制部件计数、输入输出字节数
+
+    阶段耗时为独占时间：嵌套阶段（如逐段格式化中的表格格式化）的耗时只计入内层阶段，
+    各阶段之和不超过总耗时。
+    """
+
+    def __init__(self, source_name=""):
+        self.source_name = source_name
+        self.stage_times = dict.fromkeys(STAGES, 0.0)
+        self.counts = Counter()
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.total_time = 0.0
+        self._stack = []
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        """
+        统计一个阶段的耗时，可嵌套使用
+
+        Args:
+            name (str): 阶段名称，见 STAGES
+        """
+        frame = [time.perf_counter(), 0.0]
+        self._stack.append(frame)
+        try:
+            yield
+        finally:
+            self._stack.pop()
+            elapsed = time.perf_counter() - frame[0]
+            self.stage_times[name] = self.stage_times.get(name, 0.0) + elapsed - frame[1]
+            if self._stack:
+                self._stack[-1][1] += elapsed
+
+    def add(self, name, count=1):
+        """累加计数项"""
+        self.counts[name] += count
+
+    def finish(self):
+        """记录总耗时，文档处理结束时调用"""
+        self.total_time = time.perf_counter() - self._start
+        return self
+
+    def to_dict(self):
+        """转换为可写入JSON的字典"""
+        return {
+            'source': self.source_name,
+            'total_s': round(self.total_time, 4),
+            'stages_s': {stage: round(seconds, 4) for stage, seconds in self.stage_times.items() if seconds},
+            'counts': {name: self.counts[name] for name, _ in COUNTER_LABELS},
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+        }
+
+    def summary(self):
+        """一行文字汇总，用于日志"""
+        return format_summary(self.to_dict())
+
+
+def aggregate_stats(stats_dicts):
+    """
+    汇总多个文档的统计（to_dict() 的结果），用于批量处理清单和界面
+
+    Args:
+        stats_dicts: 统计字典序列，None 会被跳过
+
+    Returns:
+        dict: 与 to_dict() 结构相同的汇总字典，另含文档数 'documents'
+    """
+    total = {'documents': 0, 'total_s': 0.0, 'stages_s': Counter(), 'counts': Counter(),
+             'bytes_in': 0, 'bytes_out': 0}
+    for stats in stats_dicts:
+        if not stats:
+            continue
+        total['documents'] += 1
+        total['total_s'] += stats['total_s']
+        total['stages_s'].update(stats['stages_s'])
+        total['counts'].update(stats['counts'])
+        total['bytes_in'] += stats['bytes_in']
+        total['bytes_out'] += stats['bytes_out']
+    total['total_s'] = round(total['total_s'], 4)
+    total['stages_s'] = {stage: round(total['stages_s'][stage], 4) for stage in STAGES if total['stages_s'][stage]}
+    total['counts'] = {name: total['counts'][name] for name, _ in COUNTER_LABELS}
+    return total
+
+
+def format_summary(stats):
+    """
+    将统计字典格式化为一行文字
+
+    Args:
+        stats (dict): to_dict() 或 aggregate_stats() 的结果
+
+    Returns:
+        str: 如 "耗时 1.23s（打开 0.10s，逐段格式化 0.80s，保存 0.20s）；段落 120，run 860；输入 0.25MB，输出 0.24MB"
+    """
+    stages = "，".join(f"{label} {stats['stages_s'][stage]:.2f}s"
+                       for stage, label in STAGE_LABELS if stats['stages_s'].get(stage))
+    counts = "，".join(f"{label} {stats['counts'][name]}" for name, label in COUNTER_LABELS if stats['counts'].get(name))
+    text = f"耗时 {stats['total_s']:.2f}s"
+    if stages:
+        text += f"（{stages}）"
+    if counts:
+        text += f"；{counts}"
+    return text + f"；输入 {stats['bytes_in'] / 1024 / 1024:.2f}MB，输出 {stats['bytes_out'] / 1024 / 1024:.2f}MB"
@@ -0,0 +1,146 @@
+from copy import deepcopy
+
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+from docx.shared import Pt, RGBColor
+
+_RPR = qn('w:rPr')
+_RFONTS = qn('w:rFonts')
+_HINT = qn('w:hint')
+_FONT_TAGS = (_RFONTS, qn('w:b'), qn('w:sz'))
+_COLOR = qn('w:color')
+
+# <w:rPr> 子元素的架构顺序（ECMA-376 CT_RPr），合并时据此确定插入位置
+_RPR_CHILD_ORDER = {qn(f'w:{name}'): rank for rank, name in enumerate((
+    'rStyle', 'rFonts', 'b', 'bCs', 'i', 'iCs', 'caps', 'smallCaps', 'strike', 'dstrike', 'outline',
+    'shadow', 'emboss', 'imprint', 'noProof', 'snapToGrid', 'vanish', 'webHidden', 'color', 'spacing',
+    'w', 'kern', 'position', 'sz', 'szCs', 'highlight', 'u', 'effect', 'bdr', 'shd', 'fitText',
+    'vertAlign', 'rtl', 'cs', 'em', 'lang', 'eastAsianLayout', 'specVanish', 'oMath',
+))}
+# 未知元素（rPrChange、扩展元素等）排在所有已知元素之后
+_RPR_TAIL_RANK = len(_RPR_CHILD_ORDER)
+
+
+class RunFormatter:
+    """
+    run字体格式化引擎
+
+    每种 (字体, 字号, 加粗, 颜色, 西文是否用Times New Roman) 组合只构建一次标准的 <w:rPr> 模板，
+    之后对每个run直接复制或合并该模板，不再逐个经过 python-docx 的属性设置器。
+    - run没有 <w:rPr> 时：插入模板的副本，一次树操作完成；
+    - run已有 <w:rPr> 时：只替换其中的 rFonts/b/color/sz 元素，保留斜体、下划线、上下标等其他格式。
+
+    整体替换 <w:rFonts> 会同时清除 asciiTheme/eastAsiaTheme 等主题字体属性（主题字体优先于显式字体，
+    不清除时指定的字体不生效），仅保留 w:hint。
+    """
+
+    TIMES_NEW_ROMAN = "Times New Roman"
+
+    def __init__(self):
+        self._templates = {}
+        # 已格式化的run数，供处理统计使用
+        self.runs_formatted = 0
+
+    def get_template(self, font_name, size_pt=None, is_bold=None, set_color=False, use_times_roman_for_ascii=False):
+        """
+        获取（必要时构建）指定格式组合的 <w:rPr> 模板
+
+        Args:
+            font_name (str): 字体名称
+            size_pt (float): 字号（磅），为None时不设置字号
+            is_bold (bool): 是否加粗，为None时不设置加粗
+            set_color (bool): 是否将字体颜色设置为黑色
+            use_times_roman_for_ascii (bool): 西文字符是否使用Times New Roman
+
+        Returns:
+            tuple: (模板 <w:rPr> 元素, [(子元素标签, 排序位置, 模板子元素)])，调用方不得修改
+        """
+        key = (font_name, size_pt, is_bold, set_color, use_times_roman_for_ascii)
+        template = self._templates.get(key)
+        if template is None:
+            rPr = self._build_template(*key)
+            parts = [(child.tag, _RPR_CHILD_ORDER[child.tag], child) for child in rPr]
+            template = self._templates[key] = (rPr, parts)
+        return template
+
+    @classmethod
+    def _build_template(cls, font_name, size_pt, is_bold, set_color, use_times_roman_for_ascii):
+        rPr = OxmlElement('w:rPr')
+
+        # 设置所有字符类型的字体：ASCII、高ASCII、中文、复杂脚本
+        ascii_font = cls.TIMES_NEW_ROMAN if use_times_roman_for_ascii else font_name
+        rFonts = rPr.get_or_add_rFonts()
+        rFonts.set(qn('w:ascii'), ascii_font)
+        rFonts.set(qn('w:hAnsi'), ascii_font)
+        rFonts.set(qn('w:eastAsia'), font_name)
+        rFonts.set(qn('w:cs'), font_name)
+
+        if is_bold is not None:
+            rPr._set_bool_val('b', is_bold)
+        if set_color:
+            rPr.get_or_add_color().val = RGBColor(0, 0, 0)
+        if size_pt is not None:
+            rPr.sz_val = Pt(size_pt)
+        return rPr
+
+    def apply(self, r, font_name, size_pt=None, is_bold=None, set_color=False, use_times_roman_for_ascii=False):
+        """
+        将格式模板应用到单个run元素
+
+        Args:
+            r (CT_R): run元素
+            其余参数同 get_template()
+        """
+        self.apply_to_runs((r,), font_name, size_pt, is_bold, set_color, use_times_roman_for_ascii)
+
+    def apply_to_runs(self, r_elements, font_name, size_pt=None, is_bold=None, set_color=False,
+                      use_times_roman_for_ascii=False):
+        """将同一格式模板应用到多个run元素，模板只查找一次"""
+        template, parts = self.get_template(font_name, size_pt, is_bold, set_color, use_times_roman_for_ascii)
+        self.runs_formatted += len(r_elements)
+        for r in r_elements:
+            rPr = r.find(_RPR)
+            if rPr is None:
+                r.insert(0, deepcopy(template))
+            else:
+                self._merge(rPr, parts)
+
+    @staticmethod
+    def _merge(rPr, parts):
+        """用模板中的元素替换已有 <w:rPr> 中的同名元素，缺少的按架构顺序插入"""
+        existing = {child.tag: child for child in rPr}
+        for tag, rank, source in parts:
+            new_child = deepcopy(source)
+            old_child = existing.get(tag)
+            if old_child is not None:
+                if tag == _RFONTS:
+                    hint = old_child.get(_HINT)
+                    if hint is not None:
+                        new_child.set(_HINT, hint)
+                rPr.replace(old_child, new_child)
+                continue
+            for child in rPr:
+                if _RPR_CHILD_ORDER.get(child.tag, _RPR_TAIL_RANK) > rank:
+                    child.addprevious(new_child)
+                    break
+            else:
+                rPr.append(new_child)
+
+    @staticmethod
+    def clear_direct_fonts(r_elements, clear_color=False):
+        """
+        清除run上的字体、加粗、字号直接格式，使其继承段落样式（样式模式使用）
+
+        Args:
+            r_elements: run元素序列
+            clear_color (bool): 是否同时清除字体颜色
+        """
+        tags = _FONT_TAGS + (_COLOR,) if clear_color else _FONT_TAGS
+        for r in r_elements:
+            rPr = r.find(_RPR)
+            if rPr is None:
+                continue
+            for child in list(rPr.iterchildren(*tags)):
+                rPr.remove(child)
+            if len(rPr) == 0 and not rPr.attrib:
+                r.remove(rPr)
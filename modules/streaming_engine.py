@@ -0,0 +1,442 @@
+import logging
+import posixpath
+import re
+import shutil
+import zipfile
+from collections import Counter
+from copy import deepcopy
+
+from docx.enum.style import WD_STYLE_TYPE
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.opc.oxml import serialize_part_xml
+from docx.oxml import parse_xml
+from docx.oxml.ns import qn
+from docx.oxml.parser import element_class_lookup
+from docx.oxml.table import CT_Tbl
+from docx.oxml.text.paragraph import CT_P
+from docx.section import Section
+from docx.styles.styles import Styles
+from docx.table import Table
+from docx.text.paragraph import Paragraph
+from lxml import etree
+
+from .block_classifier import BlockKind, BlockRecord
+from .file_processor import FileProcessor
+from .ooxml_preprocessor import NumberingConverter, OoxmlPreprocessor
+from .package_writer import read_raw_entry, write_raw_entry
+
+_W_BODY = qn('w:body')
+_W_SECTPR = qn('w:sectPr')
+_W_PPR_SECTPR = f"{qn('w:pPr')}/{_W_SECTPR}"
+_REL_TAG = '{http://schemas.openxmlformats.org/package/2006/relationships}Relationship'
+_CT_DEFAULT_TAG = '{http://schemas.openxmlformats.org/package/2006/content-types}Default'
+_CT_OVERRIDE_TAG = '{http://schemas.openxmlformats.org/package/2006/content-types}Override'
+
+# 与 python-docx 保存部件时（serialize_part_xml）的XML声明相同
+_XML_DECLARATION = b"<?xml version='1.0' encoding='UTF-8' standalone='yes'?>\n"
+# 开始标签中的命名空间声明（属性值中的引号已转义，不会误匹配）
+_XMLNS_DECLARATION = re.compile(rb' xmlns(?::[^=\s]+)?="[^"]*"')
+# 写出 document.xml 时每累积多少字节写入一次压缩流
+_WRITE_BUFFER_SIZE = 1024 * 1024
+
+
+class StreamingUnsupported(Exception):
+    """文档含有流式排版不能处理的内容，需改用常规方式排版"""
+
+
+class _PackageIndex:
+    """.docx 包的部件索引：主文档、样式、设置、编号部件的名称和各部件的内容类型"""
+
+    def __init__(self, zip_file):
+        self.zip_file = zip_file
+        self.names = set(zip_file.namelist())
+        self.document = self._relationship_target('_rels/.rels', '', RT.OFFICE_DOCUMENT)
+        if self.document is None:
+            raise StreamingUnsupported("找不到主文档部件")
+        document_dir, document_file = posixpath.split(self.document)
+        document_rels = posixpath.join(document_dir, '_rels', f"{document_file}.rels")
+        self.styles = self._relationship_target(document_rels, document_dir, RT.STYLES)
+        self.settings = self._relationship_target(document_rels, document_dir, RT.SETTINGS)
+        self.numbering = self._relationship_target(document_rels, document_dir, RT.NUMBERING)
+
+        self._default_types, self._override_types = {}, {}
+        if '[Content_Types].xml' in self.names:
+            for element in etree.fromstring(zip_file.read('[Content_Types].xml')):
+                if element.tag == _CT_DEFAULT_TAG:
+                    self._default_types[element.get('Extension', '').lower()] = element.get('ContentType', '')
+                elif element.tag == _CT_OVERRIDE_TAG:
+                    self._override_types[element.get('PartName', '').lstrip('/')] = element.get('ContentType', '')
+
+    def _relationship_target(self, rels_name, base_dir, rel_type):
+        if rels_name not in self.names:
+            return None
+        for rel in etree.fromstring(self.zip_file.read(rels_name)).iter(_REL_TAG):
+            if rel.get('Type') != rel_type or rel.get('TargetMode') == 'External':
+                continue
+            target = rel.get('Target', '')
+            name = target.lstrip('/') if target.startswith('/') else posixpath.normpath(posixpath.join(base_dir, target))
+            return name if name in self.names else None
+        return None
+
+    def content_type(self, name):
+        if name in self._override_types:
+            return self._override_types[name]
+        return self._default_types.get(posixpath.splitext(name)[1].lstrip('.').lower(), '')
+
+    def parse(self, name):
+        """解析部件XML，元素使用 python-docx 的元素类"""
+        return parse_xml(self.zip_file.read(name)) if name is not None else None
+
+
+class _BodyReader:
+    """
+    用 iterparse 逐个读取 document.xml 中 <w:body> 的子元素（顶层块和节属性）
+
+    每个子元素处理完后即清空并从树中移除，已处理的内容不会留在内存中。
+    """
+
+    def __init__(self, source):
+        # 与 python-docx 打开文档时的解析选项相同，元素同样使用 python-docx 的元素类
+        self._context = etree.iterparse(source, events=('end',), remove_blank_text=True, resolve_entities=False,
+                                        huge_tree=True)
+        self._context.set_element_class_lookup(element_class_lookup)
+
+    @property
+    def root(self):
+        return self._context.root
+
+    def __iter__(self):
+        for _, element in self._context:
+            body = element.getparent()
+            if body is None or body.tag != _W_BODY:
+                continue
+            yield element
+            # 先清空再移除：直接移除含大量子元素的块时 lxml 要逐个节点整理命名空间，很慢
+            element.clear()
+            body.remove(element)
+
+
+class _DocumentShell:
+    """
+    document.xml 的外壳：<w:document> 开始标签（命名空间声明与原文档相同）到 <w:body> 开始标签，以及结束标签
+
+    顶层块就地序列化时，lxml 会把祖先元素上的命名空间声明全部复制到块的开始标签上，
+    去掉这些声明后与整个文档一次序列化时该块的字节相同。块自身声明了新的命名空间时，
+    改为放入外壳的 <w:body> 中序列化（较慢，很少见）。
+    """
+
+    def __init__(self, root):
+        shell = deepcopy(root)
+        self.root = shell
+        self.body = shell.find(_W_BODY)
+        for child in list(self.body):
+            self.body.remove(child)
+        # <w:body> 之后通常没有其他元素
+        for child in list(self.body.itersiblings()):
+            shell.remove(child)
+        self.nsmap = self.body.nsmap
+        marker = etree.Comment('block')
+        self.body.append(marker)
+        xml = etree.tostring(shell, encoding='UTF-8')
+        self.body.remove(marker)
+        marker_xml = etree.tostring(marker)
+        split = xml.index(marker_xml)
+        self.prefix = _XML_DECLARATION + xml[:split]
+        self.suffix = xml[split + len(marker_xml):]
+        self._prefix_length = split
+
+    def serialize(self, element):
+        """序列化一个 <w:body> 子元素"""
+        if element.nsmap == self.nsmap:
+            xml = etree.tostring(element, encoding='UTF-8')
+            end = xml.index(b'>')
+            return _XMLNS_DECLARATION.sub(b'', xml[:end]) + xml[end:]
+        parent = element.getparent()
+        index = parent.index(element) if parent is not None else None
+        self.body.append(element)
+        xml = etree.tostring(self.root, encoding='UTF-8')
+        self.body.remove(element)
+        if parent is not None:
+            parent.insert(index, element)
+        return xml[self._prefix_length:len(xml) - len(self.suffix)]
+
+
+class StreamingDocument:
+    """
+    流式排版的文档：第一遍扫描已完成分类，save() 时第二遍读取 document.xml，
+    逐块格式化并直接写入输出文件，其他部件直接复制原压缩数据（修改过的样式、设置部件重新序列化）
+    """
+
+    def __init__(self, formatter, zip_file, package, records, caption_map, numbering, modified_parts,
+                 apply_color):
+        self.formatter = formatter
+        self.zip_file = zip_file
+        self.package = package
+        self.records = records
+        self.caption_map = caption_map
+        self.numbering = numbering
+        self.modified_parts = modified_parts
+        self.apply_color = apply_color
+
+    def save(self, target):
+        """
+        写出排版后的 .docx
+
+        Args:
+            target: 输出文件路径或可写的文件对象
+        """
+        copied = 0
+        with zipfile.ZipFile(target, 'w', zipfile.ZIP_DEFLATED) as output:
+            for info in self.zip_file.infolist():
+                name = info.filename
+                out_info = zipfile.ZipInfo(name, date_time=info.date_time)
+                out_info.compress_type = zipfile.ZIP_DEFLATED
+                if name == self.package.document:
+                    with self.zip_file.open(info) as source, output.open(out_info, 'w', force_zip64=True) as sink:
+                        self.formatter._write_document(self, source, sink)
+                elif name in self.modified_parts:
+                    output.writestr(out_info, serialize_part_xml(self.modified_parts[name]))
+                else:
+                    # 未修改的部件直接复制原压缩数据
+                    data = read_raw_entry(self.zip_file, info)
+                    if data is not None:
+                        write_raw_entry(output, info, data)
+                        copied += 1
+                        continue
+                    with self.zip_file.open(info) as source, output.open(out_info, 'w', force_zip64=True) as sink:
+                        shutil.copyfileobj(source, sink, _WRITE_BUFFER_SIZE)
+        if copied:
+            self.formatter.processor._stats.add('parts_copied', copied)
+
+
+class StreamingFormatter:
+    """
+    流式排版引擎：python-docx 会把整个 document.xml 读入内存并为每个块创建代理对象，
+    超大文档的峰值内存可达数GB。流式排版用 iterparse 两遍读取 document.xml：
+
+    - 第一遍逐块转换自动编号、提取文本、分类，只保留分类记录和图表标题关联需要的文本首字；
+    - 第二遍（保存时）逐块转换编号、格式化、设置节的页边距，序列化后立即写入输出文件的 document.xml。
+
+    格式化调用的是与常规方式相同的代码，document.xml 的输出与常规方式逐字节相同；其他部件原样复制，
+    只有样式模式下的 styles.xml 和关闭修订追踪后的 settings.xml 重新序列化。
+    正文含有修订、或需要借助WPS/Word预处理的文档不支持流式排版，改用常规方式。
+    """
+
+    def __init__(self, processor, engine='auto', min_mb=64):
+        """
+        Args:
+            processor (WordProcessor): 提供分类、格式化、页面设置等功能的排版处理器
+            engine (str): dom 始终使用常规方式，streaming 始终使用流式排版，auto 按 document.xml 大小选择
+            min_mb (float): auto 时 document.xml（解压后）不小于该大小（MB）的文档使用流式排版
+        """
+        self.processor = processor
+        self.engine = engine
+        self.min_mb = min_mb
+
+    def _log(self, message, *args, level=logging.INFO):
+        self.processor._log(message, *args, level=level)
+
+    def should_stream(self, stream):
+        """按配置和 document.xml 大小判断是否使用流式排版"""
+        if self.engine == 'dom':
+            return False
+        if self.engine == 'streaming':
+            return True
+        try:
+            with zipfile.ZipFile(stream) as zip_file:
+                info = zip_file.getinfo(_PackageIndex(zip_file).document)
+        except (zipfile.BadZipFile, KeyError, StreamingUnsupported, etree.XMLSyntaxError):
+            return False
+        finally:
+            stream.seek(0)
+        return info.file_size >= self.min_mb * 1024 * 1024
+
+    def open(self, stream):
+        """
+        第一遍扫描：分类所有块、关联图表标题、准备样式
+
+        Args:
+            stream (io.BytesIO): .docx 文件内容
+
+        Returns:
+            StreamingDocument: 文档不支持流式排版时返回None，调用方改用常规方式
+        """
+        processor = self.processor
+        stats = processor._stats
+        try:
+            zip_file = zipfile.ZipFile(stream)
+            package = _PackageIndex(zip_file)
+            if package.styles is None or package.settings is None:
+                raise StreamingUnsupported("文档缺少样式或设置部件")
+            size_mb = zip_file.getinfo(package.document).file_size / 1024 / 1024
+            self._log("【流式排版】document.xml 共 %.1fMB，逐块读取、格式化并写出...", size_mb)
+            styles_element = package.parse(package.styles)
+            with stats.stage('classify'):
+                records, link_texts, object_flags, numbering = self._scan(package, styles_element)
+        except StreamingUnsupported as e:
+            self._log("  > %s，改用常规方式排版。", e)
+            stream.seek(0)
+            return None
+
+        modified_parts = {}
+        if numbering is not None:
+            self._log("  > 已将 %d 个自动编号转换为文本。", numbering.count)
+        else:
+            self._log("  > 文档中没有修订和自动编号，跳过预处理。")
+        settings_element = package.parse(package.settings)
+        track_revisions = settings_element.findall(qn('w:trackRevisions'))
+        for element in track_revisions:
+            settings_element.remove(element)
+        if track_revisions:
+            modified_parts[package.settings] = settings_element
+
+        # TXT文件由 _build_txt_document 处理，这里的文档都统一设置字体颜色
+        apply_color = True
+        if processor.style_manager is not None:
+            self._log("【样式模式已启用】正在创建段落样式...")
+            processor.style_manager.prepare_styles(Styles(styles_element), set_color=apply_color)
+            modified_parts[package.styles] = styles_element
+
+        self._log("正在扫描图表标题...")
+        with stats.stage('caption_scan'):
+            caption_map = processor.caption_linker.link(link_texts, object_flags)
+        for caption_idx in caption_map:
+            records[caption_idx] = BlockRecord(caption_idx, BlockKind.CAPTION, 0)
+
+        self._log("预扫描完成，格式化将在写出文档时逐块进行...")
+        if processor.plan.set_outline:
+            self._log("【大纲级别设置已启用】")
+        else:
+            self._log("【大纲级别设置已禁用】")
+        counts = Counter(record.kind for record in records)
+        processor._log_block_summary(counts)
+        stats.add('paragraphs', len(records) - counts[BlockKind.TABLE] - counts[BlockKind.EMPTY])
+
+        numbering_args = None if numbering is None else (package.parse(package.numbering), styles_element)
+        return StreamingDocument(self, zip_file, package, records, caption_map, numbering_args, modified_parts,
+                                 apply_color)
+
+    def _scan(self, package, styles_element):
+        """
+        第一遍：逐块检查修订和编号、转换编号、提取文本并分类
+
+        Returns:
+            tuple: (分类记录, 图表标题关联用的文本, 对象标志位, 编号转换器或None)
+        """
+        processor = self.processor
+        classifier = processor.block_classifier
+        numbered_styles = FileProcessor.numbered_style_ids(styles_element)
+        style_names, default_style_name = self._style_names(Styles(styles_element))
+        other_parts_revised = None
+        numbering = None
+        records, link_texts, object_flags = [], [], []
+
+        with package.zip_file.open(package.document) as source:
+            for element in _BodyReader(source):
+                if FileProcessor.has_revisions(element):
+                    raise StreamingUnsupported("文档正文含有修订")
+                if numbering is None and FileProcessor.has_numbering(element, numbered_styles):
+                    if processor.ooxml_preprocessor is None:
+                        raise StreamingUnsupported("文档含有自动编号，需要借助WPS/Word预处理")
+                    if other_parts_revised is None:
+                        other_parts_revised = self._other_parts_revised(package)
+                    if other_parts_revised:
+                        raise StreamingUnsupported("文档的页眉、页脚或样式中含有修订")
+                    numbering = NumberingConverter(package.parse(package.numbering), styles_element)
+                if numbering is not None:
+                    numbering.convert(element)
+
+                if not isinstance(element, (CT_P, CT_Tbl)):
+                    continue
+                idx = len(records)
+                flags = classifier.block_object_flags(element)
+                object_flags.append(flags)
+                if isinstance(element, CT_Tbl):
+                    records.append(BlockRecord(idx, BlockKind.TABLE, 0))
+                    link_texts.append(None)
+                    continue
+                # 不在 style_names 中的样式ID（未定义或不是段落样式）与 python-docx 一样取默认段落样式
+                style_id = element.style
+                if style_id not in style_names:
+                    style_names[style_id] = default_style_name
+                para = Paragraph(element, None)
+                text = para.text
+                kind, level = classifier.classify_paragraph(para, text, flags, style_names)
+                records.append(BlockRecord(idx, kind, level))
+                # 图表标题关联只需要区分空白段落和以"图"/"表"开头的段落，保留去空白后的首字即可
+                link_texts.append(text.strip()[:1])
+        return records, link_texts, object_flags, numbering
+
+    @staticmethod
+    def _style_names(styles):
+        """样式ID -> 样式名称（只含段落样式，同一ID以第一个定义为准），以及默认段落样式的名称"""
+        style_names, seen = {}, set()
+        for style in styles:
+            style_id = style.style_id
+            if style_id in seen:
+                continue
+            seen.add(style_id)
+            if style.type == WD_STYLE_TYPE.PARAGRAPH:
+                style_names[style_id] = style.name
+        default_style_name = getattr(styles.default(WD_STYLE_TYPE.PARAGRAPH), 'name', '')
+        return style_names, default_style_name
+
+    @staticmethod
+    def _other_parts_revised(package):
+        """除主文档外需要接受修订的部件（页眉、页脚、脚注、样式、编号等）中是否含有修订"""
+        for name in package.names:
+            if name == package.document or not OoxmlPreprocessor.is_revision_part(package.content_type(name)):
+                continue
+            if FileProcessor.has_revisions(package.parse(name)):
+                return True
+        return False
+
+    def _write_document(self, document, source, sink):
+        """第二遍：逐块转换编号、格式化、设置页边距，序列化后写入输出的 document.xml"""
+        processor = self.processor
+        stats = processor._stats
+        numbering = NumberingConverter(*document.numbering) if document.numbering is not None else None
+        processor.page_setup._log("正在应用页面边距设置...")
+        reader = _BodyReader(source)
+        shell = None
+        buffer, buffered = [], 0
+        idx = -1
+        with stats.stage('block_loop'):
+            for element in reader:
+                if shell is None:
+                    shell = _DocumentShell(element.getparent().getparent())
+                    sink.write(shell.prefix)
+                if numbering is not None:
+                    numbering.convert(element)
+                if isinstance(element, (CT_P, CT_Tbl)):
+                    idx += 1
+                    self._format_block(document, element, idx)
+                sectPr = element if element.tag == _W_SECTPR else element.find(_W_PPR_SECTPR)
+                if sectPr is not None:
+                    with stats.stage('page_setup'):
+                        processor.page_setup.apply_section(Section(sectPr, None))
+                xml = shell.serialize(element)
+                buffer.append(xml)
+                buffered += len(xml)
+                if buffered >= _WRITE_BUFFER_SIZE:
+                    sink.write(b''.join(buffer))
+                    buffer, buffered = [], 0
+            if shell is None:
+                shell = _DocumentShell(reader.root)
+                sink.write(shell.prefix)
+            buffer.append(shell.suffix)
+            sink.write(b''.join(buffer))
+
+    def _format_block(self, document, element, idx):
+        """格式化一个顶层块，与常规方式中预扫描格式化标题、逐块格式化两个步骤相同"""
+        processor = self.processor
+        record = document.records[idx]
+        if isinstance(element, CT_Tbl):
+            block, text = Table(element, None), None
+        else:
+            block = Paragraph(element, None)
+            text = block.text
+        if record.kind == BlockKind.CAPTION:
+            _, detected_type = document.caption_map[idx]
+            processor._format_caption(block, idx, text.strip(), detected_type, document.apply_color)
+        processor._apply_block_records({idx: block}, {idx: text}, (record,), document.apply_color)
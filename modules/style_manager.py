@@ -0,0 +1,116 @@
+import logging
+from copy import deepcopy
+
+from docx.enum.style import WD_STYLE_TYPE
+
+from .logger import emit_log, resolve_log_level
+
+# 样式角色 -> (样式名称, 样式ID)
+STYLE_ROLES = {
+    'body': ('排版正文', 'WFBody'),
+    'h1': ('排版一级标题', 'WFHeading1'),
+    'h2': ('排版二级标题', 'WFHeading2'),
+    'h3': ('排版三级标题', 'WFHeading3'),
+    'table_caption': ('排版表格标题', 'WFTableCaption'),
+    'figure_caption': ('排版图形标题', 'WFFigureCaption'),
+}
+
+
+class StyleManager:
+    """
+    样式模式：按配置在文档中创建/更新命名段落样式（正文、一至三级标题、表格标题、图形标题），
+    段落只引用样式（pStyle），run上重复的字体、字号、加粗、颜色直接格式被清除。
+
+    样式只承载字体格式，段落的间距、缩进、对齐等仍按原有方式直接设置。
+    表格内容和图片段落中的文字保持直接格式化。
+    """
+
+    def __init__(self, plan, run_formatter, log_callback=None, log_level='info'):
+        """
+        Args:
+            plan (FormattingPlan): 排版计划，提供各角色的字体格式
+            run_formatter (RunFormatter): 共用的run格式模板缓存
+            log_callback (callable): 日志回调函数
+            log_level (str): 日志级别，'debug'、'info' 或 'warning'
+        """
+        self.plan = plan
+        self.run_formatter = run_formatter
+        self.log_callback = log_callback
+        self.log_level = resolve_log_level(log_level)
+        # 当前文档中各角色对应的样式ID，由 prepare() 生成
+        self._style_ids = {}
+        self._clear_color = False
+
+    def _log(self, message, *args, level=logging.INFO):
+        """输出日志，级别过滤和格式化见 logger.emit_log"""
+        emit_log(self.log_callback, self.log_level, message, args, level)
+
+    def prepare(self, doc, set_color=False):
+        """
+        在文档中创建或更新所有角色的样式，每个文档只需调用一次
+
+        Args:
+            doc (Document): 文档对象
+            set_color (bool): 样式中是否将字体颜色设置为黑色
+        """
+        self.prepare_styles(doc.styles, set_color)
+
+    def prepare_styles(self, styles, set_color=False):
+        """
+        与 prepare() 相同，直接作用于样式集合（流式排版时文档没有完整打开，只有 styles.xml）
+
+        Args:
+            styles (Styles): 文档的样式集合
+            set_color (bool): 样式中是否将字体颜色设置为黑色
+        """
+        self._style_ids = {}
+        self._clear_color = set_color
+        for role, (style_name, style_id) in STYLE_ROLES.items():
+            try:
+                style = styles[style_name]
+                if style.type != WD_STYLE_TYPE.PARAGRAPH:
+                    raise KeyError(style_name)
+                action = "更新"
+            except KeyError:
+                style = styles.add_style(style_name, WD_STYLE_TYPE.PARAGRAPH)
+                style.style_id = style_id
+                action = "创建"
+            style.quick_style = True
+
+            font_name, size_pt, is_bold, use_times_roman = self.plan.role(role)
+            template, _ = self.run_formatter.get_template(font_name, size_pt, is_bold, set_color, use_times_roman)
+            style_element = style.element
+            style_element._remove_rPr()
+            style_element._insert_rPr(deepcopy(template))
+
+            self._style_ids[role] = style.style_id
+            self._log(f"  > 已{action}样式: {style_name}")
+
+    @property
+    def prepared_styles(self):
+        """prepare() 的结果：(角色 -> 样式ID, 是否清除run颜色)，用于在其他进程中 attach()"""
+        return dict(self._style_ids), self._clear_color
+
+    def attach(self, style_ids, clear_color):
+        """
+        直接使用另一个 StyleManager 的 prepare() 结果（文档样式已由其创建），供并行格式化的工作进程使用
+
+        Args:
+            style_ids (dict): 角色 -> 样式ID
+            clear_color (bool): 是否清除run上的字体颜色
+        """
+        self._style_ids = dict(style_ids)
+        self._clear_color = clear_color
+
+    def apply(self, para, role):
+        """
+        为段落设置角色样式并清除run上重复的字体格式
+
+        Args:
+            para (Paragraph): 段落
+            role (str): 样式角色，见 STYLE_ROLES
+        """
+        para._p.style = self._style_ids[role]
+        r_lst = para._p.r_lst
+        self.run_formatter.runs_formatted += len(r_lst)
+        self.run_formatter.clear_direct_fonts(r_lst, clear_color=self._clear_color)
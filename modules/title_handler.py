@@ -1,16 +1,20 @@
+import logging
 import re
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 from docx.text.paragraph import Paragraph
 
+from .logger import emit_log, resolve_log_level
+
 
 class TitleHandler:
     def __init__(self, config, log_callback=None):
         self.config = config
         self.log_callback = log_callback
+        self.log_level = resolve_log_level(config.get('log_level', 'info'))
 
-    def _log(self, message):
-        if self.log_callback:
-            self.log_callback(message)
+    def _log(self, message, *args, level=logging.INFO):
+        """输出日志，级别过滤和格式化见 logger.emit_log"""
+        emit_log(self.log_callback, self.log_level, message, args, level)
 
     def _iter_block_items(self, parent):
         """迭代文档块项目"""
@@ -63,10 +67,10 @@ class TitleHandler:
                 if isinstance(block, Paragraph) and block.text.strip():
                     text_to_check = block.text.strip()
                     if re_h1.match(text_to_check) or re_h2.match(text_to_check):
-                        self._log(f"  > 首个非空行 (块 {idx + 1}) 符合标题格式，认定本文档无独立题目。")
+                        self._log("  > 首个非空行 (块 %d) 符合标题格式，认定本文档无独立题目。", idx + 1, level=logging.DEBUG)
                         return [], []
                     else:
-                        self._log(f"  > 在块 {idx + 1} 发现首个非空段落，认定为题目首行。")
+                        self._log("  > 在块 %d 发现首个非空段落，认定为题目首行。", idx + 1, level=logging.DEBUG)
                         first_title_idx = idx
                         break
         else:
@@ -81,7 +85,7 @@ class TitleHandler:
                     self._log("  > 发现一级/二级标题，在此之前未找到居中题目。")
                     return [], []
                 if para.alignment == WD_ALIGN_PARAGRAPH.CENTER:
-                    self._log(f"  > 在块 {idx + 1} 发现潜在题目首行。")
+                    self._log("  > 在块 %d 发现潜在题目首行。", idx + 1, level=logging.DEBUG)
                     first_title_idx = idx
                     break
 
@@ -107,7 +111,7 @@ class TitleHandler:
 
             # 遇到空行，停止标题识别
             if not text:
-                self._log(f"  > 在块 {idx + 1} 遇到空行，标题识别结束。")
+                self._log("  > 在块 %d 遇到空行，标题识别结束。", idx + 1, level=logging.DEBUG)
                 break
 
             # 检查是否居中
@@ -117,7 +121,7 @@ class TitleHandler:
             # 检查字体字号是否与首行相同
             para_font, para_size = self._get_paragraph_font_info(para)
             if para_font == title_font and para_size == title_size:
-                self._log(f"  > 块 {idx + 1} 也是标题行（居中且字体字号相同）。")
+                self._log("  > 块 %d 也是标题行（居中且字体字号相同）。", idx + 1, level=logging.DEBUG)
                 title_indices.append(idx)
                 idx += 1
             else:
@@ -153,7 +157,7 @@ class TitleHandler:
                     # 检查字体字号是否与标题不同
                     para_font, para_size = self._get_paragraph_font_info(para)
                     if para_font != title_font or para_size != title_size:
-                        self._log(f"  > 在块 {subtitle_start_idx + 1} 发现副标题首行（居中且字体字号与标题不同）。")
+                        self._log("  > 在块 %d 发现副标题首行（居中且字体字号与标题不同）。", subtitle_start_idx + 1, level=logging.DEBUG)
                         subtitle_indices.append(subtitle_start_idx)
 
                         # 查找连续的副标题行
@@ -170,7 +174,7 @@ class TitleHandler:
 
                             # 遇到空行，停止副标题识别
                             if not text:
-                                self._log(f"  > 在块 {idx + 1} 遇到空行，副标题识别结束。")
+                                self._log("  > 在块 %d 遇到空行，副标题识别结束。", idx + 1, level=logging.DEBUG)
                                 break
 
                             # 检查是否居中
@@ -180,7 +184,7 @@ class TitleHandler:
                             # 检查字体字号是否与副标题首行相同
                             para_font, para_size = self._get_paragraph_font_info(para)
                             if para_font == subtitle_font and para_size == subtitle_size:
-                                self._log(f"  > 块 {idx + 1} 也是副标题行（居中且字体字号相同）。")
+                                self._log("  > 块 %d 也是副标题行（居中且字体字号相同）。", idx + 1, level=logging.DEBUG)
                                 subtitle_indices.append(idx)
                                 idx += 1
                             else:
@@ -1,14 +1,37 @@
 import json
 import os
-import requests
+import re
 import logging
 import subprocess
 import tempfile
 import shutil
+import time
 from datetime import datetime, timedelta
 import sys
 import zipfile
 
+from .delta_update import DeltaError, apply_delta
+from .hashing import file_sha256
+
+# 下载分块大小：按实际速度在上下限之间倍增或减半，使每块的读取耗时接近目标值
+MIN_DOWNLOAD_CHUNK = 64 * 1024
+MAX_DOWNLOAD_CHUNK = 4 * 1024 * 1024
+DOWNLOAD_CHUNK_SECONDS = 0.5
+# 断点续传重试的最长等待时间（秒）
+MAX_RETRY_DELAY = 30
+# 检查更新的超时（秒）：连接超时、读取超时；服务器不可达时尽快放弃
+UPDATE_CHECK_TIMEOUT = (3, 10)
+# 默认的检查更新间隔（秒），间隔内启动程序直接使用上次取得的 update.xml
+DEFAULT_CHECK_INTERVAL = 6 * 60 * 60
+# 上次取得的 update.xml 及其 ETag/Last-Modified、取得时间
+UPDATE_CHECK_CACHE_NAME = 'WordFormatter_update_check.json'
+
+
+def _requests():
+    """导入并返回 requests 模块：requests 导入较慢，在检查、下载更新时（均在后台线程）才导入，不拖慢程序启动"""
+    import requests
+    return requests
+
 
 class UpdateManager:
     """更新管理器，用于处理应用程序的自动更新"""
@@ -30,11 +53,17 @@ class UpdateManager:
         
         # 从配置中获取自动更新设置
         self.auto_update = config.get('auto_update', True)
-        # 删除定期检查更新的间隔设置，因为我们只需要启动时检查一次
+        # 下载中断后从断点继续的最多重试次数
+        self.download_retries = config.get('update_download_retries', 3)
+        # 检查更新间隔（秒）：间隔内不访问更新服务器，0为每次启动都检查
+        self.check_interval = config.get('check_update_interval', DEFAULT_CHECK_INTERVAL)
+        self.check_cache_path = os.path.join(tempfile.gettempdir(), UPDATE_CHECK_CACHE_NAME)
     
     def check_for_updates(self):
         """
-        检查是否有可用更新（仅在程序启动时调用一次）
+        检查是否有可用更新（仅在程序启动时调用一次，可在后台线程调用）
+        
+        update.xml 的内容会缓存到本地，见 _fetch_update_xml()。
         
         Returns:
             bool: 是否有更新可用
@@ -44,31 +73,43 @@ class UpdateManager:
             return False
         
         self.log_callback("正在检查更新...")
+        requests = _requests()
         
         try:
-            # 发送请求获取最新版本信息
-            response = requests.get(self.update_check_url, timeout=10, verify=False)  # 跳过SSL验证
-            response.raise_for_status()
-            
-            # 确保响应内容使用正确的编码
-            response.encoding = 'utf-8'
+            # 获取最新版本信息
+            update_xml = self._fetch_update_xml()
             
             # 解析XML格式的更新信息
             import xml.etree.ElementTree as ET
-            root = ET.fromstring(response.text)
+            root = ET.fromstring(update_xml)
             
             # 提取版本号和更新信息，使用更安全的方式
             version_element = root.find('version')
             url_element = root.find('url')
             notes_element = root.find('notes')
+            sha256_element = root.find('sha256')
             
             latest_version = version_element.text.strip() if version_element is not None and version_element.text else '1.0.0'
             update_url = url_element.text.strip() if url_element is not None and url_element.text else ''
             update_notes = notes_element.text.strip() if notes_element is not None and notes_element.text else '无'
+            # 更新包的SHA-256摘要（十六进制），下载完成后据此校验完整性；旧的update.xml中没有此项
+            update_sha256 = sha256_element.text.strip().lower() if sha256_element is not None and sha256_element.text else ''
             
             # 清理URL中的特殊字符（如反引号）
             update_url = update_url.replace('`', '')
             
+            # 增量更新包：<delta from="旧版本" base_sha256="旧版本程序摘要" sha256="增量更新包摘要">地址</delta>
+            deltas = []
+            for delta_element in root.findall('delta'):
+                delta_url = (delta_element.text or '').strip().replace('`', '')
+                if delta_element.get('from') and delta_url.startswith(('http://', 'https://')):
+                    deltas.append({
+                        'from': delta_element.get('from').strip(),
+                        'url': delta_url,
+                        'base_sha256': (delta_element.get('base_sha256') or '').strip().lower(),
+                        'sha256': (delta_element.get('sha256') or '').strip().lower()
+                    })
+            
             self.last_check_time = datetime.now()
             
             # 比较版本号
@@ -91,8 +132,10 @@ class UpdateManager:
                     'body': update_notes,
                     'assets': [{
                         'name': filename,
-                        'browser_download_url': update_url
-                    }]
+                        'browser_download_url': update_url,
+                        'sha256': update_sha256
+                    }],
+                    'deltas': deltas
                 }
                 
                 return True, latest_version, release_info
@@ -109,17 +152,84 @@ class UpdateManager:
             self.logger.error(f"更新检查时发生错误: {e}", exc_info=True)
             return False, self.current_version, None
     
+    def _fetch_update_xml(self):
+        """
+        获取 update.xml 的内容
+        
+        距上次从服务器取得不足 check_interval 秒时直接使用本地缓存，不访问网络；否则带上缓存的
+        ETag/Last-Modified 发送条件请求，服务器返回304（未修改）时沿用缓存内容，只刷新取得时间。
+        
+        Returns:
+            str: update.xml 的内容
+        """
+        cache = self._load_check_cache()
+        now = time.time()
+        if cache and 0 <= now - cache['checked_at'] < self.check_interval:
+            checked_at = datetime.fromtimestamp(cache['checked_at']).strftime('%Y-%m-%d %H:%M')
+            self.log_callback(f"使用 {checked_at} 取得的更新信息")
+            return cache['xml']
+        
+        requests = _requests()
+        headers = {}
+        if cache and cache.get('etag'):
+            headers['If-None-Match'] = cache['etag']
+        if cache and cache.get('last_modified'):
+            headers['If-Modified-Since'] = cache['last_modified']
+        response = requests.get(self.update_check_url, headers=headers,
+                                timeout=UPDATE_CHECK_TIMEOUT, verify=False)  # 跳过SSL验证
+        if response.status_code == 304 and cache:
+            update_xml = cache['xml']
+        else:
+            response.raise_for_status()
+            # 确保响应内容使用正确的编码
+            response.encoding = 'utf-8'
+            update_xml = response.text
+            cache = {
+                'etag': response.headers.get('ETag', ''),
+                'last_modified': response.headers.get('Last-Modified', '')
+            }
+        cache.update(url=self.update_check_url, xml=update_xml, checked_at=now)
+        self._save_check_cache(cache)
+        return update_xml
+    
+    def _load_check_cache(self):
+        """读取检查更新的缓存；不存在、已损坏或不是当前更新地址的缓存时返回None"""
+        try:
+            with open(self.check_cache_path, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if (not isinstance(cache, dict) or cache.get('url') != self.update_check_url
+                or not isinstance(cache.get('xml'), str) or not isinstance(cache.get('checked_at'), (int, float))):
+            return None
+        return cache
+    
+    def _save_check_cache(self, cache):
+        try:
+            with open(self.check_cache_path, 'w', encoding='utf-8') as f:
+                json.dump(cache, f, ensure_ascii=False)
+        except OSError as e:
+            self.logger.warning(f"无法保存检查更新的缓存: {e}")
+    
     def download_update(self, release_info):
         """
         下载更新包
         
+        打包后的程序优先使用增量更新：update.xml 中有从当前版本出发的增量更新包、且本机程序文件
+        与其基准版本一致时，只下载增量更新包，在本机生成新版本程序并校验；任何一步失败都改为下载完整更新包。
+        
         Args:
             release_info (dict): 更新信息字典
         
         Returns:
-            str: 下载的更新包路径
+            str: 下载的更新包路径（增量更新时为生成的新版本程序，扩展名为 .new）
         """
+        requests = _requests()
         try:
+            patched_exe_path = self._try_delta_update(release_info)
+            if patched_exe_path:
+                return patched_exe_path
+            
             # 查找更新包（支持exe和zip格式）
             assets = release_info.get('assets', [])
             update_asset = None
@@ -139,32 +249,7 @@ class UpdateManager:
                 self.log_callback("更新包下载地址无效")
                 return None
             
-            self.log_callback(f"开始下载更新包: {update_asset.get('name')}")
-            
-            # 创建临时文件保存更新包
-            temp_dir = tempfile.gettempdir()
-            update_file_path = os.path.join(temp_dir, update_asset.get('name'))
-            
-            # 下载更新包
-            response = requests.get(download_url, stream=True, timeout=30, verify=False)  # 跳过SSL验证
-            response.raise_for_status()
-            
-            total_size = int(response.headers.get('content-length', 0))
-            downloaded_size = 0
-            
-            with open(update_file_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
-                        downloaded_size += len(chunk)
-                        
-                        # 计算下载进度
-                        if total_size > 0:
-                            progress = (downloaded_size / total_size) * 100
-                            self.log_callback(f"下载进度: {progress:.1f}%")
-            
-            self.log_callback(f"更新包下载完成: {update_file_path}")
-            return update_file_path
+            return self._download_file(download_url, update_asset.get('name'), update_asset.get('sha256') or '')
             
         except requests.exceptions.RequestException as e:
             self.log_callback(f"更新包下载失败: {e}")
@@ -175,6 +260,216 @@ class UpdateManager:
             self.logger.error(f"下载更新包时发生错误: {e}", exc_info=True)
             return None
     
+    def _try_delta_update(self, release_info):
+        """
+        尝试增量更新：下载增量更新包，用本机程序文件生成新版本程序
+        
+        Returns:
+            str: 生成的新版本程序路径；不适用或失败时返回None（调用方改为下载完整更新包）
+        """
+        requests = _requests()
+        deltas = [delta for delta in release_info.get('deltas', []) if delta.get('from') == self.current_version]
+        if not deltas or not getattr(sys, 'frozen', False):
+            return None
+        delta = deltas[0]
+        current_exe_path = sys.executable
+        try:
+            # 先确认本机程序与增量更新包的基准版本一致，不一致时不必下载
+            if delta.get('base_sha256') and file_sha256(current_exe_path) != delta['base_sha256']:
+                self.log_callback("本机程序文件与增量更新的基准版本不一致，下载完整更新包")
+                return None
+            self.log_callback(f"使用增量更新: v{self.current_version} -> {release_info.get('tag_name')}")
+            delta_path = self._download_file(delta['url'], os.path.basename(delta['url']), delta.get('sha256', ''))
+            if not delta_path:
+                self.log_callback("增量更新包下载失败，改为下载完整更新包")
+                return None
+            
+            patched_exe_path = os.path.join(tempfile.gettempdir(),
+                                            f"WordFormatter_{release_info.get('tag_name', 'new')}.exe.new")
+            header = apply_delta(current_exe_path, delta_path, patched_exe_path)
+            os.remove(delta_path)
+            self.log_callback(f"增量更新完成，新版本程序已通过SHA-256校验（{header['target_size'] / 1024 / 1024:.1f}MB）")
+            return patched_exe_path
+        except (DeltaError, OSError, requests.exceptions.RequestException) as e:
+            self.log_callback(f"增量更新失败: {e}，改为下载完整更新包")
+            self.logger.warning(f"增量更新失败: {e}")
+            return None
+    
+    def _download_file(self, download_url, file_name, expected_sha256):
+        """
+        下载文件到临时目录
+        
+        下载内容先写入同目录的 .part 文件，中断后（包括程序重启后）用HTTP Range请求从断点继续，
+        全部下载完成并通过SHA-256校验后才改名为正式文件名。提供了 expected_sha256 时，
+        已下载且校验通过的文件直接使用，不再重复下载。
+        
+        Args:
+            download_url (str): 下载地址
+            file_name (str): 保存的文件名
+            expected_sha256 (str): update.xml 中的SHA-256摘要，可能为空
+        
+        Returns:
+            str: 下载的文件路径，校验失败时返回None
+        """
+        requests = _requests()
+        # 创建临时文件保存更新包
+        temp_dir = tempfile.gettempdir()
+        update_file_path = os.path.join(temp_dir, file_name)
+        part_path = update_file_path + '.part'
+        
+        if expected_sha256 and os.path.exists(update_file_path) \
+                and file_sha256(update_file_path) == expected_sha256:
+            self.log_callback(f"更新包已下载且校验通过: {update_file_path}")
+            return update_file_path
+        
+        self.log_callback(f"开始下载更新包: {file_name}")
+        
+        # 下载更新包：网络中断时等待片刻后从断点继续
+        attempt = 0
+        while True:
+            try:
+                self._download_to_part(download_url, part_path, expected_sha256)
+                break
+            except requests.exceptions.RequestException as e:
+                if attempt >= self.download_retries:
+                    raise
+                attempt += 1
+                delay = min(2 ** attempt, MAX_RETRY_DELAY)
+                self.log_callback(f"下载中断: {e}，{delay}秒后从断点继续（第{attempt}次重试）")
+                time.sleep(delay)
+        
+        # 校验完整性：摘要不符时删除已下载的内容，下次重新下载
+        if expected_sha256:
+            actual_sha256 = file_sha256(part_path)
+            if actual_sha256 != expected_sha256:
+                self.log_callback(f"更新包校验失败（SHA-256 应为 {expected_sha256}，实际为 {actual_sha256}），已删除")
+                self._remove_partial_download(part_path)
+                return None
+            self.log_callback("更新包SHA-256校验通过")
+        else:
+            self.log_callback("警告: update.xml 未提供 sha256，跳过更新包完整性校验")
+        
+        os.replace(part_path, update_file_path)
+        self._remove_partial_download(part_path, keep_part=True)
+        self.log_callback(f"更新包下载完成: {update_file_path}")
+        return update_file_path
+    
+    def _download_to_part(self, download_url, part_path, expected_sha256):
+        """
+        下载（或从断点继续下载）更新包到 .part 文件
+        
+        .part 旁的 .json 文件记录下载地址、摘要和服务器返回的 ETag/Last-Modified，
+        续传时通过 If-Range 确认服务器上的文件没有变化，地址或摘要变化时重新下载。
+        
+        Args:
+            download_url (str): 更新包下载地址
+            part_path (str): .part 文件路径
+            expected_sha256 (str): update.xml 中的摘要，可能为空
+        """
+        requests = _requests()
+        meta_path = part_path + '.json'
+        meta = {}
+        if os.path.exists(part_path) and os.path.exists(meta_path):
+            try:
+                with open(meta_path, 'r', encoding='utf-8') as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                meta = {}
+        if meta.get('url') != download_url or meta.get('sha256', '') != expected_sha256:
+            self._remove_partial_download(part_path)
+            meta = {}
+        
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        # 续传按字节偏移计算，要求服务器不压缩传输内容
+        headers = {'Accept-Encoding': 'identity'}
+        if offset:
+            headers['Range'] = f'bytes={offset}-'
+            if meta.get('validator'):
+                headers['If-Range'] = meta['validator']
+        
+        with requests.get(download_url, headers=headers, stream=True, timeout=30, verify=False) as response:  # 跳过SSL验证
+            if response.status_code == 416 and offset:
+                # 请求的起点已超出文件末尾：.part 已经完整时直接交给校验，否则丢弃重新下载
+                total = self._content_range_total(response.headers.get('Content-Range', ''))
+                if total == offset:
+                    return
+                self.log_callback("已下载的部分与服务器上的文件不符，重新下载")
+                self._remove_partial_download(part_path)
+                return self._download_to_part(download_url, part_path, expected_sha256)
+            response.raise_for_status()
+            
+            content_range = response.headers.get('Content-Range', '')
+            if response.status_code == 206:
+                if not content_range.startswith(f'bytes {offset}-'):
+                    self._remove_partial_download(part_path)
+                    raise requests.exceptions.ConnectionError(f"服务器返回的续传范围不符: {content_range}")
+                total = self._content_range_total(content_range)
+                mode = 'ab'
+                self.log_callback(f"从断点继续下载: 已有 {offset / 1024 / 1024:.1f}MB")
+            else:
+                # 服务器不支持续传或文件已变化，返回了完整内容
+                offset = 0
+                total = int(response.headers.get('content-length', 0))
+                mode = 'wb'
+            
+            meta = {'url': download_url, 'sha256': expected_sha256,
+                    'validator': response.headers.get('ETag') or response.headers.get('Last-Modified') or ''}
+            with open(meta_path, 'w', encoding='utf-8') as f:
+                json.dump(meta, f)
+            
+            with open(part_path, mode) as f:
+                downloaded_size = self._copy_response(response, f, offset, total)
+        
+        if total and downloaded_size < total:
+            raise requests.exceptions.ConnectionError(
+                f"连接提前关闭（已下载 {downloaded_size} / {total} 字节）")
+    
+    def _copy_response(self, response, f, downloaded_size, total_size):
+        """
+        将响应内容写入文件，分块大小随下载速度调整，每完成10%输出一次进度
+        
+        Returns:
+            int: 文件的总字节数（含续传前已有的部分）
+        """
+        chunk_size = MIN_DOWNLOAD_CHUNK
+        reported = int(downloaded_size * 10 / total_size) if total_size > 0 else 0
+        while True:
+            start = time.monotonic()
+            chunk = next(response.iter_content(chunk_size=chunk_size), b'')
+            if not chunk:
+                break
+            elapsed = time.monotonic() - start
+            f.write(chunk)
+            downloaded_size += len(chunk)
+            
+            # 读满一块的耗时远小于目标值时加大分块，远大于目标值时减小
+            if len(chunk) == chunk_size and elapsed < DOWNLOAD_CHUNK_SECONDS / 2:
+                chunk_size = min(chunk_size * 2, MAX_DOWNLOAD_CHUNK)
+            elif elapsed > DOWNLOAD_CHUNK_SECONDS * 2:
+                chunk_size = max(chunk_size // 2, MIN_DOWNLOAD_CHUNK)
+            
+            # 计算下载进度
+            if total_size > 0 and int(downloaded_size * 10 / total_size) > reported:
+                reported = int(downloaded_size * 10 / total_size)
+                self.log_callback(f"下载进度: {downloaded_size / total_size * 100:.1f}%")
+        return downloaded_size
+    
+    @staticmethod
+    def _content_range_total(content_range):
+        """从 Content-Range（如 "bytes 100-199/200" 或 "bytes */200"）中取出文件总大小，未知时返回0"""
+        match = re.search(r'/(\d+)\s*$', content_range)
+        return int(match.group(1)) if match else 0
+    
+    @staticmethod
+    def _remove_partial_download(part_path, keep_part=False):
+        """删除 .part 文件及其记录文件；keep_part 为True时只删除记录文件"""
+        paths = [part_path + '.json'] if keep_part else [part_path, part_path + '.json']
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+    
     def install_update(self, update_file_path):
         """
         安装更新
@@ -186,7 +481,10 @@ class UpdateManager:
             self.log_callback(f"开始安装更新: {update_file_path}")
             
             # 根据文件类型选择安装方式
-            if update_file_path.endswith('.exe'):
+            if update_file_path.endswith('.exe.new'):
+                # 增量更新生成的新版本程序，替换当前程序
+                self._replace_executable(update_file_path, sys.executable, [update_file_path])
+            elif update_file_path.endswith('.exe'):
                 # 启动exe更新程序
                 subprocess.Popen([update_file_path, '--update'], shell=True)
             elif update_file_path.endswith('.zip'):
@@ -259,39 +557,7 @@ class UpdateManager:
                 new_exe_path = exe_files[0]
                 self.log_callback(f"找到新的程序文件: {new_exe_path}")
                 
-                # 创建更新脚本
-                update_script_path = os.path.join(temp_dir, 'update_wordformatter.bat')
-                with open(update_script_path, 'w', encoding='utf-8') as f:
-                    f.write('@echo off\n')
-                    f.write('chcp 65001 >nul\n')  # 设置UTF-8编码
-                    f.write('timeout /t 3 /nobreak >nul\n')  # 等待3秒确保主程序完全退出
-                    f.write(f'echo 正在更新程序...\n')
-                    f.write(f'copy /Y "{new_exe_path}" "{current_exe_path}"\n')  # 覆盖原文件
-                    f.write(f'if errorlevel 1 echo 文件复制失败\n')
-                    f.write(f'del /Q "{update_file_path}" 2>nul\n')  # 删除更新包
-                    f.write(f'rmdir /S /Q "{extract_dir}" 2>nul\n')  # 删除解压目录
-                    f.write(f'del /Q "{update_script_path}" 2>nul\n')  # 删除自身
-                    f.write(f'echo 启动新版本程序...\n')
-                    f.write(f'start "" "{current_exe_path}"\n')  # 重新启动程序
-                
-                self.log_callback(f"更新脚本已创建: {update_script_path}")
-                
-                # 先关闭当前程序的日志系统，然后再启动更新脚本
-                try:
-                    logging.shutdown()
-                except:
-                    pass
-                
-                # 使用Windows ShellExecute启动更新脚本，避免权限问题
-                import ctypes
-                ctypes.windll.shell32.ShellExecuteW(
-                    None, 
-                    "runas", 
-                    update_script_path, 
-                    None, 
-                    None, 
-                    1
-                )
+                self._replace_executable(new_exe_path, current_exe_path, [update_file_path, extract_dir])
             else:
                 # 开发环境：复制所有文件到当前目录
                 self.log_callback("开发环境模式：直接复制文件")
@@ -337,6 +603,52 @@ class UpdateManager:
             self.logger.error(f"处理zip更新包时发生错误: {e}", exc_info=True)
             return False
     
+    def _replace_executable(self, new_exe_path, current_exe_path, cleanup_paths):
+        """
+        创建并以管理员权限启动更新脚本：等待本程序退出后用新程序覆盖当前程序、清理临时文件并重新启动
+        
+        Args:
+            new_exe_path (str): 新版本程序
+            current_exe_path (str): 当前程序路径
+            cleanup_paths (list): 替换完成后删除的文件或目录
+        """
+        temp_dir = tempfile.gettempdir()
+        update_script_path = os.path.join(temp_dir, 'update_wordformatter.bat')
+        with open(update_script_path, 'w', encoding='utf-8') as f:
+            f.write('@echo off\n')
+            f.write('chcp 65001 >nul\n')  # 设置UTF-8编码
+            f.write('timeout /t 3 /nobreak >nul\n')  # 等待3秒确保主程序完全退出
+            f.write(f'echo 正在更新程序...\n')
+            f.write(f'copy /Y "{new_exe_path}" "{current_exe_path}"\n')  # 覆盖原文件
+            f.write(f'if errorlevel 1 echo 文件复制失败\n')
+            for path in cleanup_paths:
+                if os.path.isdir(path):
+                    f.write(f'rmdir /S /Q "{path}" 2>nul\n')  # 删除解压目录
+                else:
+                    f.write(f'del /Q "{path}" 2>nul\n')  # 删除更新包
+            f.write(f'del /Q "{update_script_path}" 2>nul\n')  # 删除自身
+            f.write(f'echo 启动新版本程序...\n')
+            f.write(f'start "" "{current_exe_path}"\n')  # 重新启动程序
+        
+        self.log_callback(f"更新脚本已创建: {update_script_path}")
+        
+        # 先关闭当前程序的日志系统，然后再启动更新脚本
+        try:
+            logging.shutdown()
+        except:
+            pass
+        
+        # 使用Windows ShellExecute启动更新脚本，避免权限问题
+        import ctypes
+        ctypes.windll.shell32.ShellExecuteW(
+            None, 
+            "runas", 
+            update_script_path, 
+            None, 
+            None, 
+            1
+        )
+    
     def _is_newer_version(self, latest, current):
         """
         比较版本号，判断是否为新版本
@@ -1,739 +1,698 @@
+import io
 import logging
 import os
+from collections import Counter
+from copy import deepcopy
+
 from docx import Document
-from docx.text.paragraph import Paragraph
-from docx.table import Table
 from docx.shared import Pt
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 from docx.oxml import OxmlElement
 from docx.oxml.ns import qn
-import re
+from docx.text.paragraph import Paragraph
 
 from .file_processor import FileProcessor
 from .document_formatter import DocumentFormatter
 from .title_handler import TitleHandler
 from .page_setup import PageSetup
 from .config_manager import ConfigManager
+from .block_classifier import BlockClassifier, BlockKind, BlockRecord
+from .caption_linker import CaptionLinker
+from .style_manager import StyleManager
+from .ooxml_preprocessor import OoxmlPreprocessor
+from .logger import emit_log, resolve_log_level
+from .processing_stats import ProcessingStats
+from .parallel_formatter import ParallelBlockFormatter
+from .package_writer import save_document
+from .streaming_engine import StreamingFormatter
+
+_W_P = qn('w:p')
+_W_R = qn('w:r')
+_W_TBL = qn('w:tbl')
+_W_T = qn('w:t')
+_XML_SPACE = qn('xml:space')
+
+# 分类汇总日志中各类别的名称，按此顺序输出
+_BLOCK_KIND_LABELS = (
+    (BlockKind.BODY, "正文"),
+    (BlockKind.OUTLINE_HEADING, "大纲级别标题"),
+    (BlockKind.NUMBERED_HEADING, "数字编号标题"),
+    (BlockKind.TABLE_CAPTION, "表格标题段落"),
+    (BlockKind.CAPTION, "图表标题"),
+    (BlockKind.TABLE, "表格"),
+    (BlockKind.PICTURE, "图片段落"),
+    (BlockKind.EMBEDDED_OBJECT, "附件段落"),
+    (BlockKind.EMPTY, "空白段落"),
+)
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 
 class WordProcessor:
-    def __init__(self, config, log_callback=None):
+    def __init__(self, config, log_callback=None, temp_dir=None, converter_pool=None, stats_callback=None,
+                 plan=None):
         self.config = config
         self.log_callback = log_callback
-        self.file_processor = FileProcessor(log_callback)
+        # 排版计划：由配置一次性生成的格式参数，逐段格式化时不再查找和转换配置值
+        self.plan = plan if plan is not None else ConfigManager().build_formatting_plan(config)
+        # 处理统计：每个文档处理完成后调用 stats_callback(ProcessingStats)，最近一次的统计保存在 last_stats
+        self.stats_callback = stats_callback
+        self.last_stats = None
+        self._stats = ProcessingStats()
+        # 当前文档打开时读取的 .docx 内容，保存时从中原样复制未修改的部件；TXT文档为None
+        self._source_stream = None
+        # 当前文档读入的输入内容（.docx 为只读内存映射），保存后关闭
+        self._input_stream = None
+        # 日志级别：逐段日志为 DEBUG，默认 INFO 级别下直接丢弃，不再逐段格式化日志文本
+        self.log_level = resolve_log_level(config.get('log_level', 'info'))
+        self.file_processor = FileProcessor(log_callback, temp_dir=temp_dir, converter_pool=converter_pool,
+                                            pool_size=config.get('converter_pool_size', 1),
+                                            recycle_after=config.get('converter_recycle_after', 50),
+                                            log_level=config.get('log_level', 'info'))
         self.document_formatter = DocumentFormatter(config, log_callback)
         self.title_handler = TitleHandler(config, log_callback)
-        self.page_setup = PageSetup(config, log_callback)
-
-    def _log(self, message):
-        if self.log_callback:
-            self.log_callback(message)
-
-    def format_document(self, input_path, output_path):
-        processing_path, is_from_txt = self.file_processor.convert_to_docx(input_path)
-        self._log(f"  > 处理路径: {processing_path}")
-
-        # 检查临时文件是否存在
-        if not os.path.exists(processing_path):
-            self._log(f"  > 错误：临时文件不存在: {processing_path}")
-            raise FileNotFoundError(f"临时文件不存在: {processing_path}")
-
-        if not is_from_txt:
-            self.file_processor._preprocess_com_tasks(processing_path)
-            # 预处理完成后，再次检查文件是否存在
-            if not os.path.exists(processing_path):
-                self._log(f"  > 警告：预处理后文件不存在: {processing_path}")
-                # 尝试重新创建文件
-                self._log(f"  > 尝试重新创建文件...")
-                processing_path, _ = self.file_processor.convert_to_docx(input_path)
-                if not os.path.exists(processing_path):
-                    self._log(f"  > 重新创建文件也失败: {processing_path}")
-                    raise FileNotFoundError(f"预处理后文件不存在且重新创建失败: {processing_path}")
-                else:
-                    self._log(f"  > 重新创建文件成功: {processing_path}")
-            else:
-                self._log(f"  > 验证预处理后文件仍存在: {processing_path}")
-
-        # 再次检查文件是否存在
-        if not os.path.exists(processing_path):
-            self._log(f"  > 错误：预处理后文件不存在: {processing_path}")
-            raise FileNotFoundError(f"预处理后文件不存在: {processing_path}")
+        self.page_setup = PageSetup(config, log_callback, plan=self.plan)
+        self.block_classifier = BlockClassifier(config)
+        self.caption_linker = CaptionLinker()
+        # 预处理引擎：native 直接修改OOXML（默认），com 借助WPS/Word
+        self.ooxml_preprocessor = None
+        if config.get('preprocess_engine', 'native') == 'native':
+            self.ooxml_preprocessor = OoxmlPreprocessor(log_callback, config.get('log_level', 'info'))
+        # 样式模式：字体写入命名段落样式，段落只引用样式
+        self.style_manager = None
+        if self.plan.style_mode:
+            self.style_manager = StyleManager(self.plan, self.document_formatter.run_formatter, log_callback,
+                                              config.get('log_level', 'info'))
+        # 排版引擎：dom 为常规方式，streaming 为流式排版，auto 时 document.xml 较大的文档使用流式排版
+        self.streaming_formatter = StreamingFormatter(self, config.get('format_engine', 'auto'),
+                                                      config.get('streaming_min_mb', 64))
+        # 单文档并行排版：块数较多的文档分段交给多个进程格式化，进程池在第一次使用时创建
+        self.parallel_formatter = None
+        self.parallel_min_blocks = config.get('parallel_min_blocks', 2000)
+        if config.get('parallel_workers', 0) > 1:
+            self.parallel_formatter = ParallelBlockFormatter(config, self.plan, config['parallel_workers'])
+
+    def _log(self, message, *args, level=logging.INFO):
+        """输出日志，级别过滤和格式化见 logger.emit_log"""
+        emit_log(self.log_callback, self.log_level, message, args, level)
+
+    @staticmethod
+    def _preview(text):
+        """日志中显示的段落文本预览（前30个字符）"""
+        return text.lstrip()[:30].replace("\n", " ")
+
+    def _log_block_summary(self, counts):
+        """输出本文档各类别块数的汇总"""
+        summary = "，".join(f"{label} {counts[kind]}" for kind, label in _BLOCK_KIND_LABELS if counts[kind])
+        self._log("  > 分类汇总：%s", summary or "无内容")
+
+    def format_document(self, source, output_path=None):
+        """
+        排版文档，整个处理过程在内存中完成，只在最终保存时写磁盘
+
+        Args:
+            source: 输入文件路径（.docx/.doc/.wps/.txt），或 .docx 文件内容（bytes 或可读的文件对象）
+            output_path: 输出文件路径或可写的文件对象；为None时返回排版后的 .docx 内容
+
+        Returns:
+            bytes: output_path 为None时返回排版后的 .docx 内容，否则返回None
+            各阶段耗时和计数见 last_stats，构造时传入 stats_callback 时也会通过回调传出
+        """
+        is_path = isinstance(source, (str, os.PathLike))
+        stats = self._stats = ProcessingStats(os.fspath(source) if is_path else "document")
+        self._source_stream = None
+        self._input_stream = None
+        if is_path:
+            stats.bytes_in = os.path.getsize(source)
 
-        # 尝试打开文档，如果失败则尝试重新创建
-        doc = None
         try:
-            doc = Document(processing_path)
-        except Exception as e:
-            self._log(f"  > 首次打开文档失败: {e}")
-            # 尝试使用绝对路径
-            abs_path = os.path.abspath(processing_path)
-            self._log(f"  > 尝试使用绝对路径: {abs_path}")
-            try:
-                doc = Document(abs_path)
-            except Exception as e2:
-                self._log(f"  > 使用绝对路径也失败: {e2}")
-                # 如果还是失败，尝试重新创建文件
-                self._log(f"  > 尝试重新创建文件...")
-                processing_path, _ = self.file_processor.convert_to_docx(input_path)
-                if os.path.exists(processing_path):
-                    self._log(f"  > 重新创建文件成功，再次尝试打开...")
-                    try:
-                        doc = Document(processing_path)
-                        self._log(f"  > 重新打开文档成功")
-                    except Exception as e3:
-                        self._log(f"  > 重新打开文档也失败: {e3}")
-                        raise
+            is_txt = is_path and os.path.splitext(source)[1].lower() == '.txt'
+            runs_before = self.document_formatter.run_formatter.runs_formatted
+            if is_txt:
+                doc = self._build_txt_document(os.fspath(source))
+            else:
+                doc = self._format_docx_document(source, os.fspath(source) if is_path else "document")
+
+            self._log("正在保存最终文档...")
+            result = None
+            with stats.stage('save'):
+                if output_path is None:
+                    output_stream = io.BytesIO()
+                    self._save_document(doc, output_stream)
+                    result = output_stream.getvalue()
+                    stats.bytes_out = len(result)
+                elif isinstance(output_path, (str, os.PathLike)):
+                    self._save_document(doc, output_path)
+                    stats.bytes_out = os.path.getsize(output_path)
+                else:
+                    start = output_path.tell()
+                    self._save_document(doc, output_path)
+                    stats.bytes_out = output_path.tell() - start
+        finally:
+            # .docx 输入以内存映射方式打开，保存完成（或出错）后立即释放，不再占用输入文件
+            self._close_input_stream()
+        if not is_txt:
+            # 流式排版在保存时才逐块格式化，run数在保存后统计
+            stats.add('runs', self.document_formatter.run_formatter.runs_formatted - runs_before)
+
+        self.last_stats = stats.finish()
+        self._log("  > 处理统计：%s", stats.summary())
+        if self.stats_callback:
+            self.stats_callback(stats)
+        return result
+
+    def _save_document(self, doc, target):
+        """保存文档：未修改的部件（图片、嵌入对象等）直接复制源文件中的压缩数据，不再解压后重新压缩"""
+        # TXT文档没有源文件；流式排版的文档不经过 _open_document，由 StreamingDocument.save 自行复制部件
+        if self._source_stream is None:
+            doc.save(target)
+            return
+        copied, copied_bytes = save_document(doc, self._source_stream, target)
+        if copied:
+            self._stats.add('parts_copied', copied)
+            self._log("  > %d 个未修改的部件（共 %.1fMB）直接复制原压缩数据。", copied, copied_bytes / 1024 / 1024,
+                      level=logging.DEBUG)
+
+    def _load_stream(self, source, input_name):
+        """将输入读入内存（.doc/.wps 先转换），返回 .docx 内容的 BytesIO"""
+        stats = self._stats
+        is_converted = os.path.splitext(input_name)[1].lower() in ('.doc', '.wps')
+        with stats.stage('convert' if is_converted else 'open'):
+            stream = self.file_processor.load_docx_stream(source)
+        self._input_stream = stream
+        if not stats.bytes_in:
+            stats.bytes_in = len(stream.getbuffer())
+        return stream
+
+    def _close_input_stream(self):
+        """关闭读入的输入文档（.docx 为只读内存映射），排版结果已保存或已放弃"""
+        stream, self._input_stream = self._input_stream, None
+        self._source_stream = None
+        if stream is not None:
+            stream.close()
+
+    def _open_document(self, stream, input_name):
+        """打开内存中的文档，仅在文档含有修订或自动编号时执行预处理"""
+        stats = self._stats
+        with stats.stage('open'):
+            doc = Document(stream)
+        if self.file_processor.needs_preprocessing(doc):
+            with stats.stage('preprocess'):
+                if self.ooxml_preprocessor is not None:
+                    self.ooxml_preprocessor.process(doc)
+                    self.file_processor.disable_track_revisions(doc)
                 else:
-                    self._log(f"  > 重新创建文件失败: {processing_path}")
-                    raise FileNotFoundError(f"重新创建文件失败: {processing_path}")
-
-        if doc is None:
-            raise RuntimeError("无法打开文档")
-
-        all_blocks = list(self.document_formatter._iter_block_items(doc))
-        processed_indices = set()
-
-        apply_color = not is_from_txt
-
-        if not is_from_txt:
-            self._log("正在扫描图表标题...")
-            for idx, block in enumerate(all_blocks):
-                is_pic_para = isinstance(block, Paragraph) and (
-                            '<w:drawing>' in block._p.xml or '<w:pict>' in block._p.xml)
-                is_table = isinstance(block, Table)
-
-                if not (is_pic_para or is_table): continue
-
-                for direction in [-1, 1]:
-                    caption_found = False
-                    for i in range(idx + direction, -1 if direction == -1 else len(all_blocks), direction):
-                        if i in processed_indices: continue
-                        potential_caption = all_blocks[i]
-                        if not isinstance(potential_caption, Paragraph): break
-                        text = potential_caption.text.strip()
-                        if text:
-                            # 单独成行且以"图"或"表"开头的段落都识别为图表标题，不再要求居中对齐
-                            # 特别地，对于表格标题，即使不是居中对齐也会被识别
-                            if text.startswith("图") or text.startswith("表"):
-                                detected_type = "图" if text.startswith("图") else "表"
-                                # 如果标题未居中，设置为居中对齐
-                                if potential_caption.alignment != WD_ALIGN_PARAGRAPH.CENTER:
-                                    potential_caption.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                                    self._log(f"  > 已将未居中的{detected_type}标题设置为居中对齐")
-                                self._log(f"  > 发现 {detected_type} 的标题: \"{text[:30]}...\" (在段落 {i + 1})")
-                                config_font_key = f'{("figure" if detected_type == "图" else "table")}_caption_font'
-                                config_size_key = f'{("figure" if detected_type == "图" else "table")}_caption_size'
-                                config_font = self.config[config_font_key]
-                                config_size = self.config[config_size_key]
-                                config_bold_key = f'{("figure" if detected_type == "图" else "table")}_caption_bold'
-                                config_bold = self.config.get(config_bold_key, False)
-                                self.document_formatter._apply_font_to_runs(potential_caption, config_font, config_size,
-                                                                           set_color=apply_color, is_bold=config_bold)
-                                # 表格/图表标题不缩进，确保完全没有任何缩进
-                                potential_caption.paragraph_format.first_line_indent = None
-                                potential_caption.paragraph_format.left_indent = Pt(0)
-                                potential_caption.paragraph_format.right_indent = Pt(0)
-                                # 移除 hanging_indent 设置，因为该属性不存在
-
-                                # 确保完全清除任何可能的缩进设置 - 使用更健壮的方式
-                                try:
-                                    pPr = potential_caption._p.get_or_add_pPr()
-
-                                    # 获取或创建缩进元素
-                                    if pPr.find(qn('w:ind')) is None:
-                                        ind = OxmlElement('w:ind')
-                                        pPr.append(ind)
-                                    else:
-                                        ind = pPr.find(qn('w:ind'))
-
-                                    # 清除所有可能的缩进属性
-                                    for attr in ['w:firstLine', 'w:firstLineChars', 'w:left', 'w:leftChars',
-                                                 'w:right', 'w:rightChars', 'w:hanging', 'w:hangingChars']:
-                                        if attr in ind.attrib:
-                                            del ind.attrib[attr]
-
-                                    # 显式设置为0 - 使用不同单位确保彻底移除缩进
-                                    ind.set(qn('w:firstLineChars'), '0')
-                                    ind.set(qn('w:leftChars'), '0')
-                                    ind.set(qn('w:rightChars'), '0')
-                                    ind.set(qn('w:firstLine'), '0')
-                                    ind.set(qn('w:left'), '0')
-                                    ind.set(qn('w:right'), '0')
-                                except Exception as e:
-                                    self._log(f"  > 设置 {detected_type} 标题缩进时出错: {e}")
-
-                                # 额外保障措施：记录当前处理的标题，防止后续被覆盖
-                                # 使用 setattr 来动态添加属性
-                                setattr(potential_caption, '_has_no_indent', True)
-
-                                # 应用大纲级别设置
-                                outline_level_key = f'{("figure" if detected_type == "图" else "table")}_caption_outline_level'
-                                if outline_level_key in self.config:
-                                    outline_level_value = self.config[outline_level_key]
-                                    if outline_level_value != '无' and outline_level_value != '':
-                                        try:
-                                            level = int(outline_level_value)
-                                            if 1 <= level <= 9:
-                                                self.document_formatter._set_outline_level(potential_caption, level)
-                                                self._log(f"  > 已设置 {detected_type} 标题的大纲级别为 {level}")
-                                        except (ValueError, TypeError):
-                                            pass  # 忽略无效值
-
-                                processed_indices.add(i)
-                                caption_found = True
-                            break
-                    if caption_found: break
-
-        # 不再查找主标题和副标题
-        title_indices, subtitle_indices = [], []
+                    stream = self.file_processor.preprocess_stream(stream, input_name)
+            if self.ooxml_preprocessor is None:
+                with stats.stage('open'):
+                    doc = Document(stream)
+        else:
+            self._log("  > 文档中没有修订和自动编号，跳过预处理。")
+            self.file_processor.disable_track_revisions(doc)
+        self._source_stream = stream
+        return doc
+
+    def _format_docx_document(self, source, input_name):
+        """排版 .docx/.doc/.wps 文档，返回排版后的文档对象"""
+        stats = self._stats
+        stream = self._load_stream(source, input_name)
+        # 超大文档使用流式排版：不把整个 document.xml 读入内存，格式化在保存时逐块进行
+        if self.streaming_formatter.should_stream(stream):
+            doc = self.streaming_formatter.open(stream)
+            if doc is not None:
+                return doc
+        doc = self._open_document(stream, input_name)
+
+        with stats.stage('classify'):
+            all_blocks = list(self.document_formatter._iter_block_items(doc))
+            object_flags = self.block_classifier.build_object_index(doc.element.body, all_blocks)
+            texts = self.block_classifier.extract_texts(all_blocks)
+
+        # TXT文件由 _build_txt_document 处理，这里的文档都统一设置字体颜色
+        apply_color = True
+
+        if self.style_manager is not None:
+            self._log("【样式模式已启用】正在创建段落样式...")
+            self.style_manager.prepare(doc, set_color=apply_color)
+
+        self._log("正在扫描图表标题...")
+        with stats.stage('caption_scan'):
+            caption_map = self.caption_linker.link(texts, object_flags)
+            for caption_idx, (_, detected_type) in caption_map.items():
+                self._format_caption(all_blocks[caption_idx], caption_idx, texts[caption_idx].strip(),
+                                     detected_type, apply_color)
 
         self._log("预扫描完成，开始逐段格式化...")
-        if self.config['set_outline']:
+        if self.plan.set_outline:
             self._log("【大纲级别设置已启用】")
         else:
             self._log("【大纲级别设置已禁用】")
 
-        re_h1 = re.compile(r'^[一二三四五六七八九十百千万零]+\s*、')
-        re_h2 = re.compile(r'^[（\(][一二三四五六七八九十百千万零]+[）\)]')
-        # 原有的正则表达式保留，但添加更精确的数字编号识别
-        re_h3 = re.compile(r'^\d+\s*[\.．]')
-        re_h4 = re.compile(r'^[（\(]\d+[）\)]')
-        # 添加新的正则表达式，根据点的数量识别不同级别的数字编号标题
-        re_number_h2 = re.compile(r'^\d+\s*[\.．]\s*\d+\s*[\.．]\s*$')  # 例如 "7.9." (1个点)
-        re_number_h3 = re.compile(r'^\d+\s*[\.．]\s*\d+\s*[\.．]\s*\d+\s*[\.．]\s*$')  # 例如 "7.9.4." (2个点)
-        re_number_h4 = re.compile(r'^\d+\s*[\.．]\s*\d+\s*[\.．]\s*\d+\s*[\.．]\s*\d+\s*[\.．]\s*$')  # 例如 "7.8.5.3." (3个点)
-        re_number_h5 = re.compile(r'^\d+\s*[\.．]\s*\d+\s*[\.．]\s*\d+\s*[\.．]\s*\d+\s*[\.．]\s*\d+\s*[\.．]\s*$')  # 例如 "7.8.5.3.1." (4个点)
-        re_attachment = re.compile(r'^附件\s*(\d+|[一二三四五六七八九十百千万零]+)?\s*[:：]?$')
-
-        # 已移除主标题和副标题的格式化功能
-        # 格式化主标题
-        # if title_indices:
-        #     self._log(f"\n开始格式化主标题（共 {len(title_indices)} 行）...")
-        #     for idx in title_indices:
-        #         para = all_blocks[idx]
-        #         self._log(f"段落 {idx + 1}: 主标题行 - \"{para.text[:30]}...\"")
-        #         self.document_formatter._strip_leading_whitespace(para)
-        #         self.document_formatter._apply_font_to_runs(para, self.config['h1_font'], self.config['h1_size'],
-        #                                                     set_color=apply_color)
-        #         para.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        #         para.paragraph_format.first_line_indent = None
-        #         para.paragraph_format.left_indent = Pt(0)
-        #
-        #         # 设置标题行间距
-        #         spacing = para._p.get_or_add_pPr().get_or_add_spacing()
-        #         spacing.set(qn('w:beforeAutospacing'), '0')
-        #         spacing.set(qn('w:afterAutospacing'), '0')
-        #         # 根据配置设置一级标题段前、段后间距（直接使用磅值）
-        #         h1_space_before_pts = float(self.config['h1_space_before'])
-        #         h1_space_after_pts = float(self.config['h1_space_after'])
-        #         para.paragraph_format.space_before = Pt(h1_space_before_pts)
-        #         para.paragraph_format.space_after = Pt(h1_space_after_pts)
-        #         para.paragraph_format.line_spacing = Pt(self.config['line_spacing'])
-        #         
-        #         # 设置大纲级别为1级
-        #         if self.config['set_outline']:
-        #             self.document_formatter._set_outline_level(para, 1)
-        #             self._log(f"  > 已设置主标题的大纲级别为 1")
-        #
-        #         self.document_formatter._reset_pagination_properties(para)
-        #
-        # # 格式化副标题
-        # if subtitle_indices:
-        #     self._log(f"\n开始格式化副标题（共 {len(subtitle_indices)} 行）...")
-        #     for idx in subtitle_indices:
-        #         para = all_blocks[idx]
-        #         self._log(f"段落 {idx + 1}: 副标题行 - \"{para.text[:30]}...\"")
-        #         self.document_formatter._strip_leading_whitespace(para)
-        #         self.document_formatter._apply_font_to_runs(para, self.config['h2_font'], self.config['h2_size'],
-        #                                                     set_color=apply_color)
-        #         para.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        #         para.paragraph_format.first_line_indent = None
-        #         para.paragraph_format.left_indent = Pt(0)
-        #
-        #         # 设置副标题行间距
-        #         spacing = para._p.get_or_add_pPr().get_or_add_spacing()
-        #         spacing.set(qn('w:beforeAutospacing'), '0')
-        #         spacing.set(qn('w:afterAutospacing'), '0')
-        #         # 根据配置设置二级标题段前、段后间距（直接使用磅值）
-        #         h2_space_before_pts = float(self.config['h2_space_before'])
-        #         h2_space_after_pts = float(self.config['h2_space_after'])
-        #         para.paragraph_format.space_before = Pt(h2_space_before_pts)
-        #         para.paragraph_format.space_after = Pt(h2_space_after_pts)
-        #         para.paragraph_format.line_spacing = Pt(self.config['line_spacing'])
-        #
-        #         self.document_formatter._reset_pagination_properties(para)
-
-        block_idx = 0
-        while block_idx < len(all_blocks):
-            block = all_blocks[block_idx]
-
-            if block_idx in processed_indices:
-                self._log(f"块 {block_idx + 1}: 已作为图表/附件标题处理 - 跳过")
-                block_idx += 1
-                continue
-
-            current_block_num = block_idx + 1
-            if isinstance(block, Table):
-                self._log(f"块 {current_block_num}: 表格 - 检查内部标题")
-                # 检查表格内部第一行是否为标题
-                table = block
-                if len(table.rows) > 0:
-                    first_row = table.rows[0]
-                    # 检查第一行的所有单元格
-                    for cell in first_row.cells:
-                        if len(cell.paragraphs) > 0:
-                            for para in cell.paragraphs:
-                                text = para.text.strip()
-                                if text and text.startswith("表"):
-                                    # 确保标题始终居中对齐
-                                    para.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                                    self._log(f"  > 发现表格内部标题: \"{text[:30]}...\"")
-                                    config_font = self.config['table_caption_font']
-                                    config_size = self.config['table_caption_size']
-                                    config_bold = self.config.get('table_caption_bold', False)
-                                    self.document_formatter._apply_font_to_runs(para, config_font, config_size,
-                                                                        set_color=apply_color,
-                                                                        is_bold=config_bold)
-                                    # 表格标题不缩进，确保完全没有任何缩进
-                                    para.paragraph_format.first_line_indent = None
-                                    para.paragraph_format.left_indent = Pt(0)
-                                    para.paragraph_format.right_indent = Pt(0)
-                                    para.paragraph_format.hanging_indent = Pt(0)
-                                    
-                                    # 确保彻底清除所有缩进相关设置 - 使用更健壮的方式
-                                    try:
-                                        pPr = para._p.get_or_add_pPr()
-                                        
-                                        # 完全移除现有的缩进元素，然后创建一个全新的
-                                        existing_ind = pPr.find(qn('w:ind'))
-                                        if existing_ind is not None:
-                                            pPr.remove(existing_ind)
-                                        
-                                        # 创建一个全新的、干净的缩进元素
-                                        new_ind = OxmlElement('w:ind')
-                                        
-                                        # 显式设置所有可能的缩进属性为0，使用多种单位确保彻底移除缩进
-                                        new_ind.set(qn('w:firstLineChars'), '0')
-                                        new_ind.set(qn('w:leftChars'), '0')
-                                        new_ind.set(qn('w:rightChars'), '0')
-                                        new_ind.set(qn('w:firstLine'), '0')
-                                        new_ind.set(qn('w:left'), '0')
-                                        new_ind.set(qn('w:right'), '0')
-                                        new_ind.set(qn('w:hanging'), '0')
-                                        new_ind.set(qn('w:hangingChars'), '0')
-                                        
-                                        # 添加到pPr元素
-                                        pPr.append(new_ind)
-                                        
-                                        # 检查并移除可能影响缩进的其他元素
-                                        for element_name in ['w:firstLine', 'w:firstLineChars', 'w:left', 'w:leftChars',
-                                                            'w:right', 'w:rightChars', 'w:hanging', 'w:hangingChars']:
-                                            element = pPr.find(qn(element_name))
-                                            if element is not None:
-                                                pPr.remove(element)
-                                        
-                                        # 设置标记，表明这个段落已经明确设置为无缩进
-                                        para._has_no_indent = True
-                                        
-                                    except Exception as e:
-                                        self._log(f"设置表格标题缩进时出错: {e}")
-                                        # 即使发生异常，仍然尝试通过简单的API调用确保没有缩进
-                                        try:
-                                            para.paragraph_format.first_line_indent = None
-                                            para.paragraph_format.left_indent = Pt(0)
-                                            # 额外添加这一行，直接设置为负数以强制覆盖可能存在的缩进
-                                            para.paragraph_format.left_indent = Pt(-0.01)
-                                            # 然后再设置为0
-                                            para.paragraph_format.left_indent = Pt(0)
-                                        except:
-                                            pass
-                                    
-                                    # 标记为表格标题，避免后续被覆盖
-                                    para._is_table_caption = True
-
-                                # 应用表格标题大纲级别设置
-                                if 'table_caption_outline_level' in self.config:
-                                    outline_level_value = self.config['table_caption_outline_level']
-                                    if outline_level_value != '无' and outline_level_value != '':
-                                        try:
-                                            level = int(outline_level_value)
-                                            if 1 <= level <= 9:
-                                                self.document_formatter._set_outline_level(para, level)
-                                                self._log(f"  > 已设置表格内部标题的大纲级别为 {level}")
-                                        except (ValueError, TypeError):
-                                            pass  # 忽略无效值
-
-                                break
-                # 处理表格内的所有单元格内容
-                body_font = self.config['body_font']
-                
-                # 遍历表格的所有行和单元格，确保表格内容的字体大小始终保持不变
-                for row in table.rows:
-                    for cell in row.cells:
-                        # 遍历单元格中的所有段落
-                        for para in cell.paragraphs:
-                            # 跳过已经处理过的表格标题
-                            if para.alignment == WD_ALIGN_PARAGRAPH.CENTER and para.text.strip().startswith("表"):
-                                continue
-                                 
-                            # 检查是否为表格标题
-                            is_table_caption = hasattr(para, '_is_table_caption') and para._is_table_caption
-                            if is_table_caption:
-                                continue
-                             
-                            # 遍历段落中的所有run
-                            for run in para.runs:
-                                # 保存原始字体大小
-                                original_font_size = run.font.size
-                                
-                                # 确保表格使用的字体与正文一致，同时保持字体大小不变
-                                if original_font_size:
-                                    # 仅修改字体名称为正文字体，严格使用原始字体大小
-                                    self.document_formatter._set_run_font(
-                                        run, body_font, 
-                                        original_font_size.pt,  # 严格使用原始字体大小
-                                        set_color=apply_color,
-                                        use_times_roman_for_ascii=self.config.get('table_use_times_roman', True)
-                                    )
-                                elif not original_font_size:
-                                    # 对于没有明确字体大小的情况，不修改字体大小
-                                    # 只修改字体名称，完全保持原始格式
-                                    self.document_formatter._set_run_font_without_size(
-                                        run, body_font,
-                                        set_color=apply_color,
-                                        use_times_roman_for_ascii=self.config.get('table_use_times_roman', True)
-                                    )
-                                # 其他情况不做任何修改，完全保持表格内容的原始格式
-                            
-                            # 标记表格中的段落，防止后续处理中被修改
-                            para._is_table_content = True
-                block_idx += 1
-                continue
-
-            para = block
-            if not para.text.strip():
-                self._log(f"段落 {current_block_num}: 空白 - 跳过")
-                block_idx += 1
-                continue
-
-            is_pic = '<w:drawing>' in para._p.xml or '<w:pict>' in para._p.xml
-            is_embedded_obj = '<w:object>' in para._p.xml
-            if is_pic or is_embedded_obj:
-                log_msg = "图片" if is_pic else "附件"
-                self._log(f"段落 {current_block_num}: {log_msg} - 仅格式化文字")
-
-                text_to_check = para.text.lstrip()
-                para_text_preview = text_to_check[:30].replace("\n", " ")
-
-                if re_h1.match(text_to_check):
-                    self._log(f"  > 文字识别为一级标题: \"{para_text_preview}...\"")
-                    self.document_formatter._apply_font_to_runs(para, self.config['h1_font'], self.config['h1_size'],
-                                                                set_color=apply_color)
-                elif re_h2.match(text_to_check):
-                    self._log(f"  > 文字识别为二级标题: \"{para_text_preview}...\"")
-                    self.document_formatter._apply_font_to_runs(para, self.config['h2_font'], self.config['h2_size'],
-                                                                set_color=apply_color)
-                elif re_h3.match(text_to_check):
-                    self._log(f"  > 文字识别为三级标题: \"{para_text_preview}...\"")
-                    self.document_formatter._apply_font_to_runs(para, self.config['body_font'], self.config['body_size'],
-                                                                set_color=apply_color,
-                                                                use_times_roman_for_ascii=self.config.get('body_use_times_roman', True))
-                elif re_h4.match(text_to_check):
-                    self._log(f"  > 文字识别为四级标题: \"{para_text_preview}...\"")
-                    self.document_formatter._apply_font_to_runs(para, self.config['body_font'], self.config['body_size'],
-                                                                set_color=apply_color,
-                                                                use_times_roman_for_ascii=self.config.get('body_use_times_roman', True))
-                elif text_to_check:
-                    self._log(f"  > 文字识别为正文: \"{para_text_preview}...\"")
-                    self.document_formatter._apply_font_to_runs(para, self.config['body_font'], self.config['body_size'],
-                                                                set_color=apply_color,
-                                                                use_times_roman_for_ascii=self.config.get('body_use_times_roman', True))
-
-                # 确保图片或附件中的文字（即使是标题）也不缩进
-                if re_h1.match(text_to_check) or re_h2.match(text_to_check) or re_h3.match(text_to_check) or re_h4.match(text_to_check):
-                    self.document_formatter._apply_text_indent_and_align(para)
-                
-                block_idx += 1
-                continue
+        # 分类阶段：一次遍历得到所有块的类别，格式化阶段只消费分类记录
+        with stats.stage('classify'):
+            records = self.block_classifier.classify(all_blocks, texts, object_flags, caption_map)
+        with stats.stage('block_loop'):
+            if self.parallel_formatter is not None and records and len(records) >= self.parallel_min_blocks:
+                self._apply_block_records_parallel(all_blocks, texts, records, apply_color)
+            else:
+                self._apply_block_records(all_blocks, texts, records, apply_color)
+        counts = Counter(record.kind for record in records)
+        self._log_block_summary(counts)
+        stats.add('paragraphs', len(records) - counts[BlockKind.TABLE] - counts[BlockKind.EMPTY])
+
+        with stats.stage('page_setup'):
+            self.page_setup._apply_page_setup(doc, is_from_txt=False)
+        return doc
+
+    def _build_txt_document(self, input_path):
+        """
+        TXT文件的流式排版：逐行读取文本，直接生成已格式化的段落XML
+
+        TXT中的段落没有样式、大纲级别和图片，类别只取决于文本，同类段落的格式完全相同。
+        因此每种 (类别, 级别) 只用原有的格式化方法生成一次段落模板，之后每行复制模板并填入文本，
+        不再生成中间的临时 .docx 文件，也不必重新打开解析。
+
+        Returns:
+            Document: 排版后的文档对象
+        """
+        self._log(f"  > 原始文件路径: {input_path}")
+        self._log("检测到 .txt 文件，正在直接生成排版后的文档...")
+        lines = self.file_processor.iter_txt_lines(input_path)
+
+        doc = Document()
+        if self.style_manager is not None:
+            self._log("【样式模式已启用】正在创建段落样式...")
+            self.style_manager.prepare(doc, set_color=False)
+
+        self._log("开始逐段格式化...")
+        if self.plan.set_outline:
+            self._log("【大纲级别设置已启用】")
+        else:
+            self._log("【大纲级别设置已禁用】")
 
-            original_text, text_to_check = para.text, para.text.lstrip()
-            text_to_check_stripped = para.text.strip()
-            leading_space_count = len(original_text) - len(text_to_check)
-            para_text_preview = text_to_check[:30].replace("\n", " ")
-
-            spacing = para._p.get_or_add_pPr().get_or_add_spacing()
-            spacing.set(qn('w:beforeAutospacing'), '0')
-            spacing.set(qn('w:afterAutospacing'), '0')
-            para.paragraph_format.space_before, para.paragraph_format.space_after = Pt(0), Pt(0)
-            para.paragraph_format.line_spacing = Pt(self.config['line_spacing'])
-
-            # 检查段落的大纲级别
-            outline_level = self.document_formatter._get_outline_level(para)
-
-            # 特殊处理：如果段落以"表"开头，强制识别为表格标题，不作为普通标题处理
-            if para.text.strip().startswith("表"):
-                self._log(f"段落 {current_block_num}: 检测到以'表'开头的段落，强制识别为表格标题")
-                # 应用表格标题格式
-                self.document_formatter._strip_leading_whitespace(para)
-                config_font = self.config['table_caption_font']
-                config_size = self.config['table_caption_size']
-                config_bold = self.config.get('table_caption_bold', False)
-                self.document_formatter._apply_font_to_runs(para, config_font, config_size,
-                                                           set_color=apply_color, is_bold=config_bold)
-                # 表格标题居中对齐且不缩进
-                para.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                self.document_formatter._apply_text_indent_and_align(para)
-                # 应用表格标题大纲级别设置
-                if 'table_caption_outline_level' in self.config:
-                    outline_level_value = self.config['table_caption_outline_level']
-                    if outline_level_value != '无' and outline_level_value != '':
-                        try:
-                            level = int(outline_level_value)
-                            if 1 <= level <= 9:
-                                self.document_formatter._set_outline_level(para, level)
-                                self._log(f"  > 已设置表格标题的大纲级别为 {level}")
-                        except (ValueError, TypeError):
-                            pass  # 忽略无效值
-                self.document_formatter._reset_pagination_properties(para)
-                block_idx += 1
+        sectPr = doc.element.body.sectPr
+        templates = {}
+        counts = Counter()
+        debug = self.log_level <= logging.DEBUG
+        with self._stats.stage('block_loop'):
+            for idx, text in enumerate(lines):
+                kind, level = self.block_classifier.classify_text(text)
+                counts[kind] += 1
+                record = BlockRecord(idx, kind, level)
+                if debug:
+                    self._log_paragraph_record(record, text)
+                if kind == BlockKind.EMPTY:
+                    sectPr.addprevious(OxmlElement('w:p'))
+                    continue
+
+                template = templates.get((kind, level))
+                if template is None:
+                    template = templates[(kind, level)] = self._build_txt_paragraph_template(doc, record)
+                p_template, format_logs = template
+                p = deepcopy(p_template)
+                self._set_txt_run_text(p.find(_W_R), text)
+                sectPr.addprevious(p)
+                # 重放生成模板时格式化方法输出的日志，与逐段格式化时的日志保持一致
+                if format_logs and self.log_callback:
+                    for message in format_logs:
+                        self.log_callback(message)
+
+        self._log_block_summary(counts)
+        # 每个非空行生成一个只含一个run的段落
+        formatted = sum(counts.values()) - counts[BlockKind.EMPTY]
+        self._stats.add('paragraphs', formatted)
+        self._stats.add('runs', formatted)
+
+        with self._stats.stage('page_setup'):
+            self.page_setup._apply_page_setup(doc, is_from_txt=True)
+        return doc
+
+    def _build_txt_paragraph_template(self, doc, record):
+        """
+        用原有的格式化方法生成某一类TXT段落的模板
+
+        Returns:
+            tuple: (已格式化的 <w:p> 元素（含一个文本待填入的run）, 格式化过程中输出的日志)
+        """
+        para = doc.add_paragraph("_")
+        para._p.getparent().remove(para._p)
+
+        format_logs = []
+        log_callbacks = self.log_callback, self.document_formatter.log_callback
+        self.log_callback = self.document_formatter.log_callback = format_logs.append
+        try:
+            self._format_paragraph_record(para, record, "", apply_color=False)
+        finally:
+            self.log_callback, self.document_formatter.log_callback = log_callbacks
+        return para._p, format_logs
+
+    @staticmethod
+    def _set_txt_run_text(r, text):
+        """填入run文本，制表符转换为 <w:tab/>，与 python-docx 设置run文本的结果一致"""
+        t = r.find(_W_T)
+        if '\t' not in text:
+            t.text = text
+            return
+        r.remove(t)
+        for i, segment in enumerate(text.split('\t')):
+            if i:
+                r.append(OxmlElement('w:tab'))
+            if segment:
+                t = OxmlElement('w:t')
+                t.text = segment
+                if len(segment.strip()) < len(segment):
+                    t.set(_XML_SPACE, 'preserve')
+                r.append(t)
+
+    def _apply_block_records(self, all_blocks, texts, records, apply_color):
+        """格式化阶段：按分类记录逐块应用格式"""
+        debug = self.log_level <= logging.DEBUG
+        for record in records:
+            block = all_blocks[record.index]
+            kind = record.kind
+
+            if kind == BlockKind.CAPTION:
+                self._log("块 %d: 已作为图表/附件标题处理 - 跳过", record.index + 1, level=logging.DEBUG)
                 continue
 
-            # 检查段落的样式名称是否为标题样式
-            is_heading_style = False
-            try:
-                style_name = getattr(para.style, 'name', '')
-                # 检查样式名称是否为标题样式，如"标题1"、"标题2"、"Heading 1"等
-                if style_name and (style_name.startswith("标题") or style_name.startswith("Heading")):
-                    is_heading_style = True
-                    # 如果是标题样式但没有大纲级别，设置默认大纲级别
-                    if outline_level is None:
-                        # 尝试从标题样式名称中提取级别数字
-                        level_match = re.search(r'\d+', style_name)
-                        if level_match:
-                            level = int(level_match.group())
-                            if 1 <= level <= 9:
-                                outline_level = level - 1  # 转换为0-8范围
-            except (AttributeError, ValueError):
-                pass  # 忽略获取样式时可能出现的错误
-
-            # 如果段落有大纲级别或是标题样式，则不进行首行缩进
-            if outline_level is not None or is_heading_style:
-                level = (outline_level or 0) + 1  # 大纲级别0-8对应标题级别1-9
-                self._log(f"段落 {current_block_num}: 大纲级别 {level} 标题 - \"{para_text_preview}...\"")
-                self.document_formatter._strip_leading_whitespace(para)
-
-                # 根据大纲级别应用不同的字体和格式
-                if level == 1:
-                    # 检查配置中是否有h1_bold属性，如果没有则默认为False
-                    h1_bold = self.config.get('h1_bold', False)
-                    self.document_formatter._apply_font_to_runs(para, self.config['h1_font'], self.config['h1_size'],
-                                                                set_color=apply_color, is_bold=h1_bold)
-                    # 应用一级标题段前、段后间距（直接使用磅值）
-                    h1_space_before_pts = float(self.config['h1_space_before'])
-                    h1_space_after_pts = float(self.config['h1_space_after'])
-                    para.paragraph_format.space_before = Pt(h1_space_before_pts)
-                    para.paragraph_format.space_after = Pt(h1_space_after_pts)
-                elif level == 2:
-                    # 检查配置中是否有h2_bold属性，如果没有则默认为True
-                    h2_bold = self.config.get('h2_bold', True)
-                    self.document_formatter._apply_font_to_runs(para, self.config['h2_font'], self.config['h2_size'],
-                                                                set_color=apply_color, is_bold=h2_bold)
-                    # 应用二级标题段前、段后间距（直接使用磅值）
-                    h2_space_before_pts = float(self.config['h2_space_before'])
-                    h2_space_after_pts = float(self.config['h2_space_after'])
-                    para.paragraph_format.space_before = Pt(h2_space_before_pts)
-                    para.paragraph_format.space_after = Pt(h2_space_after_pts)
-                elif level == 3:
-                    # 检查配置中是否有h3_bold属性，如果没有则默认为False
-                    h3_bold = self.config.get('h3_bold', False)
-                    # 三级标题样式和间距设置
-                    self.document_formatter._apply_font_to_runs(para, self.config['h3_font'], self.config['h3_size'],
-                                                                set_color=apply_color, is_bold=h3_bold)
-                    # 应用三级标题段前、段后间距（直接使用磅值）
-                    h3_space_before_pts = float(self.config['h3_space_before'])
-                    h3_space_after_pts = float(self.config['h3_space_after'])
-                    para.paragraph_format.space_before = Pt(h3_space_before_pts)
-                    para.paragraph_format.space_after = Pt(h3_space_after_pts)
-                else:
-                    # 4-9级标题使用正文字体和默认间距
-                    self.document_formatter._apply_font_to_runs(para, self.config['body_font'], self.config['body_size'],
-                                                                set_color=apply_color,
-                                                                use_times_roman_for_ascii=self.config.get('body_use_times_roman', True))
-                    para.paragraph_format.space_before = Pt(0)
-                    para.paragraph_format.space_after = Pt(0)
-
-                # 设置标题行间距
-                spacing = para._p.get_or_add_pPr().get_or_add_spacing()
-                spacing.set(qn('w:beforeAutospacing'), '0')
-                spacing.set(qn('w:afterAutospacing'), '0')
-                para.paragraph_format.line_spacing = Pt(self.config['line_spacing'])
-
-                # 标题不缩进 - 确保所有标题（1-9级）都不缩进
-                self.document_formatter._apply_text_indent_and_align(para)
-                self.document_formatter._reset_pagination_properties(para)
-                block_idx += 1
+            if kind == BlockKind.TABLE:
+                self._log("块 %d: 表格 - 检查内部标题", record.index + 1, level=logging.DEBUG)
+                self._format_table(block, apply_color)
                 continue
 
-            # 检查是否为单独占一行的数字编号标题
-            if not (outline_level is not None or is_heading_style):
-                # 检查是否单独成行（排除段落中间的数字编号）
-                lines = para.text.split('\n')
-                if len(lines) == 1:
-                    # 使用正则表达式精确匹配标题格式，避免将普通文本中的小数点误识别
-                    text = para.text.strip()
-                    
-                    # 2级标题格式: "7.9 文本" 或 "7.9. 文本" - 数字后接数字的格式
-                    h2_pattern = re.compile(r'^\d+[\.．]\d+(?:[\.．]\s*)?\s+[\u4e00-\u9fa5a-zA-Z]')
-                    # 3级标题格式: "7.9.4 文本" 或 "7.9.4. 文本" - 三个数字的格式
-                    h3_pattern = re.compile(r'^\d+[\.．]\d+[\.．]\d+(?:[\.．]\s*)?\s+[\u4e00-\u9fa5a-zA-Z]')
-                    # 4级标题格式: "7.9.4.1 文本" 或 "7.9.4.1. 文本" - 四个数字的格式
-                    h4_pattern = re.compile(r'^\d+[\.．]\d+[\.．]\d+[\.．]\d+(?:[\.．]\s*)?\s+[\u4e00-\u9fa5a-zA-Z]')
-                    # 5级标题格式: "7.9.4.1.1 文本" 或 "7.9.4.1.1. 文本" - 五个或更多数字的格式
-                    h5_pattern = re.compile(r'^\d+[\.．]\d+[\.．]\d+[\.．]\d+[\.．]\d+(?:[\.．]\d*)*(?:[\.．]\s*)?\s+[\u4e00-\u9fa5a-zA-Z]')
-                    
-                    if h2_pattern.match(text):
-                        self._log(f"段落 {current_block_num}: 单独成行的2级数字编号标题 - \"{para_text_preview}...\"")
-                        # 应用2级标题格式
-                        self.document_formatter._strip_leading_whitespace(para)
-                        h2_bold = self.config.get('h2_bold', True)
-                        self.document_formatter._apply_font_to_runs(para, self.config['h2_font'], self.config['h2_size'],
-                                                                    set_color=apply_color, is_bold=h2_bold)
-                        # 应用二级标题段前、段后间距
-                        h2_space_before_pts = float(self.config['h2_space_before'])
-                        h2_space_after_pts = float(self.config['h2_space_after'])
-                        para.paragraph_format.space_before = Pt(h2_space_before_pts)
-                        para.paragraph_format.space_after = Pt(h2_space_after_pts)
-                        # 设置标题行间距
-                        spacing = para._p.get_or_add_pPr().get_or_add_spacing()
-                        spacing.set(qn('w:beforeAutospacing'), '0')
-                        spacing.set(qn('w:afterAutospacing'), '0')
-                        para.paragraph_format.line_spacing = Pt(self.config['line_spacing'])
-                        # 标题不缩进
-                        self.document_formatter._apply_text_indent_and_align(para)
-                        # 如果启用了大纲级别设置，则设置为2级
-                        if self.config['set_outline']:
-                            self.document_formatter._set_outline_level(para, 2)
-                            self._log(f"  > 已设置为2级大纲级别")
-                        # 标记此段落不需要缩进
-                        setattr(para, '_has_no_indent', True)
-                        self.document_formatter._reset_pagination_properties(para)
-                        block_idx += 1
-                        continue
-                    elif h3_pattern.match(text):
-                        self._log(f"段落 {current_block_num}: 单独成行的3级数字编号标题 - \"{para_text_preview}...\"")
-                        # 应用3级标题格式
-                        self.document_formatter._strip_leading_whitespace(para)
-                        h3_bold = self.config.get('h3_bold', False)
-                        self.document_formatter._apply_font_to_runs(para, self.config['h3_font'], self.config['h3_size'],
-                                                                    set_color=apply_color, is_bold=h3_bold)
-                        # 应用三级标题段前、段后间距
-                        h3_space_before_pts = float(self.config['h3_space_before'])
-                        h3_space_after_pts = float(self.config['h3_space_after'])
-                        para.paragraph_format.space_before = Pt(h3_space_before_pts)
-                        para.paragraph_format.space_after = Pt(h3_space_after_pts)
-                        # 设置标题行间距
-                        spacing = para._p.get_or_add_pPr().get_or_add_spacing()
-                        spacing.set(qn('w:beforeAutospacing'), '0')
-                        spacing.set(qn('w:afterAutospacing'), '0')
-                        para.paragraph_format.line_spacing = Pt(self.config['line_spacing'])
-                        # 标题不缩进
-                        self.document_formatter._apply_text_indent_and_align(para)
-                        # 如果启用了大纲级别设置，则设置为3级
-                        if self.config['set_outline']:
-                            self.document_formatter._set_outline_level(para, 3)
-                            self._log(f"  > 已设置为3级大纲级别")
-                        # 标记此段落不需要缩进
-                        setattr(para, '_has_no_indent', True)
-                        self.document_formatter._reset_pagination_properties(para)
-                        block_idx += 1
-                        continue
-                    elif h4_pattern.match(text):
-                        self._log(f"段落 {current_block_num}: 单独成行的4级数字编号标题 - \"{para_text_preview}...\"")
-                        # 应用4级标题格式（使用正文字体）
-                        self.document_formatter._strip_leading_whitespace(para)
-                        # 4级标题使用正文字体
-                        self.document_formatter._apply_font_to_runs(para, self.config['body_font'], self.config['body_size'],
-                                                                    set_color=apply_color,
-                                                                    use_times_roman_for_ascii=self.config.get('body_use_times_roman', True))
-                        # 设置默认间距
-                        para.paragraph_format.space_before = Pt(0)
-                        para.paragraph_format.space_after = Pt(0)
-                        # 设置标题行间距
-                        spacing = para._p.get_or_add_pPr().get_or_add_spacing()
-                        spacing.set(qn('w:beforeAutospacing'), '0')
-                        spacing.set(qn('w:afterAutospacing'), '0')
-                        para.paragraph_format.line_spacing = Pt(self.config['line_spacing'])
-                        # 标题不缩进
-                        self.document_formatter._apply_text_indent_and_align(para)
-                        # 如果启用了大纲级别设置，则设置为4级
-                        if self.config['set_outline']:
-                            self.document_formatter._set_outline_level(para, 4)
-                            self._log(f"  > 已设置为4级大纲级别")
-                        # 标记此段落不需要缩进
-                        setattr(para, '_has_no_indent', True)
-                        self.document_formatter._reset_pagination_properties(para)
-                        block_idx += 1
+            para = block
+            if debug:
+                self._log_paragraph_record(record, texts[record.index])
+            if kind != BlockKind.EMPTY:
+                self._format_paragraph_record(para, record, texts[record.index], apply_color)
+
+    def _apply_block_records_parallel(self, all_blocks, texts, records, apply_color):
+        """格式化阶段的并行版本：分段交给工作进程，结果与 _apply_block_records() 相同；并行失败时改为顺序格式化"""
+        workers = self.parallel_formatter.workers
+        self._log("  > 文档共 %d 个块，使用 %d 个进程并行格式化", len(records), workers)
+        prepared_styles = self.style_manager.prepared_styles if self.style_manager is not None else None
+        try:
+            logs, runs_formatted, counts = self.parallel_formatter.apply(all_blocks, texts, records, apply_color,
+                                                                         prepared_styles)
+        except Exception as e:
+            self._log("  > 警告：并行格式化失败，改为顺序格式化: %s", e, level=logging.WARNING)
+            self.parallel_formatter.shutdown()
+            self._apply_block_records(all_blocks, texts, records, apply_color)
+            return
+        # 工作进程中的日志已按相同的日志级别过滤，按块的顺序输出
+        if self.log_callback:
+            for message in logs:
+                self.log_callback(message)
+        self.document_formatter.run_formatter.runs_formatted += runs_formatted
+        for name, count in counts.items():
+            self._stats.add(name, count)
+
+    def _log_paragraph_record(self, record, text):
+        """输出段落分类日志（DEBUG 级别）"""
+        current_block_num = record.index + 1
+        kind = record.kind
+        if kind == BlockKind.EMPTY:
+            self._log("段落 %d: 空白 - 跳过", current_block_num, level=logging.DEBUG)
+        elif kind in (BlockKind.PICTURE, BlockKind.EMBEDDED_OBJECT):
+            log_msg = "图片" if kind == BlockKind.PICTURE else "附件"
+            self._log("段落 %d: %s - 仅格式化文字", current_block_num, log_msg, level=logging.DEBUG)
+        elif kind == BlockKind.TABLE_CAPTION:
+            self._log("段落 %d: 检测到以'表'开头的段落，强制识别为表格标题", current_block_num, level=logging.DEBUG)
+        elif kind == BlockKind.OUTLINE_HEADING:
+            self._log("段落 %d: 大纲级别 %d 标题 - \"%s...\"", current_block_num, record.level, self._preview(text),
+                      level=logging.DEBUG)
+        elif kind == BlockKind.NUMBERED_HEADING:
+            self._log("段落 %d: 单独成行的%d级数字编号标题 - \"%s...\"", current_block_num, record.level,
+                      self._preview(text), level=logging.DEBUG)
+        else:
+            if record.level:
+                self._log("段落 %d: 常规标题格式文本 - \"%s...\" (已禁用自动识别，按正文处理)", current_block_num,
+                          self._preview(text), level=logging.DEBUG)
+            # 所有段落都按正文处理
+            self._log("段落 %d: 正文 - \"%s...\"", current_block_num, self._preview(text), level=logging.DEBUG)
+
+    def _format_paragraph_record(self, para, record, text, apply_color):
+        """按分类记录格式化单个非空段落"""
+        kind = record.kind
+        if kind in (BlockKind.PICTURE, BlockKind.EMBEDDED_OBJECT):
+            self._format_picture_paragraph(para, record.level, text, apply_color)
+            return
+
+        self._apply_paragraph_spacing(para)
+
+        if kind == BlockKind.TABLE_CAPTION:
+            self._format_table_caption_paragraph(para, apply_color)
+        elif kind == BlockKind.OUTLINE_HEADING:
+            # 样式模式下原标题样式会被替换，需把标题级别显式写入段落的大纲级别
+            self._format_heading_paragraph(para, record.level, apply_color,
+                                           set_outline=self.style_manager is not None)
+        elif kind == BlockKind.NUMBERED_HEADING:
+            self._format_heading_paragraph(para, record.level, apply_color, set_outline=self.plan.set_outline)
+        else:
+            self._format_body_paragraph(para, apply_color)
+
+    def _apply_body_font(self, para, apply_color):
+        body = self.plan.body
+        self.document_formatter._apply_font_to_runs(para, body.font_name, body.size_pt, set_color=apply_color,
+                                                    use_times_roman_for_ascii=body.use_times_roman)
+
+    def _apply_role_font(self, para, role, apply_color):
+        """按样式角色设置段落字体：样式模式下引用命名样式，否则直接格式化每个run"""
+        if self.style_manager is not None:
+            self.style_manager.apply(para, role)
+            return
+        font_name, size_pt, is_bold, use_times_roman = self.plan.role(role)
+        self.document_formatter._apply_font_to_runs(para, font_name, size_pt, set_color=apply_color, is_bold=is_bold,
+                                                    use_times_roman_for_ascii=use_times_roman)
+
+    def _apply_caption_outline_level(self, para, level, log_label):
+        """设置图表标题的大纲级别，level 为排版计划中解析好的级别，None 表示不设置"""
+        if level is not None:
+            self.document_formatter._set_outline_level(para, level)
+            self._log("  > 已设置%s的大纲级别为 %d", log_label, level, level=logging.DEBUG)
+
+    def _apply_paragraph_spacing(self, para):
+        """段前段后间距清零并应用统一行距"""
+        spacing = para._p.get_or_add_pPr().get_or_add_spacing()
+        spacing.set(qn('w:beforeAutospacing'), '0')
+        spacing.set(qn('w:afterAutospacing'), '0')
+        para.paragraph_format.space_before, para.paragraph_format.space_after = Pt(0), Pt(0)
+        para.paragraph_format.line_spacing = self.plan.line_spacing
+
+    def _format_caption(self, para, caption_idx, text, detected_type, apply_color):
+        """格式化预扫描中找到的图片/表格标题"""
+        caption_prefix = "figure" if detected_type == "图" else "table"
+        # 如果标题未居中，设置为居中对齐
+        if para.alignment != WD_ALIGN_PARAGRAPH.CENTER:
+            para.alignment = WD_ALIGN_PARAGRAPH.CENTER
+            self._log("  > 已将未居中的%s标题设置为居中对齐", detected_type, level=logging.DEBUG)
+        self._log("  > 发现 %s 的标题: \"%.30s...\" (在段落 %d)", detected_type, text, caption_idx + 1, level=logging.DEBUG)
+        self._apply_role_font(para, f'{caption_prefix}_caption', apply_color)
+        # 表格/图表标题不缩进，确保完全没有任何缩进
+        para.paragraph_format.first_line_indent = None
+        para.paragraph_format.left_indent = Pt(0)
+        para.paragraph_format.right_indent = Pt(0)
+
+        # 确保完全清除任何可能的缩进设置 - 使用更健壮的方式
+        try:
+            pPr = para._p.get_or_add_pPr()
+
+            # 获取或创建缩进元素
+            ind = pPr.find(qn('w:ind'))
+            if ind is None:
+                ind = OxmlElement('w:ind')
+                pPr.append(ind)
+
+            # 清除所有可能的缩进属性
+            for attr in ['w:firstLine', 'w:firstLineChars', 'w:left', 'w:leftChars',
+                         'w:right', 'w:rightChars', 'w:hanging', 'w:hangingChars']:
+                if attr in ind.attrib:
+                    del ind.attrib[attr]
+
+            # 显式设置为0 - 使用不同单位确保彻底移除缩进
+            ind.set(qn('w:firstLineChars'), '0')
+            ind.set(qn('w:leftChars'), '0')
+            ind.set(qn('w:rightChars'), '0')
+            ind.set(qn('w:firstLine'), '0')
+            ind.set(qn('w:left'), '0')
+            ind.set(qn('w:right'), '0')
+        except Exception as e:
+            self._log("  > 设置 %s 标题缩进时出错: %s", detected_type, e, level=logging.WARNING)
+
+        # 应用大纲级别设置
+        outline_level = getattr(self.plan, f'{caption_prefix}_caption_outline_level')
+        self._apply_caption_outline_level(para, outline_level, f" {detected_type} 标题")
+
+    def _format_table(self, table, apply_color):
+        """
+        格式化表格：第一行内以"表"开头的段落按表格标题格式化，其余单元格内容改用正文字体并保持原字号
+
+        直接遍历 <w:tr>/<w:tc> 元素，不经过 python-docx 的 row.cells：后者每次访问都重新计算网格跨度，
+        且合并单元格会按所跨的网格数重复返回，导致同一单元格被反复格式化。
+        这里每个物理单元格只处理一次，字体按字号分组后整表批量应用。
+        嵌套表格递归处理单元格内容，不检查内部标题。
+        """
+        with self._stats.stage('table_loop'):
+            tr_lst = table._tbl.tr_lst
+            if tr_lst:
+                self._format_table_first_row(tr_lst[0], table, apply_color)
+            self._format_table_cells(table._tbl, apply_color)
+
+    def _format_table_cells(self, tbl, apply_color):
+        """
+        格式化一个 <w:tbl> 元素中所有单元格的内容，包括嵌套表格
+
+        Args:
+            tbl (CT_Tbl): 表格元素
+            apply_color (bool): 是否设置字体颜色
+        """
+        # 单元格内容：有明确字号的run保持原字号（并取消加粗），没有字号的run只修改字体名称
+        sized_runs = {}
+        unsized_runs = []
+        nested_tbls = []
+        cell_count = 0
+        for tr in tbl.tr_lst:
+            for tc in tr.tc_lst:
+                # 纵向合并的后续单元格，内容由首个单元格承载（row.cells 同样返回上方的首个单元格）
+                if tc.vMerge == 'continue':
+                    continue
+                cell_count += 1
+                for child in tc.iterchildren(_W_P, _W_TBL):
+                    if child.tag == _W_TBL:
+                        nested_tbls.append(child)
                         continue
-                    elif h5_pattern.match(text):
-                        self._log(f"段落 {current_block_num}: 单独成行的5级数字编号标题 - \"{para_text_preview}...\"")
-                        # 应用5级标题格式（使用正文字体）
-                        self.document_formatter._strip_leading_whitespace(para)
-                        # 5级标题使用正文字体
-                        self.document_formatter._apply_font_to_runs(para, self.config['body_font'], self.config['body_size'],
-                                                                    set_color=apply_color,
-                                                                    use_times_roman_for_ascii=self.config.get('body_use_times_roman', True))
-                        # 设置默认间距
-                        para.paragraph_format.space_before = Pt(0)
-                        para.paragraph_format.space_after = Pt(0)
-                        # 设置标题行间距
-                        spacing = para._p.get_or_add_pPr().get_or_add_spacing()
-                        spacing.set(qn('w:beforeAutospacing'), '0')
-                        spacing.set(qn('w:afterAutospacing'), '0')
-                        para.paragraph_format.line_spacing = Pt(self.config['line_spacing'])
-                        # 标题不缩进
-                        self.document_formatter._apply_text_indent_and_align(para)
-                        # 如果启用了大纲级别设置，则设置为5级
-                        if self.config['set_outline']:
-                            self.document_formatter._set_outline_level(para, 5)
-                            self._log(f"  > 已设置为5级大纲级别")
-                        # 标记此段落不需要缩进
-                        setattr(para, '_has_no_indent', True)
-                        self.document_formatter._reset_pagination_properties(para)
-                        block_idx += 1
+                    # 跳过已经处理过的表格标题
+                    pPr = child.pPr
+                    if (pPr is not None and pPr.jc_val == WD_ALIGN_PARAGRAPH.CENTER
+                            and child.text.strip().startswith("表")):
                         continue
-            # 取消自动识别"一、"、"（一）"、"1."、"(1)"等常规标题的功能
-            # 直接将这些段落作为正文处理
-            if re_h1.match(text_to_check) or re_h2.match(text_to_check) or re_h3.match(text_to_check) or re_h4.match(
-                    text_to_check):
-                self._log(
-                    f"段落 {current_block_num}: 常规标题格式文本 - \"{para_text_preview}...\" (已禁用自动识别，按正文处理)")
-
-            # 检查是否是表格内容，如果是则跳过处理
-            if hasattr(para, '_is_table_content') and para._is_table_content:
-                self._log(f"段落 {current_block_num}: 表格内容 - 跳过格式化处理")
-                block_idx += 1
+                    for r in child.r_lst:
+                        rPr = r.rPr
+                        size = rPr.sz_val if rPr is not None else None
+                        if size:
+                            sized_runs.setdefault(size.pt, []).append(r)
+                        else:
+                            unsized_runs.append(r)
+
+        run_formatter = self.document_formatter.run_formatter
+        body_font = self.plan.table_font_name
+        use_times_roman = self.plan.table_use_times_roman
+        for size_pt, r_elements in sized_runs.items():
+            run_formatter.apply_to_runs(r_elements, body_font, size_pt, is_bold=False, set_color=apply_color,
+                                        use_times_roman_for_ascii=use_times_roman)
+        if unsized_runs:
+            run_formatter.apply_to_runs(unsized_runs, body_font, set_color=apply_color,
+                                        use_times_roman_for_ascii=use_times_roman)
+
+        self._stats.add('tables')
+        self._stats.add('cells', cell_count)
+        for nested_tbl in nested_tbls:
+            self._format_table_cells(nested_tbl, apply_color)
+
+    def _format_table_first_row(self, tr, parent, apply_color):
+        """检查表格第一行各单元格的首个段落是否为表格内部标题"""
+        for tc in tr.tc_lst:
+            p = tc.find(_W_P)
+            if p is None:
                 continue
-            
-            # 所有段落都按正文处理
-            self._log(f"段落 {current_block_num}: 正文 - \"{para_text_preview}...\"")
-            self.document_formatter._strip_leading_whitespace(para)
-            self.document_formatter._apply_font_to_runs(para, self.config['body_font'], self.config['body_size'],
-                                                        set_color=apply_color,
-                                                        use_times_roman_for_ascii=self.config.get('body_use_times_roman', True))
-            # 正文需要首行缩进
-            self.document_formatter._apply_body_text_indent_and_align(para)
-            self.document_formatter._reset_pagination_properties(para)
-
-            block_idx += 1
+            para = Paragraph(p, parent)
+            text = p.text.strip()
+            if text and text.startswith("表"):
+                # 确保标题始终居中对齐
+                para.alignment = WD_ALIGN_PARAGRAPH.CENTER
+                self._log("  > 发现表格内部标题: \"%.30s...\"", text, level=logging.DEBUG)
+                caption = self.plan.table_caption
+                self.document_formatter._apply_font_to_runs(para, caption.font_name, caption.size_pt,
+                                                            set_color=apply_color,
+                                                            is_bold=caption.is_bold)
+                # 表格标题不缩进，确保完全没有任何缩进
+                self.document_formatter._apply_text_indent_and_align(para)
 
-        self.page_setup._apply_page_setup(doc, is_from_txt=is_from_txt)
-        self._log("正在保存最终文档...")
-        doc.save(output_path)
+            # 应用表格标题大纲级别设置
+            self._apply_caption_outline_level(para, self.plan.table_caption_outline_level, "表格内部标题")
+
+    def _format_picture_paragraph(self, para, text_level, text, apply_color):
+        """含图片或嵌入对象的段落，仅格式化其中的文字"""
+        if text_level == 1:
+            self._log("  > 文字识别为一级标题: \"%s...\"", self._preview(text), level=logging.DEBUG)
+            self.document_formatter._apply_font_to_runs(para, self.plan.h1.font_name, self.plan.h1.size_pt,
+                                                        set_color=apply_color)
+        elif text_level == 2:
+            self._log("  > 文字识别为二级标题: \"%s...\"", self._preview(text), level=logging.DEBUG)
+            self.document_formatter._apply_font_to_runs(para, self.plan.h2.font_name, self.plan.h2.size_pt,
+                                                        set_color=apply_color)
+        else:
+            level_names = {3: "三级标题", 4: "四级标题", 0: "正文"}
+            self._log("  > 文字识别为%s: \"%s...\"", level_names[text_level], self._preview(text), level=logging.DEBUG)
+            self._apply_body_font(para, apply_color)
+
+        # 确保图片或附件中的文字（即使是标题）也不缩进
+        if text_level:
+            self.document_formatter._apply_text_indent_and_align(para)
+
+    def _format_table_caption_paragraph(self, para, apply_color):
+        """以"表"开头的正文段落按表格标题格式化"""
+        self.document_formatter._strip_leading_whitespace(para)
+        self._apply_role_font(para, 'table_caption', apply_color)
+        # 表格标题居中对齐且不缩进
+        para.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        self.document_formatter._apply_text_indent_and_align(para)
+        # 应用表格标题大纲级别设置
+        self._apply_caption_outline_level(para, self.plan.table_caption_outline_level, "表格标题")
+        self.document_formatter._reset_pagination_properties(para)
+
+    def _format_heading_paragraph(self, para, level, apply_color, set_outline=False):
+        """
+        按标题级别格式化段落
+
+        Args:
+            level (int): 标题级别，1-3 级使用各自的标题字体和段前段后间距，4-9 级使用正文字体和默认间距
+            set_outline (bool): 是否同时把段落大纲级别设置为 level
+        """
+        self.document_formatter._strip_leading_whitespace(para)
+
+        # 根据级别应用不同的字体和格式
+        if level in (1, 2, 3):
+            prefix = f'h{level}'
+            self._apply_role_font(para, prefix, apply_color)
+            # 应用标题段前、段后间距（直接使用磅值）
+            space_before, space_after = self.plan.heading_spacing[level - 1]
+            para.paragraph_format.space_before = space_before
+            para.paragraph_format.space_after = space_after
+        else:
+            # 4-9级标题使用正文字体和默认间距
+            self._apply_role_font(para, 'body', apply_color)
+            para.paragraph_format.space_before = Pt(0)
+            para.paragraph_format.space_after = Pt(0)
+
+        # 设置标题行间距
+        spacing = para._p.get_or_add_pPr().get_or_add_spacing()
+        spacing.set(qn('w:beforeAutospacing'), '0')
+        spacing.set(qn('w:afterAutospacing'), '0')
+        para.paragraph_format.line_spacing = self.plan.line_spacing
+
+        # 标题不缩进 - 确保所有标题（1-9级）都不缩进
+        self.document_formatter._apply_text_indent_and_align(para)
+        if set_outline:
+            self.document_formatter._set_outline_level(para, level)
+            self._log("  > 已设置为%d级大纲级别", level, level=logging.DEBUG)
+        self.document_formatter._reset_pagination_properties(para)
+
+    def _format_body_paragraph(self, para, apply_color):
+        self.document_formatter._strip_leading_whitespace(para)
+        self._apply_role_font(para, 'body', apply_color)
+        # 正文需要首行缩进
+        self.document_formatter._apply_body_text_indent_and_align(para)
+        self.document_formatter._reset_pagination_properties(para)
 
     def _cleanup_temp_files(self):
         self.file_processor._cleanup_temp_files()
 
+    def prefetch_conversions(self, input_paths):
+        """提前提交 .doc/.wps 文件的格式转换，与其他文档的排版并行"""
+        self.file_processor.prefetch_conversions(input_paths)
+
     def quit_com_app(self):
-        self.file_processor.quit_com_app()
\ No newline at end of file
+        self.file_processor.quit_com_app()
+        if self.parallel_formatter is not None:
+            self.parallel_formatter.shutdown()
\ No newline at end of file
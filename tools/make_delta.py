@@ -0,0 +1,57 @@
+"""
+生成增量更新包：比较上一版本和新版本的 WordFormatter.exe，输出 .wfdelta 文件及 update.xml 中对应的 <delta> 元素
+
+生成后会在临时目录中用旧版本应用一次增量更新包，确认得到的文件与新版本完全相同。
+客户端版本不是 --from-version、或本机程序文件与旧版本不同时，会自动改为下载完整更新包，
+因此完整更新包（zip_program.py 生成）仍需照常发布。
+
+用法（在项目根目录执行）:
+    python tools/make_delta.py release/V1.0.3/WordFormatter.exe dist/WordFormatter.exe --from-version 1.0.3 --to-version 1.1.2
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.delta_update import DELTA_SUFFIX, apply_delta, make_delta  # noqa: E402
+from modules.hashing import file_sha256  # noqa: E402
+
+
+def delta_element(delta_path, header, base_url):
+    """update.xml 中描述增量更新包的 <delta> 元素"""
+    return (f'<delta from="{header["source_version"]}" base_sha256="{header["source_sha256"]}" '
+            f'sha256="{file_sha256(delta_path)}">{base_url.rstrip("/")}/{os.path.basename(delta_path)}</delta>')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='生成程序文件的增量更新包')
+    parser.add_argument('old', help='上一版本的 WordFormatter.exe')
+    parser.add_argument('new', help='新版本的 WordFormatter.exe')
+    parser.add_argument('--from-version', required=True, help='上一版本的版本号，如 1.0.3')
+    parser.add_argument('--to-version', required=True, help='新版本的版本号，如 1.1.2')
+    parser.add_argument('-o', '--output', help=f'输出文件，默认为 Wordformatter_V旧版本_to_V新版本{DELTA_SUFFIX}')
+    parser.add_argument('--base-url', default='http://172.14.60.197', help='更新包所在目录的地址，用于生成 <delta> 元素')
+    args = parser.parse_args(argv)
+
+    output = args.output or f"Wordformatter_V{args.from_version}_to_V{args.to_version}{DELTA_SUFFIX}"
+    info = make_delta(args.old, args.new, output, args.from_version, args.to_version)
+
+    # 应用一次，确认增量更新包可以得到完全相同的新版本
+    with tempfile.TemporaryDirectory(prefix='make_delta_') as temp_dir:
+        apply_delta(args.old, output, os.path.join(temp_dir, 'WordFormatter.exe'))
+
+    target_size = info['target_size']
+    print(f"已生成: {os.path.abspath(output)}")
+    print(f"- 新版本程序: {target_size / 1024 / 1024:.2f} MB，增量更新包: {info['delta_size'] / 1024 / 1024:.2f} MB"
+          f"（{info['delta_size'] / max(target_size, 1) * 100:.1f}%）")
+    print(f"- 复用旧版本内容 {info['copied_bytes'] / 1024 / 1024:.2f} MB，新增内容 {info['inserted_bytes'] / 1024 / 1024:.2f} MB")
+    print("- 已验证：应用增量更新包后与新版本完全相同")
+    print("将以下元素加入 update.xml（与 <url> 同级）：")
+    print(f"    {delta_element(output, info, args.base_url)}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
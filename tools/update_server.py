@@ -0,0 +1,231 @@
+"""
+本地更新服务器：在本机模拟内网更新服务器，用于测试自动更新的下载、断点续传和完整性校验
+
+支持 Range/If-Range 续传请求和 If-None-Match/If-Modified-Since 条件请求，并可以限速、在发送一定字节后主动断开连接，模拟分支机构的慢速、不稳定链路。
+--publish 根据更新包生成 update.xml（含版本号、下载地址和SHA-256摘要），--delta 同时发布增量更新包。
+
+用法（在项目根目录执行）:
+    python tools/update_server.py --dir update_site --publish Wordformatter_V1.1.2.zip --version 1.1.2
+    python tools/update_server.py --dir update_site --publish Wordformatter_V1.1.2.zip --version 1.1.2 \
+        --delta Wordformatter_V1.0.3_to_V1.1.2.wfdelta
+    python tools/update_server.py --dir update_site --port 8765 --rate-kb 512 --drop-after-mb 5 --drops 2
+
+然后将 update_config.json 中的 update_check_url 设为 http://127.0.0.1:8765/update.xml 启动程序。
+"""
+import argparse
+import email.utils
+import http.server
+import os
+import re
+import shutil
+import socket
+import sys
+import threading
+import time
+from xml.sax.saxutils import escape
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.delta_update import read_delta_header  # noqa: E402
+from modules.hashing import file_sha256  # noqa: E402
+
+# 每次发送的字节数（限速时按此粒度等待）
+_SEND_BLOCK = 64 * 1024
+
+
+def write_update_xml(site_dir, package_name, version, base_url, notes='', delta_names=()):
+    """
+    在站点目录中生成 update.xml
+
+    Args:
+        site_dir (str): 站点目录，更新包需已放在该目录中
+        package_name (str): 更新包文件名
+        version (str): 新版本号
+        base_url (str): 站点地址，如 http://127.0.0.1:8765
+        notes (str): 更新说明
+        delta_names (tuple): 站点目录中的增量更新包文件名（tools/make_delta.py 生成）
+
+    Returns:
+        str: update.xml 的路径
+    """
+    sha256 = file_sha256(os.path.join(site_dir, package_name))
+    deltas = ""
+    for delta_name in delta_names:
+        delta_path = os.path.join(site_dir, delta_name)
+        with open(delta_path, 'rb') as f:
+            header = read_delta_header(f)
+        deltas += (f'    <delta from="{escape(header["source_version"])}" base_sha256="{header["source_sha256"]}" '
+                   f'sha256="{file_sha256(delta_path)}">{escape(base_url.rstrip("/") + "/" + delta_name)}</delta>\n')
+    xml = (
+        "<update>\n"
+        f"    <version>{escape(version)}</version>\n"
+        f"    <url>{escape(base_url.rstrip('/') + '/' + package_name)}</url>\n"
+        f"    <sha256>{sha256}</sha256>\n"
+        f"{deltas}"
+        f"    <notes>{escape(notes or '无')}</notes>\n"
+        "</update>\n"
+    )
+    path = os.path.join(site_dir, 'update.xml')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(xml)
+    return path
+
+
+class UpdateRequestHandler(http.server.SimpleHTTPRequestHandler):
+    """静态文件服务，增加 Range/If-Range、ETag、条件请求、限速和模拟断线"""
+
+    def do_GET(self):
+        self._serve(send_body=True)
+
+    def do_HEAD(self):
+        self._serve(send_body=False)
+
+    def _serve(self, send_body):
+        path = self.translate_path(self.path)
+        if not os.path.isfile(path):
+            self.send_error(404, "File not found")
+            return
+        stat = os.stat(path)
+        size = stat.st_size
+        etag = f'"{int(stat.st_mtime)}-{size}"'
+        last_modified = email.utils.formatdate(stat.st_mtime, usegmt=True)
+
+        # 条件请求：文件未修改时返回304（客户端检查更新时据此沿用缓存的 update.xml）
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match is not None:
+            not_modified = if_none_match == etag
+        else:
+            not_modified = self.headers.get('If-Modified-Since') == last_modified
+        if not_modified:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Last-Modified', last_modified)
+            self.end_headers()
+            return
+
+        start, end, status = 0, size - 1, 200
+        range_header = self.headers.get('Range', '')
+        if_range = self.headers.get('If-Range')
+        match = re.fullmatch(r'bytes=(\d*)-(\d*)', range_header.strip())
+        # If-Range 与当前文件不符时忽略 Range，返回完整内容
+        if match and (if_range is None or if_range in (etag, last_modified)):
+            first, last = match.groups()
+            if first:
+                start = int(first)
+                end = min(int(last), size - 1) if last else size - 1
+            elif last:
+                start = max(size - int(last), 0)
+            if start >= size or start > end:
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{size}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            status = 206
+
+        self.send_response(status)
+        self.send_header('Content-Type', self.guess_type(path))
+        self.send_header('Content-Length', str(end - start + 1))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', last_modified)
+        if status == 206:
+            self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+        self.end_headers()
+        if send_body:
+            self._send_range(path, start, end - start + 1)
+
+    def _send_range(self, path, start, length):
+        server = self.server
+        drop_after = server.take_drop(length)
+        rate = server.rate_bytes
+        sent = 0
+        with open(path, 'rb') as f:
+            f.seek(start)
+            while sent < length:
+                block = f.read(min(_SEND_BLOCK, length - sent))
+                if drop_after is not None and sent + len(block) > drop_after:
+                    # 发送到指定字节数后直接断开连接，模拟链路中断
+                    self.wfile.write(block[:drop_after - sent])
+                    self.wfile.flush()
+                    self.log_message("已在发送 %d 字节后断开连接", drop_after)
+                    self.connection.shutdown(socket.SHUT_RDWR)
+                    self.close_connection = True
+                    return
+                self.wfile.write(block)
+                sent += len(block)
+                if rate:
+                    time.sleep(len(block) / rate)
+
+
+class UpdateServer(http.server.ThreadingHTTPServer):
+    """
+    Args:
+        address (tuple): 监听地址
+        site_dir (str): 站点目录
+        rate_kb (float): 每个连接的限速（KB/s），0为不限速
+        drop_after (int): 每次响应发送多少字节后断开连接，None为不断开
+        drops (int): 模拟断开的次数（只计入长于 drop_after 的响应），用完后正常发送
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, site_dir, rate_kb=0, drop_after=None, drops=0):
+        handler = lambda *args, **kwargs: UpdateRequestHandler(*args, directory=site_dir, **kwargs)
+        super().__init__(address, handler)
+        self.rate_bytes = rate_kb * 1024
+        self.drop_after = drop_after
+        self.drops_remaining = drops
+        self._lock = threading.Lock()
+
+    def take_drop(self, length):
+        """长度为 length 的响应是否模拟断开：是则返回断开前发送的字节数，否则返回None"""
+        with self._lock:
+            if self.drop_after is None or self.drops_remaining <= 0 or length <= self.drop_after:
+                return None
+            self.drops_remaining -= 1
+            return self.drop_after
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='本地更新服务器（支持断点续传，可模拟限速和断线）')
+    parser.add_argument('--dir', default='update_site', help='站点目录，存放 update.xml 和更新包')
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址')
+    parser.add_argument('--port', type=int, default=8765, help='监听端口')
+    parser.add_argument('--rate-kb', type=float, default=0, help='每个连接的限速（KB/s），0为不限速')
+    parser.add_argument('--drop-after-mb', type=float, help='每次响应发送多少MB后断开连接')
+    parser.add_argument('--drops', type=int, default=1, help='模拟断开的次数（与 --drop-after-mb 一起使用）')
+    parser.add_argument('--publish', help='要发布的更新包，复制到站点目录并生成 update.xml')
+    parser.add_argument('--version', help='发布的版本号（与 --publish 一起使用）')
+    parser.add_argument('--notes', default='', help='更新说明（与 --publish 一起使用）')
+    parser.add_argument('--delta', action='append', default=[],
+                        help='同时发布的增量更新包（tools/make_delta.py 生成），可重复指定')
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.dir, exist_ok=True)
+    base_url = f"http://{args.host}:{args.port}"
+    if args.publish:
+        if not args.version:
+            parser.error('--publish 需要同时指定 --version')
+        package_name = os.path.basename(args.publish)
+        for source in [args.publish] + args.delta:
+            target = os.path.join(args.dir, os.path.basename(source))
+            if os.path.abspath(source) != os.path.abspath(target):
+                shutil.copyfile(source, target)
+        delta_names = [os.path.basename(delta) for delta in args.delta]
+        print(f"已生成: {write_update_xml(args.dir, package_name, args.version, base_url, args.notes, delta_names)}")
+
+    drop_after = int(args.drop_after_mb * 1024 * 1024) if args.drop_after_mb else None
+    server = UpdateServer((args.host, args.port), args.dir, args.rate_kb, drop_after, args.drops)
+    print(f"本地更新服务器已启动: {base_url}/update.xml（Ctrl+C 退出）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,3 +1,4 @@
+import hashlib
 import zipfile
 import os
 
@@ -25,5 +26,8 @@ if zip_file(source_file, output_zip):
     print(f"\n压缩文件信息:")
     print(f"- 路径: {os.path.abspath(output_zip)}")
     print(f"- 大小: {os.path.getsize(output_zip) / (1024 * 1024):.2f} MB")
+    # 填入 update.xml 的 <sha256>，客户端下载后据此校验
+    with open(output_zip, 'rb') as f:
+        print(f"- SHA-256: {hashlib.sha256(f.read()).hexdigest()}")
 
 